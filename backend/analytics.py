@@ -0,0 +1,558 @@
+"""
+Wayne Industries Security Platform
+Analytics aproximado do log de acesso — top-N, contagem por chave e
+distintos por hora/dia com sketches de memória limitada
+"""
+
+import atexit
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from hashlib import blake2b
+
+from cache import bump
+from logwriter import log_writer
+from models import LOGS_SCHEMA, connect
+from retencao import abrir_segmento, segmentos
+
+ANALYTICS_TOPK                = int(os.environ.get('ANALYTICS_TOPK', 100))
+ANALYTICS_CHECKPOINT_INTERVAL = float(os.environ.get('ANALYTICS_CHECKPOINT_INTERVAL', 60))
+ANALYTICS_HOURLY_RETENTION    = int(os.environ.get('ANALYTICS_HOURLY_RETENTION', 168))   # horas
+ANALYTICS_DAILY_RETENTION     = int(os.environ.get('ANALYTICS_DAILY_RETENTION', 365))    # dias
+
+# Dimensões dos sketches — definem o formato gravado no banco, não mudar
+# sem recriar as tabelas (flask --app app rebuild-analytics)
+CMS_LARGURA     = 1024   # erro da contagem: até e/1024 ≈ 0,27% do total
+CMS_PROFUNDIDADE = 4     # ... com confiança 1 - e^-4 ≈ 98%
+HLL_BITS        = 12     # 4096 registradores: erro padrão 1,04/√4096 ≈ 1,6%
+
+# Janelas até este tamanho são detalhadas por hora; acima, por dia
+SERIE_HORARIA_MAX = 48
+
+# As tabelas ficam junto dos logs (arquivo próprio com LOGS_DB_PATH)
+TABELA_HORA = f'{LOGS_SCHEMA}.analytics_hora'
+TABELA_DIA  = f'{LOGS_SCHEMA}.analytics_dia'
+
+# Métrica -> chave extraída de cada registro (usuario, acao, status, ip,
+# timestamp, detalhes); None não conta
+METRICAS = {
+    'ips_negados': lambda r: r[3] if r[2] == 'negado' else None,
+    'usuarios':    lambda r: r[0],
+    'ips':         lambda r: r[3],
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(chave: str) -> int:
+    """Hash de 64 bits estável entre processos (hash() muda a cada execução)."""
+    return int.from_bytes(blake2b(chave.encode(), digest_size=8).digest(), 'little')
+
+
+# ──────────────────────────────────────────────────────────────
+# Sketches
+# ──────────────────────────────────────────────────────────────
+class CountMin:
+    """
+    Count-Min: contagem de qualquer chave sem guardar as chaves. Nunca
+    subestima; superestima em até `erro_max` com probabilidade `confianca`.
+    """
+
+    __slots__ = ('tabela', 'total')
+
+    def __init__(self, tabela: array = None, total: int = 0):
+        self.tabela = tabela if tabela is not None else array('I', bytes(4 * CMS_LARGURA * CMS_PROFUNDIDADE))
+        self.total  = total
+
+    def _celulas(self, h: int):
+        # Hashing duplo: h1 + i·h2 simula CMS_PROFUNDIDADE funções independentes
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [i * CMS_LARGURA + (h1 + i * h2) % CMS_LARGURA for i in range(CMS_PROFUNDIDADE)]
+
+    def add(self, h: int, n: int = 1):
+        tabela = self.tabela
+        for c in self._celulas(h):
+            tabela[c] += n
+        self.total += n
+
+    def estimar(self, chave: str) -> int:
+        return min(self.tabela[c] for c in self._celulas(_hash(chave)))
+
+    def somar(self, outro: 'CountMin'):
+        self.tabela = array('I', map(int.__add__, self.tabela, outro.tabela))
+        self.total += outro.total
+
+    @property
+    def erro_max(self) -> int:
+        return math.ceil(math.e / CMS_LARGURA * self.total)
+
+    @staticmethod
+    def confianca() -> float:
+        return round(1 - math.exp(-CMS_PROFUNDIDADE), 4)
+
+    def dump(self) -> bytes:
+        return zlib.compress(self.tabela.tobytes(), 1)
+
+    @classmethod
+    def load(cls, dados: bytes, total: int) -> 'CountMin':
+        tabela = array('I')
+        tabela.frombytes(zlib.decompress(dados))
+        return cls(tabela, total)
+
+
+class SpaceSaving:
+    """
+    Space-Saving: as `k` chaves mais frequentes com contagem e erro. Toda
+    chave com mais de total/k ocorrências está na lista; a contagem real
+    fica entre contagem - erro e contagem.
+    """
+
+    __slots__ = ('k', 'itens')
+
+    def __init__(self, k: int = ANALYTICS_TOPK, itens: dict = None):
+        self.k     = k
+        self.itens = itens or {}    # chave -> [contagem, erro]
+
+    def add(self, chave: str, n: int = 1):
+        item = self.itens.get(chave)
+        if item is not None:
+            item[0] += n
+        elif len(self.itens) < self.k:
+            self.itens[chave] = [n, 0]
+        else:
+            # Substitui a menor: a nova herda a contagem dela como erro
+            menor = min(self.itens, key=lambda c: self.itens[c][0])
+            piso = self.itens.pop(menor)[0]
+            self.itens[chave] = [piso + n, piso]
+
+    @property
+    def minimo(self) -> int:
+        """Teto da contagem de qualquer chave fora da lista."""
+        if len(self.itens) < self.k:
+            return 0
+        return min(c for c, _ in self.itens.values())
+
+    def somar(self, outro: 'SpaceSaving'):
+        # Fusão de resumos: chave ausente de um lado conta como o mínimo dele
+        m1, m2 = self.minimo, outro.minimo
+        fundidos = {}
+        for chave in self.itens.keys() | outro.itens.keys():
+            a = self.itens.get(chave, (m1, m1))
+            b = outro.itens.get(chave, (m2, m2))
+            fundidos[chave] = [a[0] + b[0], a[1] + b[1]]
+        self.k = max(self.k, outro.k)
+        self.itens = dict(heapq.nlargest(self.k, fundidos.items(), key=lambda kv: kv[1][0]))
+
+    def top(self, n: int) -> list:
+        return heapq.nlargest(n, ((c, v[0], v[1]) for c, v in self.itens.items()), key=lambda t: t[1])
+
+    def dump(self) -> str:
+        return json.dumps([[c, v[0], v[1]] for c, v in self.itens.items()], separators=(',', ':'))
+
+    @classmethod
+    def load(cls, dados: str) -> 'SpaceSaving':
+        itens = {c: [n, e] for c, n, e in json.loads(dados)}
+        return cls(max(ANALYTICS_TOPK, len(itens)), itens)
+
+
+_INVERSOS = [2.0 ** -r for r in range(65)]
+
+
+class HyperLogLog:
+    """HyperLogLog: número de chaves distintas com ~1,6% de erro padrão."""
+
+    __slots__ = ('registros',)
+
+    M = 1 << HLL_BITS
+
+    def __init__(self, registros: bytearray = None):
+        self.registros = registros if registros is not None else bytearray(self.M)
+
+    def add(self, h: int):
+        indice = h >> (64 - HLL_BITS)
+        resto  = h & ((1 << (64 - HLL_BITS)) - 1)
+        rank   = (64 - HLL_BITS) - resto.bit_length() + 1
+        if rank > self.registros[indice]:
+            self.registros[indice] = rank
+
+    def somar(self, outro: 'HyperLogLog'):
+        self.registros = bytearray(map(max, self.registros, outro.registros))
+
+    def estimar(self) -> int:
+        m = self.M
+        alfa = 0.7213 / (1 + 1.079 / m)
+        bruto = alfa * m * m / sum(map(_INVERSOS.__getitem__, self.registros))
+        zeros = self.registros.count(0)
+        if bruto <= 2.5 * m and zeros:
+            # Poucas chaves: contagem linear dos registradores vazios
+            return round(m * math.log(m / zeros))
+        return round(bruto)
+
+    @classmethod
+    def erro_padrao(cls) -> float:
+        return round(1.04 / math.sqrt(cls.M), 4)
+
+    def dump(self) -> bytes:
+        return zlib.compress(bytes(self.registros), 1)
+
+    @classmethod
+    def load(cls, dados: bytes) -> 'HyperLogLog':
+        return cls(bytearray(zlib.decompress(dados)))
+
+
+class Resumo:
+    """Os três sketches de uma métrica num período (hora ou dia)."""
+
+    __slots__ = ('cms', 'topk', 'hll')
+
+    def __init__(self, cms: CountMin = None, topk: SpaceSaving = None, hll: HyperLogLog = None):
+        self.cms  = cms or CountMin()
+        self.topk = topk or SpaceSaving()
+        self.hll  = hll or HyperLogLog()
+
+    def add(self, chave: str):
+        h = _hash(chave)
+        self.cms.add(h)
+        self.topk.add(chave)
+        self.hll.add(h)
+
+    def somar(self, outro: 'Resumo'):
+        self.cms.somar(outro.cms)
+        self.topk.somar(outro.topk)
+        self.hll.somar(outro.hll)
+
+    @classmethod
+    def da_linha(cls, row) -> 'Resumo':
+        return cls(CountMin.load(row['cms'], row['total']), SpaceSaving.load(row['topk']), HyperLogLog.load(row['hll']))
+
+
+# ──────────────────────────────────────────────────────────────
+# Janelas de consulta
+# ──────────────────────────────────────────────────────────────
+def _hora(ts: str) -> str:
+    return ts[:13] + ':00:00'
+
+
+def _fmt(dt: datetime) -> str:
+    return dt.strftime('%Y-%m-%d %H:00:00')
+
+
+def janela(args) -> dict:
+    """
+    Períodos que cobrem a janela pedida em `args` (?horas=N, padrão 24, ou
+    ?desde=&ate= em UTC). Cada período agrupa linhas de dia inteiro
+    ('dia', 'YYYY-MM-DD') e/ou de hora ('hora', 'YYYY-MM-DD HH:00:00').
+    Antes da retenção horária, a janela é alinhada a dias inteiros.
+    Levanta ValueError para parâmetros inválidos.
+    """
+    agora = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    desde_txt = args.get('desde', '').strip()
+    ate_txt   = args.get('ate', '').strip()
+    if desde_txt or ate_txt:
+        ate   = _parse(ate_txt) if ate_txt else agora
+        desde = _parse(desde_txt) if desde_txt else ate - timedelta(hours=23)
+    else:
+        try:
+            horas = int(args.get('horas', 24))
+        except ValueError:
+            horas = 0
+        if horas < 1:
+            raise ValueError('horas deve ser um inteiro positivo.')
+        ate   = agora
+        desde = ate - timedelta(hours=horas - 1)
+    if desde > ate:
+        raise ValueError('desde deve ser anterior a ate.')
+    if ate - desde > timedelta(days=ANALYTICS_DAILY_RETENTION):
+        raise ValueError(f'Janela máxima: {ANALYTICS_DAILY_RETENTION} dias.')
+
+    corte = agora - timedelta(hours=ANALYTICS_HOURLY_RETENTION - 1)
+    if desde < corte:
+        desde = desde.replace(hour=0)
+    if ate < corte:
+        ate = ate.replace(hour=23)
+
+    periodos = []
+    if ate - desde < timedelta(hours=SERIE_HORARIA_MAX):
+        h = desde
+        while h <= ate:
+            periodos.append((_fmt(h), [('hora', _fmt(h))]))
+            h += timedelta(hours=1)
+    else:
+        dia = desde.replace(hour=0)
+        while dia <= ate:
+            inicio, fim = max(desde, dia), min(ate, dia.replace(hour=23))
+            if inicio == dia and fim.hour == 23:
+                partes = [('dia', dia.strftime('%Y-%m-%d'))]
+            else:
+                partes = [('hora', _fmt(inicio + timedelta(hours=i)))
+                          for i in range((fim - inicio) // timedelta(hours=1) + 1)]
+            periodos.append((dia.strftime('%Y-%m-%d'), partes))
+            dia += timedelta(days=1)
+    return {
+        'desde': _fmt(desde),
+        'ate': ate.strftime('%Y-%m-%d %H:59:59'),
+        'granularidade': 'hora' if ate - desde < timedelta(hours=SERIE_HORARIA_MAX) else 'dia',
+        'periodos': periodos,
+    }
+
+
+def _parse(valor: str) -> datetime:
+    for formato in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(valor, formato).replace(minute=0, second=0)
+        except ValueError:
+            pass
+    raise ValueError(f"Data inválida: '{valor}'. Use 'YYYY-MM-DD HH:MM:SS' (UTC).")
+
+
+# ──────────────────────────────────────────────────────────────
+# Acumulação, checkpoint e consulta
+# ──────────────────────────────────────────────────────────────
+class Analytics:
+    """
+    Sketches alimentados pela thread de gravação de logs (ouvinte do
+    log_writer). Em memória ficam só os deltas por hora desde o último
+    checkpoint; a cada ANALYTICS_CHECKPOINT_INTERVAL eles são fundidos nas
+    tabelas analytics_hora/analytics_dia. Consultas somam banco + deltas.
+    """
+
+    def __init__(self):
+        self._lock   = threading.Lock()
+        self._deltas = {}       # (hora, metrica) -> Resumo
+        self._thread = None
+
+    # ── Ingestão ────────────────────────────────────────────────
+    def registrar(self, records):
+        """Ouvinte do log_writer: acumula o lote recém-gravado."""
+        with self._lock:
+            for r in records:
+                hora = _hora(r[4])
+                for metrica, extrair in METRICAS.items():
+                    chave = extrair(r)
+                    if not chave:
+                        continue
+                    resumo = self._deltas.get((hora, metrica))
+                    if resumo is None:
+                        resumo = self._deltas[(hora, metrica)] = Resumo()
+                    resumo.add(chave)
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._loop, name='analytics', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(ANALYTICS_CHECKPOINT_INTERVAL)
+            try:
+                self.checkpoint()
+            except Exception:
+                logger.exception('Falha no checkpoint do analytics.')
+
+    def checkpoint(self) -> int:
+        """Funde os deltas no banco e poda o que saiu da retenção. Retorna os resumos gravados."""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+        if not deltas:
+            return 0
+        conn = connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for (hora, metrica), resumo in deltas.items():
+                _fundir(conn, TABELA_HORA, 'hora', hora, metrica, resumo)
+                _fundir(conn, TABELA_DIA, 'dia', hora[:10], metrica, resumo)
+            _podar(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # Devolve os deltas para a próxima tentativa
+            with self._lock:
+                for chave, resumo in deltas.items():
+                    atual = self._deltas.get(chave)
+                    if atual is not None:
+                        resumo.somar(atual)
+                    self._deltas[chave] = resumo
+            raise
+        finally:
+            conn.close()
+        bump('analytics')
+        return len(deltas)
+
+    def _apos_fork(self):
+        self._lock   = threading.Lock()
+        self._deltas = {}
+        self._thread = None
+
+    # ── Consulta ────────────────────────────────────────────────
+    def periodos(self, conn, metrica: str, jan: dict, sketch: str) -> list:
+        """
+        [(rótulo, total, sketch)] de cada período da janela, banco + deltas
+        locais. `sketch` é 'cms', 'topk' ou 'hll' — só ele é lido do banco.
+        """
+        carregar = _CARREGAR[sketch]
+        linhas = {}
+        for tabela, coluna in ((TABELA_HORA, 'hora'), (TABELA_DIA, 'dia')):
+            valores = [v for _, partes in jan['periodos'] for g, v in partes if g == coluna]
+            if not valores:
+                continue
+            marcas = ','.join('?' * len(valores))
+            for row in conn.execute(
+                f'SELECT {coluna} AS periodo, total, {sketch} FROM {tabela} '
+                f'WHERE metrica = ? AND {coluna} IN ({marcas})',
+                [metrica, *valores]
+            ):
+                linhas[(coluna, row['periodo'])] = row
+
+        with self._lock:
+            deltas = [(h, r) for (h, m), r in self._deltas.items() if m == metrica]
+
+        resultado = []
+        for rotulo, partes in jan['periodos']:
+            total, acumulado = 0, _VAZIO[sketch]()
+            for chave in partes:
+                row = linhas.get(chave)
+                if row is not None:
+                    total += row['total']
+                    acumulado.somar(carregar(row))
+            # Deltas ainda não gravados que caem neste período
+            for hora, delta in deltas:
+                if ('hora', hora) in partes or ('dia', hora[:10]) in partes:
+                    total += delta.cms.total
+                    acumulado.somar(getattr(delta, sketch))
+            resultado.append((rotulo, total, acumulado))
+        return resultado
+
+
+_VAZIO = {'cms': CountMin, 'topk': SpaceSaving, 'hll': HyperLogLog}
+_CARREGAR = {
+    'cms':  lambda row: CountMin.load(row['cms'], row['total']),
+    'topk': lambda row: SpaceSaving.load(row['topk']),
+    'hll':  lambda row: HyperLogLog.load(row['hll']),
+}
+
+
+def _fundir(conn, tabela: str, coluna: str, periodo: str, metrica: str, delta: Resumo):
+    row = conn.execute(
+        f'SELECT total, cms, topk, hll FROM {tabela} WHERE metrica = ? AND {coluna} = ?', (metrica, periodo)
+    ).fetchone()
+    # O delta segue intacto: o mesmo resumo entra na hora e no dia
+    resumo = Resumo()
+    if row is not None:
+        resumo.somar(Resumo.da_linha(row))
+    resumo.somar(delta)
+    conn.execute(
+        f'INSERT OR REPLACE INTO {tabela} ({coluna}, metrica, total, cms, topk, hll) VALUES (?,?,?,?,?,?)',
+        (periodo, metrica, resumo.cms.total, resumo.cms.dump(), resumo.topk.dump(), resumo.hll.dump())
+    )
+
+
+def _podar(conn):
+    conn.execute(f"DELETE FROM {TABELA_HORA} WHERE hora < strftime('%Y-%m-%d %H:00:00', 'now', ?)",
+                 (f'-{ANALYTICS_HOURLY_RETENTION} hours',))
+    conn.execute(f"DELETE FROM {TABELA_DIA} WHERE dia < date('now', ?)",
+                 (f'-{ANALYTICS_DAILY_RETENTION} days',))
+
+
+def reconstruir(conn=None) -> int:
+    """
+    Recalcula os sketches a partir de logs_acesso (backfill), um dia por
+    vez em memória. Dias além da retenção da tabela quente vêm dos
+    segmentos arquivados. Com `conn` informada, o commit fica a cargo de
+    quem chamou. Retorna o número de logs lidos.
+    """
+    own  = conn is None
+    conn = conn or connect()
+    try:
+        conn.execute(f'DELETE FROM {TABELA_HORA}')
+        conn.execute(f'DELETE FROM {TABELA_DIA}')
+        corte_hora = _fmt(datetime.now(timezone.utc) - timedelta(hours=ANALYTICS_HOURLY_RETENTION - 1))
+        total, dia, horas = 0, None, {}
+
+        def gravar():
+            dias = {}
+            for (hora, metrica), resumo in horas.items():
+                if hora >= corte_hora:
+                    _fundir(conn, TABELA_HORA, 'hora', hora, metrica, resumo)
+                dias.setdefault(metrica, Resumo()).somar(resumo)
+            for metrica, resumo in dias.items():
+                _fundir(conn, TABELA_DIA, 'dia', dia, metrica, resumo)
+
+        for lote in _logs_em_ordem(conn):
+            for r in lote:
+                if r[4][:10] != dia:
+                    if dia is not None:
+                        gravar()
+                    dia, horas = r[4][:10], {}
+                hora = _hora(r[4])
+                for metrica, extrair in METRICAS.items():
+                    chave = extrair(r)
+                    if chave:
+                        resumo = horas.get((hora, metrica))
+                        if resumo is None:
+                            resumo = horas[(hora, metrica)] = Resumo()
+                        resumo.add(chave)
+            total += len(lote)
+        if dia is not None:
+            gravar()
+        if own:
+            conn.commit()
+    finally:
+        if own:
+            conn.close()
+    return total
+
+
+def _logs_em_ordem(conn):
+    """
+    Lotes dos logs da retenção diária em ordem de timestamp: segmentos
+    arquivados (do mais antigo) e depois a tabela quente. O arquivamento
+    move sempre os mais antigos, então as fontes não se intercalam.
+    """
+    sql = ("SELECT usuario, acao, status, ip, timestamp, detalhes FROM logs_acesso "
+           "WHERE timestamp >= date('now', ?) ORDER BY timestamp")
+    params = (f'-{ANALYTICS_DAILY_RETENTION} days',)
+    desde = (datetime.now(timezone.utc) - timedelta(days=ANALYTICS_DAILY_RETENTION)).strftime('%Y-%m-%d')
+    for caminho in reversed(list(segmentos(desde))):
+        arquivo = abrir_segmento(caminho)
+        try:
+            yield from _em_lotes(arquivo.execute(sql, params))
+        finally:
+            arquivo.close()
+    yield from _em_lotes(conn.execute(sql, params))
+
+
+def _em_lotes(cursor, tamanho: int = 1000):
+    while True:
+        lote = cursor.fetchmany(tamanho)
+        if not lote:
+            return
+        yield lote
+
+
+analytics = Analytics()
+
+
+def encerrar():
+    """Grava a fila de logs e faz o checkpoint final (saída do processo)."""
+    log_writer.stop()
+    try:
+        analytics.checkpoint()
+    except Exception:
+        logger.exception('Falha no checkpoint final do analytics.')
+
+
+atexit.register(encerrar)
+
+os.register_at_fork(after_in_child=analytics._apos_fork)
@@ -7,7 +7,15 @@ import os
 from flask import Flask, send_from_directory, jsonify
 from flask_cors import CORS
 
-from models import init_db
+from analytics import reconstruir as reconstruir_analytics
+from assets import AssetTable
+from metrics import init_app as init_metrics
+from migrations import init_db
+from middleware import denylist
+from models import connect, init_app as init_db_pool, preencher_pools, rebuild_rollups
+from retencao import arquivar_tudo, iniciar_arquivamento, segmentos
+from snapshots import iniciar_snapshots, snapshots
+from throttle import iniciar_resumos
 from routes.auth      import auth_bp
 from routes.recursos  import recursos_bp
 from routes.usuarios  import usuarios_bp
@@ -19,55 +27,134 @@ from routes.seguranca import seguranca_bp
 # ──────────────────────────────────────────────────────────────
 BASE_DIR     = os.path.dirname(__file__)
 FRONTEND_DIR = os.path.join(BASE_DIR, '..', 'frontend')
-LOGO_DIR     = os.path.join(BASE_DIR, '..', 'Logo')
-
-app = Flask(__name__, static_folder=None)
-app.secret_key = os.environ.get('SECRET_KEY', 'wayne-industries-secret-key-2024')
-
-# CORS permissivo para dev (restrinja em produção)
-CORS(app, supports_credentials=True)
-
-# ──────────────────────────────────────────────────────────────
-# Registro dos blueprints de API
-# ──────────────────────────────────────────────────────────────
-app.register_blueprint(auth_bp,      url_prefix='/api')
-app.register_blueprint(recursos_bp,  url_prefix='/api')
-app.register_blueprint(usuarios_bp,  url_prefix='/api')
-app.register_blueprint(dashboard_bp, url_prefix='/api')
-app.register_blueprint(seguranca_bp, url_prefix='/api')
-
-
-# ──────────────────────────────────────────────────────────────
-# Servir frontend estático
-# ──────────────────────────────────────────────────────────────
-@app.route('/')
-def index():
-    return send_from_directory(FRONTEND_DIR, 'index.html')
-
-
-@app.route('/Logo/<path:filename>')
-def serve_logo(filename):
-    """Serve os arquivos de logo originais."""
-    return send_from_directory(LOGO_DIR, filename)
-
-
-@app.route('/<path:filename>')
-def serve_frontend(filename):
-    """Serve qualquer arquivo do diretório frontend."""
-    return send_from_directory(FRONTEND_DIR, filename)
-
-
-# ──────────────────────────────────────────────────────────────
-# Tratamento de erros global
-# ──────────────────────────────────────────────────────────────
-@app.errorhandler(404)
-def not_found(_):
-    return jsonify({'error': 'Rota não encontrada.'}), 404
-
-
-@app.errorhandler(500)
-def server_error(exc):
-    return jsonify({'error': f'Erro interno do servidor: {exc}'}), 500
+# A pasta de logos é 'Logo/' na documentação e 'logo/' no repositório —
+# usa a que existir (importa em sistemas de arquivos case-sensitive)
+LOGO_DIR     = next(
+    (d for d in (os.path.join(BASE_DIR, '..', n) for n in ('Logo', 'logo')) if os.path.isdir(d)),
+    os.path.join(BASE_DIR, '..', 'Logo'),
+)
+
+
+def create_app(config: dict = None) -> Flask:
+    """
+    Monta a aplicação. `config` sobrescreve chaves do app.config (ex.:
+    {'TESTING': True}); o restante da configuração vem do ambiente.
+    """
+    app = Flask(__name__, static_folder=None)
+    app.secret_key = os.environ.get('SECRET_KEY', 'wayne-industries-secret-key-2024')
+    app.config.update(config or {})
+
+    # CORS permissivo para dev (restrinja em produção)
+    CORS(app, supports_credentials=True)
+
+    # Pool de conexões SQLite liberado no teardown de cada requisição
+    init_db_pool(app)
+
+    # Latência por rota, consultas por requisição e /api/metrics
+    init_metrics(app)
+
+    # ──────────────────────────────────────────────────────────
+    # Registro dos blueprints de API
+    # ──────────────────────────────────────────────────────────
+    app.register_blueprint(auth_bp,      url_prefix='/api')
+    app.register_blueprint(recursos_bp,  url_prefix='/api')
+    app.register_blueprint(usuarios_bp,  url_prefix='/api')
+    app.register_blueprint(dashboard_bp, url_prefix='/api')
+    app.register_blueprint(seguranca_bp, url_prefix='/api')
+
+    # ──────────────────────────────────────────────────────────
+    # Servir frontend estático
+    # ──────────────────────────────────────────────────────────
+    # Tabela de assets montada uma vez: URLs versionadas, HTML reescrito e
+    # corpos pré-comprimidos servidos direto da memória
+    assets = app.extensions['assets'] = AssetTable.build({'/': FRONTEND_DIR, '/Logo': LOGO_DIR})
+
+    def _send_static(directory, url, filename):
+        resp = assets.serve(url)
+        if resp is None:
+            # Arquivo fora da tabela (criado depois da inicialização)
+            resp = send_from_directory(directory, filename)
+        return resp
+
+    @app.route('/')
+    def index():
+        return _send_static(FRONTEND_DIR, '/index.html', 'index.html')
+
+    @app.route('/Logo/<path:filename>')
+    def serve_logo(filename):
+        """Serve os arquivos de logo originais."""
+        return _send_static(LOGO_DIR, f'/Logo/{filename}', filename)
+
+    @app.route('/<path:filename>')
+    def serve_frontend(filename):
+        """Serve qualquer arquivo do diretório frontend."""
+        return _send_static(FRONTEND_DIR, f'/{filename}', filename)
+
+    # ──────────────────────────────────────────────────────────
+    # Tratamento de erros global
+    # ──────────────────────────────────────────────────────────
+    @app.errorhandler(404)
+    def not_found(_):
+        return jsonify({'error': 'Rota não encontrada.'}), 404
+
+    @app.errorhandler(500)
+    def server_error(exc):
+        return jsonify({'error': f'Erro interno do servidor: {exc}'}), 500
+
+    # ──────────────────────────────────────────────────────────
+    # Comandos de manutenção (flask --app app <comando>)
+    # ──────────────────────────────────────────────────────────
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Aplica as migrações de schema pendentes."""
+        init_db()
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Recalcula os rollups de atividade a partir de logs_acesso e do arquivo."""
+        rebuild_rollups(arquivos=list(segmentos()))
+        print("[OK] Rollups de logs recalculados.")
+
+    @app.cli.command('rebuild-analytics')
+    def rebuild_analytics_command():
+        """Recalcula os sketches do analytics a partir de logs_acesso."""
+        total = reconstruir_analytics()
+        print(f"[OK] Analytics recalculado a partir de {total} logs.")
+
+    @app.cli.command('archive-logs')
+    def archive_logs_command():
+        """Move para os segmentos mensais os logs além da retenção."""
+        total = arquivar_tudo()
+        print(f"[OK] {total} logs arquivados.")
+
+    @app.cli.command('snapshot')
+    def snapshot_command():
+        """Gera agora o snapshot somente leitura usado pelos relatórios."""
+        duracao = snapshots.gerar()
+        print(f"[OK] Snapshot gerado em {duracao:.2f}s.")
+
+    return app
+
+
+def aquecer(app: Flask):
+    """
+    Prepara um processo recém-iniciado antes de aceitar tráfego: abre as
+    conexões dos pools, carrega a denylist e traz para a memória (page
+    cache do SO) as páginas das consultas mais frequentes.
+    """
+    preencher_pools()
+    conn = connect(readonly=True)
+    try:
+        conn.execute('SELECT COUNT(*) FROM recursos').fetchone()
+        conn.execute('SELECT * FROM areas').fetchall()
+        conn.execute('SELECT * FROM logs_acesso ORDER BY timestamp DESC, id DESC LIMIT 100').fetchall()
+        conn.execute("SELECT SUM(total) FROM logs_rollup_hora WHERE hora >= datetime('now', '-1 day')").fetchone()
+        conn.execute("SELECT rowid FROM recursos_fts WHERE recursos_fts MATCH 'a*' LIMIT 1").fetchall()
+    finally:
+        conn.close()
+    denylist.carregar()
+    with app.test_client() as client:
+        client.get('/')
 
 
 # ──────────────────────────────────────────────────────────────
@@ -78,6 +165,9 @@ if __name__ == '__main__':
     print("  WAYNE INDUSTRIES SECURITY PLATFORM")
     print("=" * 50)
     init_db()
+    iniciar_arquivamento()
+    iniciar_snapshots()
+    iniciar_resumos()
     print("[OK] Acesse: http://localhost:5000")
     print("=" * 50)
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
@@ -0,0 +1,111 @@
+"""
+Wayne Industries Security Platform
+Pipeline de assets estáticos — fingerprint, pré-compressão e tabela em memória
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response, request
+
+# Extensões que recebem fingerprint no nome e cache imutável
+FINGERPRINT_EXT = ('.css', '.js', '.png')
+# Tipos que valem a pena pré-comprimir (PNG já é comprimido)
+COMPRESS_EXT    = ('.css', '.js', '.html', '.svg', '.json', '.txt')
+
+CACHE_IMMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_REVALIDATE = 'no-cache'
+
+
+class Asset:
+    __slots__ = ('body', 'gzip_body', 'mimetype', 'etag', 'cache_control')
+
+    def __init__(self, body: bytes, mimetype: str, immutable: bool, comprimir: bool):
+        self.body     = body
+        self.mimetype = mimetype
+        self.etag     = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_control = CACHE_IMMUTABLE if immutable else CACHE_REVALIDATE
+        self.gzip_body = None
+        if comprimir:
+            packed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(packed) < len(body):
+                self.gzip_body = packed
+
+
+class AssetTable:
+    """
+    Todos os arquivos do frontend carregados uma vez na inicialização:
+    CSS/JS/PNG ganham uma URL com hash do conteúdo, o HTML é reescrito
+    para apontar para ela e cada corpo é guardado já comprimido em gzip.
+    """
+
+    def __init__(self):
+        self._assets = {}
+
+    @classmethod
+    def build(cls, mounts: dict):
+        """`mounts` mapeia prefixo de URL -> diretório (ex.: {'/': FRONTEND_DIR})."""
+        table = cls()
+        arquivos = {}
+        for prefixo, base in mounts.items():
+            if not os.path.isdir(base):
+                continue
+            for raiz, _, nomes in os.walk(base):
+                for nome in nomes:
+                    caminho = os.path.join(raiz, nome)
+                    rel = os.path.relpath(caminho, base).replace(os.sep, '/')
+                    with open(caminho, 'rb') as fh:
+                        arquivos[prefixo.rstrip('/') + '/' + rel] = fh.read()
+
+        # 1) assets versionados: /css/style.css -> /css/style.<hash>.css
+        renomes = {}
+        for url, body in arquivos.items():
+            raiz, ext = os.path.splitext(url)
+            if ext.lower() in FINGERPRINT_EXT:
+                renomes[url] = f'{raiz}.{hashlib.sha256(body).hexdigest()[:10]}{ext}'
+
+        # 2) HTML reescrito para as URLs versionadas
+        padrao = re.compile(r'(src|href)="(' + '|'.join(re.escape(u) for u in renomes) + r')"') if renomes else None
+        for url, body in arquivos.items():
+            mimetype = mimetypes.guess_type(url)[0] or 'application/octet-stream'
+            comprimir = os.path.splitext(url)[1].lower() in COMPRESS_EXT
+            if url.endswith('.html') and padrao:
+                body = padrao.sub(lambda m: f'{m.group(1)}="{renomes[m.group(2)]}"', body.decode('utf-8')).encode('utf-8')
+            # A URL original continua válida, mas sempre revalidada
+            table._assets[url] = Asset(body, mimetype, immutable=False, comprimir=comprimir)
+            if url in renomes:
+                table._assets[renomes[url]] = Asset(body, mimetype, immutable=True, comprimir=comprimir)
+        return table
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._assets
+
+    def __len__(self) -> int:
+        return len(self._assets)
+
+    def serve(self, url: str):
+        """Responde com o asset, negociando gzip e tratando If-None-Match."""
+        asset = self._assets.get(url)
+        if asset is None:
+            return None
+        usa_gzip = asset.gzip_body is not None and 'gzip' in request.accept_encodings
+        # Cada codificação é uma representação distinta, com ETag próprio
+        etag = asset.etag + ('-gz' if usa_gzip else '')
+
+        resp = Response(mimetype=asset.mimetype)
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = asset.cache_control
+        if asset.gzip_body is not None:
+            resp.vary.add('Accept-Encoding')
+        if request.if_none_match.contains(etag):
+            resp.status_code = 304
+            return resp
+        if usa_gzip:
+            resp.set_data(asset.gzip_body)
+            resp.headers['Content-Encoding'] = 'gzip'
+        else:
+            resp.set_data(asset.body)
+        return resp
@@ -0,0 +1,418 @@
+"""
+Wayne Industries Security Platform
+Benchmark de carga — gera bancos sintéticos em escala de produção, dispara
+requisições concorrentes contra a API e compara execuções
+
+Uso (a partir de backend/):
+  python bench.py gerar   --banco /tmp/bench.db --logs 10000000 --recursos 100000
+  python bench.py rodar   --banco /tmp/bench.db --concorrencia 8 --duracao 30 --saida base.json
+  python bench.py rodar   --url http://127.0.0.1:5000 --duracao 30 --saida novo.json
+  python bench.py comparar base.json novo.json --tolerancia 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+SENHA_BENCH = 'bench123'
+LOTE_INSERT = 50000
+
+ACOES = (
+    ('Login', 30), ('Logout', 10), ('Acesso Negado', 4), ('Criar Recurso', 8),
+    ('Editar Recurso', 12), ('Remover Recurso', 3), ('Alterar Área', 5),
+    ('Editar Usuário', 2), ('Exportar Logs', 1),
+)
+STATUS_LOG = (('sucesso', 85), ('falha', 10), ('alerta', 5))
+CATEGORIAS = ('Veiculo', 'Aeronave', 'TI', 'Equipamento', 'Infraestrutura', 'Seguranca')
+STATUS_RECURSO = (('ativo', 80), ('manutencao', 12), ('inativo', 8))
+LOCAIS = ('Garagem', 'Hangar', 'Data Center', 'Armaria', 'Sala de Energia', 'Sala de Controle',
+          'Enfermaria', 'Laboratório', 'Cobertura', 'Subsolo')
+NOMES = ('Batmóvel', 'Batwing', 'Servidor', 'Traje', 'Gerador', 'Câmera', 'Sensor', 'Drone',
+         'Rádio', 'Helicóptero', 'Kit Médico', 'Terminal', 'Scanner', 'Holofote', 'Cofre')
+TERMOS_BUSCA = ('bat', 'serv', 'hangar', 'drone', 'sensor', 'garagem', 'kit med', 'camera')
+
+# Peso de cada operação na mistura de carga
+MISTURA = (
+    ('login',            5),
+    ('dashboard',       20),
+    ('logs',            20),
+    ('logs_filtrados',  10),
+    ('recursos',        20),
+    ('recursos_busca',  10),
+    ('recurso_crud',     5),
+    ('areas',           10),
+)
+
+
+# ──────────────────────────────────────────────────────────────
+# Geração de dados
+# ──────────────────────────────────────────────────────────────
+def _escolha_ponderada(rng, opcoes):
+    valores, pesos = zip(*opcoes)
+    return lambda: rng.choices(valores, pesos)[0]
+
+
+def gerar(args):
+    """Cria um banco novo com os volumes pedidos (reprodutível por --semente)."""
+    for caminho in filter(None, (args.banco, args.banco_logs)):
+        if os.path.exists(caminho):
+            if not args.sobrescrever:
+                sys.exit(f'{caminho} já existe (use --sobrescrever).')
+            for sufixo in ('', '-wal', '-shm'):
+                if os.path.exists(caminho + sufixo):
+                    os.remove(caminho + sufixo)
+
+    import migrations
+    import models
+    migrations.init_db()
+    rng  = random.Random(args.semente)
+    conn = models.connect()
+    s    = models.LOGS_SCHEMA
+    inicio = time.perf_counter()
+
+    # Usuários: 1 em cada 10 é gerente (usados pelos workers do `rodar`)
+    senha = models.hash_password(SENHA_BENCH)
+    conn.executemany(
+        'INSERT OR IGNORE INTO usuarios (nome, username, password_hash, cargo, role) VALUES (?,?,?,?,?)',
+        ((f'Usuário Bench {i}', f'bench{i:06d}', senha, 'Analista',
+          'gerente' if i % 10 == 0 else 'funcionario') for i in range(args.usuarios))
+    )
+    conn.commit()
+    usernames = [f'bench{i:06d}' for i in range(args.usuarios)] or ['admin']
+
+    # Recursos (o trigger FTS indexa cada linha)
+    status_recurso = _escolha_ponderada(rng, STATUS_RECURSO)
+    conn.executemany(
+        'INSERT INTO recursos (nome, categoria, status, localizacao) VALUES (?,?,?,?)',
+        ((f'{rng.choice(NOMES)} {rng.choice(("MK", "WI", "X"))}-{i}', rng.choice(CATEGORIAS),
+          status_recurso(), f'{rng.choice(LOCAIS)} {rng.randint(1, 40)}') for i in range(args.recursos))
+    )
+    conn.commit()
+    print(f'[OK] {args.usuarios} usuários e {args.recursos} recursos ({time.perf_counter() - inicio:.1f}s)')
+
+    # Logs: sem trigger de rollup nem índices durante a carga — recriados
+    # pelo LOGS_DDL no fim, com os rollups recalculados de uma vez
+    indices = [r[0] for r in conn.execute(
+        f"SELECT name FROM {s}.sqlite_master WHERE type = 'index' AND tbl_name = 'logs_acesso' "
+        "AND sql IS NOT NULL"
+    )]
+    conn.execute(f'DROP TRIGGER IF EXISTS {s}.trg_logs_rollup')
+    for nome in indices:
+        conn.execute(f'DROP INDEX IF EXISTS {s}.{nome}')
+    conn.execute(f'PRAGMA {s}.synchronous = OFF')
+
+    acao, status_log = _escolha_ponderada(rng, ACOES), _escolha_ponderada(rng, STATUS_LOG)
+    ips   = [f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}' for _ in range(5000)]
+    fim   = datetime.now(timezone.utc).replace(tzinfo=None)
+    passo = timedelta(days=args.dias) / max(args.logs, 1)
+    t0    = fim - timedelta(days=args.dias)
+    gerados = 0
+    while gerados < args.logs:
+        n = min(LOTE_INSERT, args.logs - gerados)
+        conn.executemany(
+            'INSERT INTO logs_acesso (usuario, acao, status, ip, timestamp, detalhes) VALUES (?,?,?,?,?,?)',
+            ((rng.choice(usernames), acao(), status_log(), rng.choice(ips),
+              (t0 + passo * (gerados + k)).strftime('%Y-%m-%d %H:%M:%S'), 'Gerado pelo benchmark')
+             for k in range(n))
+        )
+        conn.commit()
+        gerados += n
+        print(f'\r  logs: {gerados}/{args.logs}', end='', flush=True)
+    print()
+
+    conn.executescript(migrations.LOGS_DDL.format(s=s))
+    models.rebuild_rollups(conn)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    print(f'[OK] {args.logs} logs em {args.dias} dias ({time.perf_counter() - inicio:.1f}s)')
+
+
+# ──────────────────────────────────────────────────────────────
+# Clientes (in-process ou HTTP)
+# ──────────────────────────────────────────────────────────────
+class ClienteInterno:
+    """Chama o app Flask no próprio processo pelo test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, metodo, url, corpo=None, token=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        resp = self.client.open(url, method=metodo, json=corpo, headers=headers)
+        return resp.status_code, resp.get_json(silent=True)
+
+
+class ClienteHTTP:
+    """Chama um servidor WSGI já no ar (ex.: python app.py)."""
+
+    def __init__(self, base):
+        self.base = base.rstrip('/')
+
+    def request(self, metodo, url, corpo=None, token=None):
+        dados = json.dumps(corpo).encode() if corpo is not None else None
+        req = urllib.request.Request(self.base + url, data=dados, method=metodo)
+        req.add_header('Content-Type', 'application/json')
+        if token:
+            req.add_header('Authorization', f'Bearer {token}')
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                status, bruto = resp.status, resp.read()
+        except urllib.error.HTTPError as exc:
+            status, bruto = exc.code, exc.read()
+        try:
+            return status, json.loads(bruto)
+        except ValueError:
+            return status, None
+
+
+# ──────────────────────────────────────────────────────────────
+# Carga
+# ──────────────────────────────────────────────────────────────
+class Worker(threading.Thread):
+    """Executa operações sorteadas da MISTURA até o fim da janela."""
+
+    def __init__(self, cliente, username, semente, ate, aquecimento_ate):
+        super().__init__(daemon=True)
+        self.cliente  = cliente
+        self.username = username
+        self.rng      = random.Random(semente)
+        self.ate      = ate
+        self.aquecimento_ate = aquecimento_ate
+        self.amostras = {}   # operação -> [latências em s]
+        self.erros    = {}   # operação -> total
+        self.token    = None
+        ops, pesos    = zip(*MISTURA)
+        self._sortear = lambda: self.rng.choices(ops, pesos)[0]
+
+    def run(self):
+        try:
+            self.token = self._login()
+        except RuntimeError as exc:
+            print(f'[ERRO] {exc}', file=sys.stderr)
+            return
+        while time.perf_counter() < self.ate:
+            op = self._sortear()
+            inicio = time.perf_counter()
+            ok = getattr(self, f'op_{op}')()
+            fim = time.perf_counter()
+            if inicio < self.aquecimento_ate:
+                continue
+            if ok:
+                self.amostras.setdefault(op, []).append(fim - inicio)
+            else:
+                self.erros[op] = self.erros.get(op, 0) + 1
+
+    def _login(self):
+        status, corpo = self.cliente.request('POST', '/api/login',
+                                             {'username': self.username, 'password': self._senha()})
+        if status != 200:
+            raise RuntimeError(f'Login de {self.username} falhou ({status}).')
+        return corpo['token']
+
+    def _senha(self):
+        return SENHA_BENCH if self.username.startswith('bench') else 'wayne123'
+
+    def _get(self, url):
+        status, _ = self.cliente.request('GET', url, token=self.token)
+        return status in (200, 304)
+
+    # ── Operações ────────────────────────────────────────────
+    def op_login(self):
+        try:
+            self.token = self._login()
+            return True
+        except RuntimeError:
+            return False
+
+    def op_dashboard(self):
+        return self._get('/api/dashboard/stats')
+
+    def op_logs(self):
+        return self._get('/api/logs?limit=100')
+
+    def op_logs_filtrados(self):
+        status = self.rng.choice(('falha', 'alerta'))
+        return self._get(f'/api/logs?limit=100&status={status}')
+
+    def op_recursos(self):
+        pagina = self.rng.randint(1, 20)
+        return self._get(f'/api/recursos?pagina={pagina}&por_pagina=50')
+
+    def op_recursos_busca(self):
+        termo = urllib.request.quote(self.rng.choice(TERMOS_BUSCA))
+        return self._get(f'/api/recursos?q={termo}')
+
+    def op_areas(self):
+        return self._get('/api/areas')
+
+    def op_recurso_crud(self):
+        status, corpo = self.cliente.request('POST', '/api/recursos', {
+            'nome': f'Bench {self.rng.random():.6f}', 'categoria': self.rng.choice(CATEGORIAS),
+        }, token=self.token)
+        if status != 201:
+            return False
+        rid = corpo['id']
+        status, _ = self.cliente.request('PUT', f'/api/recursos/{rid}', {
+            'nome': corpo['nome'], 'categoria': corpo['categoria'], 'status': 'manutencao',
+            'localizacao': 'Bancada de testes',
+        }, token=self.token)
+        if status != 200:
+            return False
+        status, _ = self.cliente.request('DELETE', f'/api/recursos/{rid}', token=self.token)
+        return status == 200
+
+
+def _percentil(ordenadas, p):
+    if not ordenadas:
+        return 0.0
+    k = max(0, min(len(ordenadas) - 1, round(p / 100 * len(ordenadas) + 0.5) - 1))
+    return ordenadas[k]
+
+
+def rodar(args):
+    """Dispara a carga e imprime/salva throughput e p50/p95/p99 por operação."""
+    if args.url:
+        cliente = lambda: ClienteHTTP(args.url)
+        alvo = args.url
+    else:
+        if not os.path.exists(args.banco):
+            sys.exit(f'{args.banco} não existe — rode `python bench.py gerar` antes.')
+        from app import create_app
+        flask_app = create_app()
+        cliente = lambda: ClienteInterno(flask_app)
+        alvo = 'interno'
+
+    usuarios = [f'bench{i:06d}' for i in range(0, args.usuarios, 10)] or ['admin']
+    agora = time.perf_counter()
+    aquecimento_ate = agora + args.aquecimento
+    ate = aquecimento_ate + args.duracao
+    workers = [
+        Worker(cliente(), usuarios[i % len(usuarios)], args.semente + i, ate, aquecimento_ate)
+        for i in range(args.concorrencia)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    resultado = {
+        'meta': {
+            'alvo': alvo, 'concorrencia': args.concorrencia, 'duracao': args.duracao,
+            'data': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(), 'plataforma': platform.platform(),
+        },
+        'operacoes': {},
+    }
+    for op, _ in MISTURA:
+        lat = sorted(x for w in workers for x in w.amostras.get(op, ()))
+        erros = sum(w.erros.get(op, 0) for w in workers)
+        if not lat and not erros:
+            continue
+        resultado['operacoes'][op] = {
+            'n': len(lat), 'erros': erros, 'rps': len(lat) / args.duracao,
+            'p50': _percentil(lat, 50) * 1000, 'p95': _percentil(lat, 95) * 1000,
+            'p99': _percentil(lat, 99) * 1000, 'max': (lat[-1] if lat else 0) * 1000,
+        }
+    total = sum(o['n'] for o in resultado['operacoes'].values())
+    resultado['meta']['rps_total'] = total / args.duracao
+
+    _imprimir(resultado)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f'[OK] Resultado salvo em {args.saida}')
+
+
+def _imprimir(resultado):
+    meta = resultado['meta']
+    print(f"\nAlvo: {meta['alvo']} · {meta['concorrencia']} workers · {meta['duracao']}s "
+          f"· {meta['rps_total']:.1f} req/s no total")
+    print(f"{'operação':<16}{'n':>8}{'erros':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for op, o in resultado['operacoes'].items():
+        print(f"{op:<16}{o['n']:>8}{o['erros']:>7}{o['rps']:>9.1f}"
+              f"{o['p50']:>9.1f}{o['p95']:>9.1f}{o['p99']:>9.1f}{o['max']:>9.1f}")
+
+
+# ──────────────────────────────────────────────────────────────
+# Comparação
+# ──────────────────────────────────────────────────────────────
+def comparar(args):
+    """Compara duas execuções; sai com código 1 se alguma operação regrediu."""
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)['operacoes']
+    with open(args.novo, encoding='utf-8') as f:
+        novo = json.load(f)['operacoes']
+
+    regrediu = []
+    print(f"{'operação':<16}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}{'req/s':>18}")
+    for op in (o for o, _ in MISTURA if o in base and o in novo):
+        b, n = base[op], novo[op]
+        colunas = []
+        for campo in ('p50', 'p95', 'p99', 'rps'):
+            delta = (n[campo] - b[campo]) / b[campo] * 100 if b[campo] else 0.0
+            colunas.append(f'{n[campo]:.1f} ({delta:+.0f}%)')
+            pior = -delta if campo == 'rps' else delta
+            if campo in ('p95', 'rps') and pior > args.tolerancia:
+                regrediu.append(f'{op} {campo} {delta:+.0f}%')
+        print(f'{op:<16}' + ''.join(f'{c:>18}' for c in colunas))
+
+    if regrediu:
+        print('\n[REGRESSÃO] ' + ', '.join(regrediu))
+        sys.exit(1)
+    print(f'\n[OK] Nenhuma regressão acima de {args.tolerancia:.0f}%.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da API Wayne Industries')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('gerar', help='gera um banco sintético')
+    p.add_argument('--banco', required=True, help='arquivo SQLite a criar')
+    p.add_argument('--banco-logs', help='arquivo separado para os logs (LOGS_DB_PATH)')
+    p.add_argument('--logs', type=int, default=100000)
+    p.add_argument('--recursos', type=int, default=10000)
+    p.add_argument('--usuarios', type=int, default=200)
+    p.add_argument('--dias', type=int, default=30, help='período coberto pelos logs')
+    p.add_argument('--semente', type=int, default=42)
+    p.add_argument('--sobrescrever', action='store_true')
+
+    p = sub.add_parser('rodar', help='executa a carga concorrente')
+    p.add_argument('--banco', help='banco gerado (modo in-process)')
+    p.add_argument('--banco-logs')
+    p.add_argument('--url', help='servidor já no ar, em vez do test client')
+    p.add_argument('--usuarios', type=int, default=200, help='mesmo valor usado no `gerar`')
+    p.add_argument('--concorrencia', type=int, default=8)
+    p.add_argument('--duracao', type=float, default=20, help='segundos medidos')
+    p.add_argument('--aquecimento', type=float, default=3, help='segundos descartados no início')
+    p.add_argument('--semente', type=int, default=42)
+    p.add_argument('--saida', help='arquivo JSON com o resultado')
+
+    p = sub.add_parser('comparar', help='compara dois resultados do `rodar`')
+    p.add_argument('base')
+    p.add_argument('novo')
+    p.add_argument('--tolerancia', type=float, default=10, help='piora máxima aceita (%%)')
+
+    args = parser.parse_args()
+    if args.comando == 'rodar' and not (args.banco or args.url):
+        parser.error('informe --banco (in-process) ou --url (servidor HTTP)')
+
+    # models lê os caminhos do ambiente na importação
+    if getattr(args, 'banco', None):
+        os.environ['DATABASE_PATH'] = os.path.abspath(args.banco)
+    if getattr(args, 'banco_logs', None):
+        os.environ['LOGS_DB_PATH'] = os.path.abspath(args.banco_logs)
+
+    {'gerar': gerar, 'rodar': rodar, 'comparar': comparar}[args.comando](args)
+
+
+if __name__ == '__main__':
+    main()
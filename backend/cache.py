@@ -0,0 +1,194 @@
+"""
+Wayne Industries Security Platform
+Cache de respostas de leitura invalidado por versão de tabela
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response
+
+from coerencia import epocas
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 512))
+RESPONSE_CACHE_TTL  = float(os.environ.get('RESPONSE_CACHE_TTL', 30))
+# Respostas em streaming maiores que isto não são guardadas
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 1048576))
+
+# Diferencia ETags entre execuções (versões locais recomeçam do zero); os
+# workers do serve.py herdam o mesmo valor do processo principal
+_BOOT_ID = os.urandom(8).hex()
+
+
+class TableVersions:
+    """Contadores de versão por tabela, incrementados a cada escrita."""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock     = threading.Lock()
+
+    def bump(self, *tabelas):
+        with self._lock:
+            for t in tabelas:
+                self._versions[t] = self._versions.get(t, 0) + 1
+
+    def definir(self, tabela: str, versao: int):
+        """Adota uma versão vinda de outro processo (só avança)."""
+        with self._lock:
+            if versao > self._versions.get(tabela, 0):
+                self._versions[tabela] = versao
+
+    def snapshot(self, tabelas) -> tuple:
+        return tuple(self._versions.get(t, 0) for t in tabelas)
+
+
+class ResponseCache:
+    """LRU limitado de respostas prontas (corpo + status + content-type)."""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.maxsize  = maxsize
+        self.hits     = 0
+        self.misses   = 0
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+
+    def get(self, key, versions: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != versions or entry[1] <= time.time():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, versions: tuple, ttl: float, value):
+        with self._lock:
+            self._entries[key] = (versions, time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+table_versions = TableVersions()
+response_cache = ResponseCache()
+
+
+def bump(*tabelas):
+    """
+    Invalida as respostas em cache que dependem das tabelas informadas —
+    em todos os workers quando a coerência entre processos está ativa.
+    """
+    if not epocas.ativo:
+        table_versions.bump(*tabelas)
+        return
+    for nome, versao in epocas.avancar(*(f'tabela:{t}' for t in tabelas)).items():
+        table_versions.definir(nome.removeprefix('tabela:'), versao)
+
+
+# Escritas feitas por outros workers
+epocas.ao_mudar('tabela:', lambda nome, versao: table_versions.definir(nome.removeprefix('tabela:'), versao))
+
+
+def cached(*tabelas, ttl: float = RESPONSE_CACHE_TTL, origem=None):
+    """
+    Guarda a resposta do endpoint por (endpoint, query args, role). A entrada
+    é descartada quando alguma das `tabelas` muda de versão ou após `ttl`.
+    `origem()`, se informada, identifica a fonte dos dados (ex.: o snapshot
+    de leitura atual) e conta como mais uma versão.
+
+    Também responde GETs condicionais: o ETag deriva só da chave e das
+    versões, então um If-None-Match válido vira 304 sem executar a consulta.
+    Deve vir depois de @requires, que preenche request.user.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                request.user.get('role'),
+            )
+            versions = table_versions.snapshot(tabelas)
+            if origem is not None:
+                versions += (origem(),)
+            etag = _etag(key, versions, ttl)
+            if request.if_none_match.contains_weak(etag):
+                resp = make_response('', 304)
+                return _validators(resp, etag)
+
+            hit = response_cache.get(key, versions)
+            if hit is not None:
+                body, status, mimetype, extras = hit
+                resp = make_response(body, status)
+                resp.mimetype = mimetype
+                resp.headers.extend(extras)
+                resp.headers['X-Cache'] = 'HIT'
+                return _validators(resp, etag)
+
+            resp = make_response(f(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+            # Headers X-* da rota (ex.: X-Total-Count) fazem parte da resposta
+            extras = [(k, v) for k, v in resp.headers if k.startswith('X-')]
+            guardar = lambda body, status=resp.status_code, mimetype=resp.mimetype: response_cache.put(
+                key, versions, ttl, (body, status, mimetype, extras)
+            )
+            if resp.is_streamed:
+                # Corpo em streaming: guarda uma cópia enquanto é enviado
+                resp.response = _tee(resp.response, guardar)
+            else:
+                guardar(resp.get_data())
+            resp.headers['X-Cache'] = 'MISS'
+            return _validators(resp, etag)
+        return decorated
+    return decorator
+
+
+def _tee(corpo, guardar):
+    """Repassa os chunks e entrega o corpo completo a `guardar` se couber no limite."""
+    partes, tamanho = [], 0
+    try:
+        for chunk in corpo:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if partes is not None:
+                tamanho += len(chunk)
+                if tamanho > RESPONSE_CACHE_MAX_BYTES:
+                    partes = None
+                else:
+                    partes.append(chunk)
+            yield chunk
+    finally:
+        if hasattr(corpo, 'close'):
+            corpo.close()
+    if partes is not None:
+        guardar(b''.join(partes))
+
+
+def _etag(key, versions: tuple, ttl: float) -> str:
+    # A janela de TTL entra no ETag para limitar a validade de respostas que
+    # dependem do relógio (ex.: alertas das últimas 24h) mesmo sem escritas
+    janela = int(time.time() // ttl) if ttl else 0
+    raw = repr((_BOOT_ID, key, versions, janela)).encode()
+    return hashlib.sha1(raw).hexdigest()
+
+
+def _validators(resp, etag: str):
+    resp.set_etag(etag, weak=True)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    resp.vary.add('Authorization')
+    return resp
@@ -0,0 +1,109 @@
+"""
+Wayne Industries Security Platform
+Coerência entre processos — épocas compartilhadas na tabela `epocas`
+"""
+
+import logging
+import os
+import threading
+import time
+
+from models import connect
+
+COHERENCE_INTERVAL = float(os.environ.get('COHERENCE_INTERVAL', 0.5))
+
+logger = logging.getLogger(__name__)
+
+
+class Epocas:
+    """
+    Contadores nomeados no SQLite, avançados a cada mudança de estado que
+    os outros processos precisam enxergar (versão de tabela, revogações,
+    falhas de login). Uma thread lê a tabela a cada COHERENCE_INTERVAL e
+    chama os ouvintes dos nomes que mudaram.
+
+    Desativada (sem custo) com um único processo; serve.py ativa em cada
+    worker quando há mais de um.
+    """
+
+    def __init__(self):
+        self.ativo     = False
+        self._vistas   = {}     # nome -> último valor conhecido
+        self._ouvintes = []     # (prefixo, fn(nome, valor), proprias)
+        self._conn     = None
+        self._lock     = threading.Lock()
+
+    def ao_mudar(self, prefixo: str, fn, proprias: bool = False):
+        """
+        Registra `fn(nome, valor)` para épocas cujo nome começa com `prefixo`.
+        Por padrão só mudanças de outros processos chegam; com `proprias`,
+        as deste processo também, na própria thread que chamou avancar().
+        """
+        self._ouvintes.append((prefixo, fn, proprias))
+
+    def avancar(self, *nomes) -> dict:
+        """Incrementa as épocas e retorna os novos valores ({} se inativa)."""
+        if not self.ativo or not nomes:
+            return {}
+        with self._lock:
+            if self._conn is None:
+                self._conn = connect()
+            with self._conn:
+                valores = {
+                    nome: self._conn.execute(
+                        'INSERT INTO epocas (nome, valor) VALUES (?, 1) '
+                        'ON CONFLICT (nome) DO UPDATE SET valor = valor + 1 RETURNING valor',
+                        (nome,)
+                    ).fetchone()[0]
+                    for nome in nomes
+                }
+            # Mudanças do próprio processo não voltam pelo acompanhamento
+            for nome, valor in valores.items():
+                self._vistas[nome] = max(valor, self._vistas.get(nome, 0))
+        for nome, valor in valores.items():
+            self._disparar(nome, valor, so_proprias=True)
+        return valores
+
+    def atuais(self) -> dict:
+        conn = connect()
+        try:
+            return dict(conn.execute('SELECT nome, valor FROM epocas').fetchall())
+        finally:
+            conn.close()
+
+    def ativar(self):
+        """Carrega os valores atuais e inicia a thread de acompanhamento."""
+        if self.ativo:
+            return
+        self._vistas = self.atuais()
+        self.ativo = True
+        # Estado inicial para os ouvintes (ex.: versões de tabela do cache)
+        for nome, valor in self._vistas.items():
+            self._disparar(nome, valor)
+        threading.Thread(target=self._loop, name='epocas', daemon=True).start()
+
+    def _loop(self):
+        while True:
+            time.sleep(COHERENCE_INTERVAL)
+            try:
+                atuais = self.atuais()
+            except Exception:
+                logger.exception('Falha ao ler as épocas compartilhadas.')
+                continue
+            for nome, valor in atuais.items():
+                with self._lock:
+                    if valor <= self._vistas.get(nome, 0):
+                        continue
+                    self._vistas[nome] = valor
+                self._disparar(nome, valor)
+
+    def _disparar(self, nome: str, valor: int, so_proprias: bool = False):
+        for prefixo, fn, proprias in self._ouvintes:
+            if nome.startswith(prefixo) and (proprias or not so_proprias):
+                try:
+                    fn(nome, valor)
+                except Exception:
+                    logger.exception('Falha no ouvinte de época %s.', nome)
+
+
+epocas = Epocas()
@@ -0,0 +1,258 @@
+"""
+Wayne Industries Security Platform
+Detecção de anomalias em streaming sobre o log de acesso — alertas e
+escalonamento automático do status das áreas
+"""
+
+import logging
+import os
+import threading
+import unicodedata
+from datetime import datetime, timezone
+
+from cache import bump, table_versions
+from coerencia import epocas
+from eventos import publicar_area
+from logwriter import registrar_log
+from models import connect
+from throttle import SlidingWindow
+
+ANOMALY_ENABLED       = os.environ.get('ANOMALY_ENABLED', '1') != '0'
+ANOMALY_WINDOW        = int(os.environ.get('ANOMALY_WINDOW', 60))
+ANOMALY_IP_DENIALS    = int(os.environ.get('ANOMALY_IP_DENIALS', 10))
+ANOMALY_USER_DENIALS  = int(os.environ.get('ANOMALY_USER_DENIALS', 5))
+ANOMALY_AREA_FAILURES = int(os.environ.get('ANOMALY_AREA_FAILURES', 3))
+ANOMALY_AREA_BLOCK    = int(os.environ.get('ANOMALY_AREA_BLOCK', 10))
+# Faixa 'início-fim' em horas locais (vazio desliga) e fuso em horas
+ANOMALY_OFF_HOURS     = os.environ.get('ANOMALY_OFF_HOURS', '22-6')
+ANOMALY_TZ            = int(os.environ.get('ANOMALY_TZ', -3))
+ANOMALY_COOLDOWN      = int(os.environ.get('ANOMALY_COOLDOWN', 300))
+
+# Registros gravados pelo próprio detector (e outras rotinas internas)
+USUARIO_SISTEMA = 'sistema'
+STATUS_FALHA    = ('negado', 'falha')
+NIVEIS_AREA     = ('normal', 'alerta', 'bloqueado')
+
+logger = logging.getLogger(__name__)
+
+
+def _horas_fora(faixa: str) -> frozenset:
+    if not faixa.strip():
+        return frozenset()
+    inicio, fim = (int(h) % 24 for h in faixa.split('-'))
+    horas, h = set(), inicio
+    while h != fim:
+        horas.add(h)
+        h = (h + 1) % 24
+    return frozenset(horas)
+
+
+def _normalizar(texto: str) -> str:
+    sem_acento = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode()
+    return sem_acento.lower()
+
+
+class Regra:
+    """
+    Conta eventos por chave numa janela deslizante (a mesma estrutura do
+    limite de login: custo O(1) por evento, chaves limitadas) e dispara
+    quando a chave atinge `limite`. Limite 0 desliga a regra.
+    """
+
+    def __init__(self, nome: str, limite: int, chave, mensagem, escala: bool = False):
+        self.nome     = nome
+        self.limite   = limite
+        self.chave    = chave       # fn(registro) -> chave ou None
+        self.mensagem = mensagem    # fn(chave, contagem) -> texto do alerta
+        self.escala   = escala      # chave é o id de uma área a escalar
+        self.janela   = SlidingWindow(ANOMALY_WINDOW, limite) if limite > 1 else None
+
+    def avaliar(self, registro, agora: float):
+        """(chave, contagem) quando o evento leva a chave ao limite; senão None."""
+        if self.limite <= 0:
+            return None
+        chave = self.chave(registro)
+        if chave is None:
+            return None
+        if self.janela is None:
+            return chave, 1
+        self.janela.hit(chave, agora)
+        n = self.janela.count(chave, agora)
+        return (chave, n) if n >= self.limite else None
+
+
+class Detector:
+    """
+    Consome os logs assim que gravados (ouvinte do log_writer) e aplica as
+    regras. Um disparo grava um log 'Anomalia' com status 'alerta' (que
+    segue para o feed /eventos) e, nas regras de área, sobe o status da
+    área — normal → alerta → bloqueado; voltar ao normal é manual.
+    """
+
+    def __init__(self):
+        self.ativo     = ANOMALY_ENABLED
+        self._local    = True       # False: os logs chegam pelo banco (via_banco)
+        self._lock     = threading.Lock()
+        self._silencio = {}         # (regra, chave, nível) -> fim do cooldown
+        self._areas    = []         # (id, nome, nome normalizado)
+        self._versao_areas = None
+        self._ultimo   = 0          # maior id lido do banco (via_banco)
+        self._lock_banco = threading.Lock()
+        self._fora     = _horas_fora(ANOMALY_OFF_HOURS)
+        self.regras = [
+            Regra('rajada_ip', ANOMALY_IP_DENIALS,
+                  lambda r: r[3] if r[2] in STATUS_FALHA and r[3] else None,
+                  lambda ip, n: f'{n} tentativas negadas do IP {ip} em {ANOMALY_WINDOW}s'),
+            Regra('rajada_usuario', ANOMALY_USER_DENIALS,
+                  lambda r: r[0] if r[2] in STATUS_FALHA and r[0] else None,
+                  lambda usuario, n: f"{n} tentativas negadas para '{usuario}' em {ANOMALY_WINDOW}s"),
+            Regra('fora_do_horario', 1 if self._fora else 0,
+                  self._fora_do_horario,
+                  lambda usuario, _: f"Acesso de '{usuario}' fora do horário ({ANOMALY_OFF_HOURS}h)"),
+            Regra('falhas_area', ANOMALY_AREA_FAILURES,
+                  self._area_com_falha,
+                  lambda aid, n: f"{n} falhas envolvendo a área '{self._nome_area(aid)}' em {ANOMALY_WINDOW}s",
+                  escala=True),
+        ]
+
+    # ── Entrada ─────────────────────────────────────────────────
+    def ouvir(self, registros):
+        """Ouvinte do log_writer (processo único)."""
+        if self.ativo and self._local:
+            self.processar(registros)
+
+    def via_banco(self, responsavel: bool):
+        """
+        Com vários workers (serve.py): só o `responsavel` detecta, lendo do
+        banco os logs novos de todos os processos a cada mudança de época.
+        """
+        self._local = False
+        if not (self.ativo and responsavel):
+            return
+        conn = connect()
+        try:
+            self._ultimo = conn.execute('SELECT COALESCE(MAX(id), 0) FROM logs_acesso').fetchone()[0]
+        finally:
+            conn.close()
+        epocas.ao_mudar('tabela:logs_acesso', self._do_banco, proprias=True)
+
+    def _do_banco(self, *_):
+        # Chamado pela thread das épocas e pela de gravação (logs próprios)
+        with self._lock_banco:
+            self._ler_banco()
+
+    def _ler_banco(self):
+        conn = connect()
+        try:
+            while True:
+                rows = conn.execute(
+                    'SELECT id, usuario, acao, status, ip, timestamp, detalhes FROM logs_acesso '
+                    'WHERE id > ? ORDER BY id LIMIT 500', (self._ultimo,)
+                ).fetchall()
+                if rows:
+                    self._ultimo = rows[-1]['id']
+                    self.processar([tuple(r)[1:] for r in rows])
+                if len(rows) < 500:
+                    return
+        finally:
+            conn.close()
+
+    # ── Regras ──────────────────────────────────────────────────
+    def processar(self, registros):
+        """Aplica as regras a (usuario, acao, status, ip, timestamp, detalhes)."""
+        disparos = []
+        with self._lock:
+            self._atualizar_areas()
+            for r in registros:
+                if r[0] == USUARIO_SISTEMA:
+                    continue
+                agora = _epoch(r[4])
+                for regra in self.regras:
+                    resultado = regra.avaliar(r, agora)
+                    if resultado is None:
+                        continue
+                    chave, n = resultado
+                    nivel = 'bloqueado' if regra.escala and 0 < ANOMALY_AREA_BLOCK <= n else 'alerta'
+                    if self._silenciado((regra.nome, chave, nivel), agora):
+                        continue
+                    disparos.append((regra, chave, n, nivel, r))
+        # Gravações fora do lock: o alerta volta pela fila de logs
+        for regra, chave, n, nivel, r in disparos:
+            self._disparar(regra, chave, n, nivel, r)
+
+    def _silenciado(self, marca, agora: float) -> bool:
+        if self._silencio.get(marca, 0) > agora:
+            return True
+        if len(self._silencio) > 10000:
+            self._silencio = {k: v for k, v in self._silencio.items() if v > agora}
+        self._silencio[marca] = agora + ANOMALY_COOLDOWN
+        return False
+
+    def _fora_do_horario(self, r):
+        if r[2] != 'sucesso' or not r[0]:
+            return None
+        hora_local = (int(r[4][11:13]) + ANOMALY_TZ) % 24
+        return r[0] if hora_local in self._fora else None
+
+    def _area_com_falha(self, r):
+        if r[2] not in STATUS_FALHA or not self._areas:
+            return None
+        texto = _normalizar(f'{r[1]} {r[5] or ""}')
+        for aid, _, nome in self._areas:
+            if nome in texto:
+                return aid
+        return None
+
+    def _atualizar_areas(self):
+        versao = table_versions.snapshot(('areas',))
+        if versao == self._versao_areas:
+            return
+        conn = connect(readonly=True)
+        try:
+            self._areas = [(r['id'], r['nome'], _normalizar(r['nome']))
+                           for r in conn.execute('SELECT id, nome FROM areas')]
+        finally:
+            conn.close()
+        self._versao_areas = versao
+
+    def _nome_area(self, aid: int) -> str:
+        return next((nome for i, nome, _ in self._areas if i == aid), str(aid))
+
+    # ── Ações ───────────────────────────────────────────────────
+    def _disparar(self, regra: Regra, chave, n: int, nivel: str, r):
+        mensagem = regra.mensagem(chave, n)
+        logger.warning('Anomalia [%s]: %s', regra.nome, mensagem)
+        registrar_log(USUARIO_SISTEMA, 'Anomalia', 'alerta', r[3], f'[{regra.nome}] {mensagem}')
+        if regra.escala:
+            try:
+                self._escalar(chave, nivel, regra.nome)
+            except Exception:
+                logger.exception('Falha ao escalar a área %s.', chave)
+
+    def _escalar(self, aid: int, nivel: str, motivo: str):
+        abaixo = NIVEIS_AREA[:NIVEIS_AREA.index(nivel)]
+        conn = connect()
+        try:
+            with conn:
+                area = conn.execute(
+                    f"UPDATE areas SET status = ?, updated_at = datetime('now') "
+                    f"WHERE id = ? AND status IN ({','.join('?' * len(abaixo))}) RETURNING *",
+                    (nivel, aid, *abaixo)
+                ).fetchone()
+        finally:
+            conn.close()
+        if area is None:
+            return      # já está nesse nível ou acima
+        area = dict(area)
+        bump('areas')
+        # 'sucesso' como na troca manual: só o log 'Anomalia' conta como alerta
+        registrar_log(USUARIO_SISTEMA, 'Alterar Área', 'sucesso', None,
+                      f"Área '{area['nome']}' → {nivel} (automático: {motivo})")
+        publicar_area(area)
+
+
+def _epoch(ts: str) -> float:
+    return datetime.fromisoformat(ts).replace(tzinfo=timezone.utc).timestamp()
+
+
+detector = Detector()
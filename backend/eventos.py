@@ -0,0 +1,188 @@
+"""
+Wayne Industries Security Platform
+Barramento de eventos em processo e stream Server-Sent Events
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+from coerencia import epocas
+from models import connect
+
+SSE_QUEUE_SIZE  = int(os.environ.get('SSE_QUEUE_SIZE', 100))
+SSE_HEARTBEAT   = float(os.environ.get('SSE_HEARTBEAT', 15))
+SSE_MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', 200))
+
+
+class Subscriber:
+    """Assinante com fila própria e limitada."""
+
+    __slots__ = ('queue', 'dropped')
+
+    def __init__(self, maxsize: int):
+        self.queue   = queue.Queue(maxsize=maxsize)
+        self.dropped = False
+
+
+class EventBus:
+    """
+    Pub/sub em processo. `publish` nunca bloqueia: o assinante cuja fila
+    enche (cliente lento) é desconectado em vez de segurar os demais.
+    """
+
+    def __init__(self, max_clients: int = SSE_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._subs = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        with self._lock:
+            if len(self._subs) >= self.max_clients:
+                return None
+            sub = Subscriber(SSE_QUEUE_SIZE)
+            self._subs.add(sub)
+            return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def publish(self, tipo: str, dados):
+        with self._lock:
+            subs = list(self._subs)
+        if not subs:
+            return
+        item = (tipo, dados)
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(item)
+            except queue.Full:
+                sub.dropped = True
+                self.unsubscribe(sub)
+
+    def __len__(self) -> int:
+        return len(self._subs)
+
+
+bus = EventBus()
+
+
+def sse_stream(sub: Subscriber, sessao_ativa=None):
+    """
+    Gera o stream text/event-stream de um assinante, com heartbeats. A cada
+    SSE_HEARTBEAT segundos `sessao_ativa()` é consultada de novo: token
+    expirado ou revogado encerra o stream. Eventos 'log' levam o id da
+    linha no campo `id` (o cliente reenvia o último em Last-Event-ID).
+    """
+    try:
+        yield 'retry: 3000\n\n'
+        proxima = time.monotonic() + SSE_HEARTBEAT
+        while not sub.dropped:
+            try:
+                tipo, dados = sub.queue.get(timeout=max(proxima - time.monotonic(), 0))
+            except queue.Empty:
+                tipo = None
+            if time.monotonic() >= proxima:
+                if sessao_ativa is not None and not sessao_ativa():
+                    return
+                proxima = time.monotonic() + SSE_HEARTBEAT
+                if tipo is None:
+                    yield ': ping\n\n'
+            if tipo is None:
+                continue
+            id_evento = f"id: {dados['id']}\n" if tipo == 'log' else ''
+            yield f'event: {tipo}\n{id_evento}data: {json.dumps(dados, ensure_ascii=False)}\n\n'
+    finally:
+        bus.unsubscribe(sub)
+
+
+def publicar_logs(registros, ids):
+    """Ouvinte do log writer: publica cada linha gravada como evento 'log'."""
+    if _feed_banco.ativo:
+        return
+    for lid, (usuario, acao, status, ip, timestamp, detalhes) in zip(ids, registros):
+        bus.publish('log', {
+            'id': lid, 'usuario': usuario, 'acao': acao, 'status': status,
+            'ip': ip, 'timestamp': timestamp, 'detalhes': detalhes,
+        })
+
+
+def publicar_area(area: dict):
+    """Publica a mudança de status de uma área feita neste processo."""
+    if not _feed_banco.ativo:
+        bus.publish('area', area)
+
+
+class FeedBanco:
+    """
+    Com vários workers, cada um alimenta os próprios clientes SSE a partir
+    do banco: a época da tabela avisa que houve escrita (em qualquer
+    processo) e só as linhas novas são lidas — nada é publicado duas vezes.
+    """
+
+    LOTE = 500
+
+    def __init__(self):
+        self.ativo   = False
+        self._ultimo = None     # maior id de logs_acesso já publicado
+        self._areas  = {}       # id -> (status, updated_at)
+        # Thread das épocas e as que escrevem neste processo chamam juntas
+        self._lock   = threading.Lock()
+
+    def ativar(self):
+        conn = connect()
+        try:
+            self._ultimo = conn.execute('SELECT COALESCE(MAX(id), 0) FROM logs_acesso').fetchone()[0]
+            self._areas  = {r['id']: (r['status'], r['updated_at']) for r in conn.execute('SELECT * FROM areas')}
+        finally:
+            conn.close()
+        self.ativo = True
+        epocas.ao_mudar('tabela:logs_acesso', self._logs, proprias=True)
+        epocas.ao_mudar('tabela:areas', self._areas_alteradas, proprias=True)
+
+    def _logs(self, *_):
+        with self._lock:
+            self._publicar_logs()
+
+    def _publicar_logs(self):
+        conn = connect()
+        try:
+            if not len(bus):
+                self._ultimo = conn.execute('SELECT COALESCE(MAX(id), 0) FROM logs_acesso').fetchone()[0]
+                return
+            while True:
+                rows = conn.execute(
+                    'SELECT id, usuario, acao, status, ip, timestamp, detalhes FROM logs_acesso '
+                    'WHERE id > ? ORDER BY id LIMIT ?', (self._ultimo, self.LOTE)
+                ).fetchall()
+                for r in rows:
+                    self._ultimo = r['id']
+                    bus.publish('log', {k: r[k] for k in ('id', 'usuario', 'acao', 'status', 'ip', 'timestamp', 'detalhes')})
+                if len(rows) < self.LOTE:
+                    return
+        finally:
+            conn.close()
+
+    def _areas_alteradas(self, *_):
+        with self._lock:
+            conn = connect()
+            try:
+                rows = conn.execute('SELECT * FROM areas ORDER BY id').fetchall()
+            finally:
+                conn.close()
+            for r in rows:
+                estado = (r['status'], r['updated_at'])
+                if self._areas.get(r['id']) != estado:
+                    self._areas[r['id']] = estado
+                    bus.publish('area', dict(r))
+
+
+_feed_banco = FeedBanco()
+
+
+def distribuir():
+    """Passa o feed SSE deste worker a ser alimentado pelo banco (serve.py)."""
+    _feed_banco.ativar()
@@ -0,0 +1,252 @@
+"""
+Wayne Industries Security Platform
+Gravação assíncrona (write-behind) do log de acesso
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+from flask import request
+
+from cache import bump
+from models import connect
+
+LOG_QUEUE_SIZE      = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_BATCH_SIZE      = int(os.environ.get('LOG_BATCH_SIZE', 500))
+LOG_FLUSH_INTERVAL  = float(os.environ.get('LOG_FLUSH_INTERVAL', 0.5))
+LOG_ENQUEUE_TIMEOUT = float(os.environ.get('LOG_ENQUEUE_TIMEOUT', 2.0))
+
+INSERT_LOG = 'INSERT INTO logs_acesso (usuario, acao, status, ip, timestamp, detalhes) VALUES (?,?,?,?,?,?)'
+
+logger = logging.getLogger(__name__)
+
+
+class _Marker:
+    """Item de controle na fila: sinaliza o evento após o lote ser gravado."""
+
+    def __init__(self, record=None, stop: bool = False):
+        self.record = record
+        self.stop   = stop
+        self.done   = threading.Event()
+        self.erro   = None      # exceção da gravação de `record`, se falhou
+
+
+class LogWriter:
+    """
+    Fila limitada + thread dedicada que grava os logs em lotes
+    (um executemany por transação), em conexão própria fora do pool.
+    """
+
+    def __init__(self, maxsize: int = LOG_QUEUE_SIZE, batch_size: int = LOG_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue  = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock   = threading.Lock()
+        self._ouvintes = []
+        self._internos = []     # registros gerados pelos ouvintes (ver registrar)
+
+    def adicionar_ouvinte(self, fn, com_ids: bool = False):
+        """
+        Registra `fn(registros)`, chamada pela thread após cada lote gravado.
+        Com `com_ids=True` a chamada é `fn(registros, ids)`, com o id de cada
+        linha em logs_acesso.
+        """
+        self._ouvintes.append((fn, com_ids))
+
+    @property
+    def pendentes(self) -> int:
+        """Itens aguardando gravação (aproximado)."""
+        return self._queue.qsize()
+
+    # ── Produtores ──────────────────────────────────────────────
+    def registrar(self, usuario, acao: str, status: str, ip, detalhes, sync: bool = False):
+        """
+        Enfileira um registro de log. Com `sync=True` só retorna depois que
+        o registro estiver gravado (eventos críticos de auditoria) e propaga
+        a exceção se a gravação falhar.
+        """
+        record = (usuario, acao, status, ip, _agora(), detalhes)
+        if threading.current_thread() is self._thread:
+            # Ouvinte rodando na própria thread de gravação (ex.: alerta da
+            # detecção): o registro sai na mesma conexão, logo após o lote
+            # atual, em vez de esperar vaga na fila que esta thread esvazia
+            self._internos.append(record)
+            return
+        self._ensure_started()
+        if sync:
+            marker = _Marker(record)
+            self._put(marker)
+            marker.done.wait()
+            if marker.erro is not None:
+                raise marker.erro
+            return
+        self._put(record)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Bloqueia até que tudo o que já estava na fila tenha sido gravado."""
+        if not self._alive():
+            return True
+        marker = _Marker()
+        self._put(marker)
+        return marker.done.wait(timeout)
+
+    def stop(self):
+        """Grava o que restou na fila e encerra a thread (chamado no atexit)."""
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            marker = _Marker(stop=True)
+            self._queue.put(marker)
+        thread.join()
+
+    def _put(self, item):
+        # Backpressure: o produtor espera vaga na fila; se ela não abrir
+        # a tempo, grava ele mesmo em vez de descartar o registro
+        try:
+            self._queue.put(item, timeout=LOG_ENQUEUE_TIMEOUT)
+        except queue.Full:
+            logger.warning('Fila de logs cheia — gravando de forma síncrona.')
+            marker = item if isinstance(item, _Marker) else None
+            record = marker.record if marker else item
+            try:
+                if record is not None:
+                    conn = connect()
+                    try:
+                        ids = self._gravar(conn, [record])
+                    finally:
+                        conn.close()
+                    self._notificar([record], ids)
+            except Exception as exc:
+                # Mesmo tratamento da thread: quem espera o marcador recebe
+                # a falha; uma chamada assíncrona não vira erro na requisição
+                logger.exception('Log descartado após falha de gravação: %r', record)
+                if marker is not None:
+                    marker.erro = exc
+            finally:
+                if marker is not None:
+                    marker.done.set()
+
+    # ── Consumidor ──────────────────────────────────────────────
+    def _alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _ensure_started(self):
+        if self._alive():
+            return
+        with self._lock:
+            if self._alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        conn = connect()
+        try:
+            while True:
+                try:
+                    first = self._queue.get(timeout=LOG_FLUSH_INTERVAL)
+                except queue.Empty:
+                    continue
+                batch = [first]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                markers = [i for i in batch if isinstance(i, _Marker)]
+                itens   = [(i, None) for i in batch if not isinstance(i, _Marker)]
+                itens  += [(m.record, m) for m in markers if m.record is not None]
+                self._gravar_lote(conn, itens)
+                while self._internos:
+                    internos, self._internos = self._internos, []
+                    self._gravar_lote(conn, [(record, None) for record in internos])
+                for m in markers:
+                    m.done.set()
+                if any(m.stop for m in markers):
+                    return
+        finally:
+            conn.close()
+
+    def _gravar_lote(self, conn, itens):
+        """Grava [(registro, marcador ou None)] e avisa os ouvintes."""
+        records = [record for record, _ in itens]
+        try:
+            ids = self._gravar(conn, records)
+        except Exception:
+            logger.exception('Falha ao gravar lote de %d logs; tentando um a um.', len(records))
+            records, ids = self._gravar_um_a_um(conn, itens)
+        self._notificar(records, ids)
+
+    def _gravar_um_a_um(self, conn, itens) -> tuple:
+        """
+        Regrava um lote que falhou registro a registro, cada um na sua
+        transação: um registro ruim não leva os outros junto. A falha de
+        um registro síncrono volta para quem espera por ele. Retorna
+        (registros gravados, ids).
+        """
+        gravados, ids = [], []
+        for record, marker in itens:
+            try:
+                ids += self._gravar(conn, [record])
+            except Exception as exc:
+                logger.exception('Log descartado após falha de gravação: %r', record)
+                if marker is not None:
+                    marker.erro = exc
+            else:
+                gravados.append(record)
+        return gravados, ids
+
+    def _apos_fork(self):
+        # A thread de gravação não existe no filho; fila e lock começam limpos
+        self._queue  = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._lock   = threading.Lock()
+        self._internos = []
+
+    def _notificar(self, records, ids):
+        if not records:
+            return
+        for fn, com_ids in self._ouvintes:
+            try:
+                fn(records, ids) if com_ids else fn(records)
+            except Exception:
+                logger.exception('Falha no ouvinte de logs %r.', fn)
+
+    @staticmethod
+    def _gravar(conn, records) -> list:
+        """Grava `records` numa transação e retorna os ids recebidos."""
+        if not records:
+            return []
+        with conn:
+            conn.executemany(INSERT_LOG, records)
+            # AUTOINCREMENT numa única transação de escrita: ids consecutivos
+            ultimo = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        bump('logs_acesso')
+        return list(range(ultimo - len(records) + 1, ultimo + 1))
+
+
+def _agora() -> str:
+    """Timestamp UTC no mesmo formato de datetime('now') do SQLite."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.stop)
+
+os.register_at_fork(after_in_child=log_writer._apos_fork)
+
+
+def registrar_log(usuario, acao: str, status: str, ip=None, detalhes=None, sync: bool = False):
+    """Enfileira um registro em logs_acesso."""
+    log_writer.registrar(usuario, acao, status, ip, detalhes, sync=sync)
+
+
+def registrar_acao(acao: str, detalhes: str, status: str = 'sucesso', sync: bool = False):
+    """Registra uma ação do usuário autenticado na requisição atual."""
+    registrar_log(request.user.get('username'), acao, status, request.remote_addr, detalhes, sync=sync)
@@ -0,0 +1,86 @@
+"""
+Wayne Industries Security Platform
+Apoio às rotas de mutação em lote (validação, ids e resultados por item)
+"""
+
+import logging
+import os
+import sqlite3
+
+BATCH_MAX_ITENS = int(os.environ.get('BATCH_MAX_ITENS', 1000))
+
+# Limite seguro de parâmetros por consulta IN (...)
+_CHUNK = 500
+
+logger = logging.getLogger(__name__)
+
+
+def ler_operacoes(body: dict):
+    """Extrai a lista `operacoes` do corpo. Retorna (operacoes, erro)."""
+    ops = body.get('operacoes')
+    if not isinstance(ops, list) or not ops:
+        return None, ('Envie uma lista não vazia em "operacoes".', 400)
+    if len(ops) > BATCH_MAX_ITENS:
+        return None, (f'Lote excede o máximo de {BATCH_MAX_ITENS} operações.', 413)
+    return ops, None
+
+
+def campo_nao_texto(op: dict, campos):
+    """Primeiro dos `campos` presente em `op` que não é texto (None se todos são)."""
+    return next((c for c in campos if op.get(c) is not None and not isinstance(op[c], str)), None)
+
+
+def falha_do_lote(exc: Exception, conflito: str):
+    """
+    (mensagem, status) fixos para a exceção que abortou o lote: o texto do
+    sqlite fica só no log do servidor. `conflito` descreve uma violação de
+    constraint (ex.: username duplicado).
+    """
+    if isinstance(exc, sqlite3.IntegrityError):
+        return f'Lote não aplicado: {conflito}', 400
+    logger.error('Falha ao aplicar lote.', exc_info=exc)
+    return 'Lote não aplicado: erro interno.', 500
+
+
+def buscar_em_blocos(conn, sql: str, valores):
+    """Executa `sql` (com um único `IN ({})`) em blocos de parâmetros."""
+    valores = list(set(valores))
+    linhas = []
+    for i in range(0, len(valores), _CHUNK):
+        bloco = valores[i:i + _CHUNK]
+        linhas += conn.execute(sql.format(','.join('?' * len(bloco))), bloco).fetchall()
+    return linhas
+
+
+def buscar_por_id(conn, sql: str, ids):
+    """Como buscar_em_blocos, indexando as linhas pela coluna id."""
+    return {r['id']: r for r in buscar_em_blocos(conn, sql, ids)}
+
+
+def proximos_ids(conn, tabela: str, n: int):
+    """
+    Ids que um executemany de `n` INSERTs vai receber numa tabela
+    AUTOINCREMENT. Só é válido dentro de uma transação BEGIN IMMEDIATE.
+    """
+    row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (tabela,)).fetchone()
+    base = row[0] if row else 0
+    return list(range(base + 1, base + n + 1))
+
+
+class Resultados:
+    """Resultado por item, na ordem das operações recebidas."""
+
+    def __init__(self, total: int):
+        self.itens = [None] * total
+
+    def ok(self, indice: int, **dados):
+        self.itens[indice] = {'indice': indice, 'ok': True, **dados}
+
+    def erro(self, indice: int, mensagem: str):
+        self.itens[indice] = {'indice': indice, 'ok': False, 'error': mensagem}
+
+    def falhou(self, indice: int) -> bool:
+        return self.itens[indice] is not None and not self.itens[indice]['ok']
+
+    def resumo(self, **contagens) -> dict:
+        return {**contagens, 'falhas': sum(1 for i in self.itens if not i['ok']), 'resultados': self.itens}
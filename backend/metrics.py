@@ -0,0 +1,205 @@
+"""
+Wayne Industries Security Platform
+Métricas de desempenho — latência por rota, consultas SQL e exposição
+no formato texto do Prometheus em /api/metrics
+"""
+
+import hmac
+import logging
+import os
+import threading
+import time
+
+from flask import Response, request
+
+import models
+from cache import response_cache
+from logwriter import log_writer
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+# Token exigido em /api/metrics (Authorization: Bearer ...). Sem token,
+# o endpoint só responde para localhost.
+METRICS_TOKEN   = os.environ.get('METRICS_TOKEN') or None
+SLOW_QUERY_MS   = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+LATENCIA_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONSULTA_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+QTD_BUCKETS      = (1, 2, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Histograma cumulativo de buckets fixos (não thread-safe sozinho)."""
+
+    __slots__ = ('buckets', 'counts', 'soma', 'total')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts  = [0] * len(buckets)
+        self.soma    = 0.0
+        self.total   = 0
+
+    def observe(self, valor: float):
+        self.soma  += valor
+        self.total += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.counts[i] += 1
+                break
+
+    def linhas(self, nome: str, labels: dict):
+        acumulado = 0
+        for limite, n in zip(self.buckets, self.counts):
+            acumulado += n
+            yield _amostra(f'{nome}_bucket', {**labels, 'le': _num(limite)}, acumulado)
+        yield _amostra(f'{nome}_bucket', {**labels, 'le': '+Inf'}, self.total)
+        yield _amostra(f'{nome}_sum', labels, self.soma)
+        yield _amostra(f'{nome}_count', labels, self.total)
+
+
+class Metrics:
+    """Contadores do processo, atualizados pelos hooks de requisição e do banco."""
+
+    def __init__(self):
+        self._lock       = threading.Lock()
+        self._req        = threading.local()
+        self.latencia    = {}   # (rota, método) -> Histogram
+        self.respostas   = {}   # (rota, método, status) -> total
+        self.consultas   = {}   # rota -> Histogram de consultas por requisição
+        self.duracao_sql = Histogram(CONSULTA_BUCKETS)
+        self.lentas      = 0
+        self.em_andamento = 0
+
+    # ── Hooks de requisição ──────────────────────────────────
+    def inicio(self):
+        self._req.inicio    = time.perf_counter()
+        self._req.consultas = 0
+        self._req.rota      = request.url_rule.rule if request.url_rule else 'nao_encontrada'
+        with self._lock:
+            self.em_andamento += 1
+
+    def fim(self, resp):
+        inicio = getattr(self._req, 'inicio', None)
+        if inicio is None:
+            return resp
+        # Respostas em stream: mede até o início do envio do corpo
+        duracao = time.perf_counter() - inicio
+        rota, metodo = self._req.rota, request.method
+        with self._lock:
+            hist = self.latencia.get((rota, metodo))
+            if hist is None:
+                hist = self.latencia[(rota, metodo)] = Histogram(LATENCIA_BUCKETS)
+            hist.observe(duracao)
+            chave = (rota, metodo, resp.status_code)
+            self.respostas[chave] = self.respostas.get(chave, 0) + 1
+            hist = self.consultas.get(rota)
+            if hist is None:
+                hist = self.consultas[rota] = Histogram(QTD_BUCKETS)
+            hist.observe(self._req.consultas)
+        resp.headers['Server-Timing'] = f'app;dur={duracao * 1000:.1f}, db;desc="{self._req.consultas} consultas"'
+        return resp
+
+    def encerrar(self, _exc=None):
+        if getattr(self._req, 'inicio', None) is None:
+            return
+        self._req.inicio = None
+        with self._lock:
+            self.em_andamento -= 1
+
+    # ── Observador do banco ──────────────────────────────────
+    def consulta(self, sql: str, segundos: float):
+        if getattr(self._req, 'inicio', None) is not None:
+            self._req.consultas += 1
+        with self._lock:
+            self.duracao_sql.observe(segundos)
+            if segundos * 1000 >= SLOW_QUERY_MS:
+                self.lentas += 1
+            else:
+                return
+        logger.warning('Consulta lenta (%.1f ms) em %s: %s', segundos * 1000,
+                       getattr(self._req, 'rota', '-'), ' '.join(sql.split())[:500])
+
+    # ── Exposição ────────────────────────────────────────────
+    def exportar(self) -> str:
+        linhas = []
+        with self._lock:
+            linhas += _cabecalho('wayne_http_requests_total', 'counter', 'Requisições respondidas')
+            for (rota, metodo, status), n in sorted(self.respostas.items()):
+                linhas.append(_amostra('wayne_http_requests_total',
+                                       {'rota': rota, 'metodo': metodo, 'status': status}, n))
+            linhas += _cabecalho('wayne_http_request_duration_seconds', 'histogram',
+                                 'Latência das requisições por rota')
+            for (rota, metodo), hist in sorted(self.latencia.items()):
+                linhas += hist.linhas('wayne_http_request_duration_seconds', {'rota': rota, 'metodo': metodo})
+            linhas += _cabecalho('wayne_http_requests_in_flight', 'gauge', 'Requisições em andamento')
+            linhas.append(_amostra('wayne_http_requests_in_flight', {}, self.em_andamento))
+            linhas += _cabecalho('wayne_db_queries_per_request', 'histogram',
+                                 'Consultas SQL executadas por requisição')
+            for rota, hist in sorted(self.consultas.items()):
+                linhas += hist.linhas('wayne_db_queries_per_request', {'rota': rota})
+            linhas += _cabecalho('wayne_db_query_duration_seconds', 'histogram', 'Duração das consultas SQL')
+            linhas += self.duracao_sql.linhas('wayne_db_query_duration_seconds', {})
+            linhas += _cabecalho('wayne_db_slow_queries_total', 'counter',
+                                 f'Consultas acima de {_num(SLOW_QUERY_MS)} ms')
+            linhas.append(_amostra('wayne_db_slow_queries_total', {}, self.lentas))
+
+        cache = response_cache.stats()
+        linhas += _cabecalho('wayne_response_cache_hits_total', 'counter', 'Acertos do cache de respostas')
+        linhas.append(_amostra('wayne_response_cache_hits_total', {}, cache['hits']))
+        linhas += _cabecalho('wayne_response_cache_misses_total', 'counter', 'Faltas do cache de respostas')
+        linhas.append(_amostra('wayne_response_cache_misses_total', {}, cache['misses']))
+        linhas += _cabecalho('wayne_response_cache_entries', 'gauge', 'Respostas mantidas em cache')
+        linhas.append(_amostra('wayne_response_cache_entries', {}, cache['entries']))
+        linhas += _cabecalho('wayne_log_queue_pending', 'gauge', 'Logs aguardando gravação')
+        linhas.append(_amostra('wayne_log_queue_pending', {}, log_writer.pendentes))
+        return '\n'.join(linhas) + '\n'
+
+
+def _cabecalho(nome: str, tipo: str, ajuda: str):
+    return [f'# HELP {nome} {ajuda}', f'# TYPE {nome} {tipo}']
+
+
+def _amostra(nome: str, labels: dict, valor) -> str:
+    if labels:
+        pares = ','.join(f'{k}="{_escapar(v)}"' for k, v in labels.items())
+        return f'{nome}{{{pares}}} {_num(valor)}'
+    return f'{nome} {_num(valor)}'
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _num(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+metrics = Metrics()
+
+
+def metrics_endpoint():
+    """GET /api/metrics — formato texto do Prometheus."""
+    if METRICS_TOKEN:
+        auth = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth.encode(), f'Bearer {METRICS_TOKEN}'.encode()):
+            return Response('Token inválido.\n', 401, mimetype='text/plain')
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return Response('Defina METRICS_TOKEN para acesso remoto.\n', 403, mimetype='text/plain')
+    return Response(metrics.exportar(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Instala os hooks de medição e a rota /api/metrics."""
+    if not METRICS_ENABLED:
+        return
+    models.observar_consultas(metrics.consulta)
+
+    @app.before_request
+    def _inicio():
+        if request.endpoint != 'metrics':
+            metrics.inicio()
+
+    app.after_request(metrics.fim)
+    app.teardown_request(metrics.encerrar)
+    app.add_url_rule('/api/metrics', 'metrics', metrics_endpoint)
@@ -3,63 +3,126 @@ Wayne Industries Security Platform
 Middleware de autenticação e autorização via JWT
 """
 
+import hashlib
 import os
-import jwt
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
 from functools import wraps
+
+import jwt
 from flask import request, jsonify
 
+from revogacao import Denylist
+
 SECRET_KEY = os.environ.get('SECRET_KEY', 'wayne-industries-secret-key-2024')
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 1024))
+TOKEN_TTL  = timedelta(hours=8)
+
+
+class TokenCache:
+    """
+    LRU limitado de claims já verificadas, indexado pelo hash do token.
+    Cada entrada vale até o `exp` do próprio token.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize  = maxsize
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            claims, exp = item
+            if exp <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, token: str, claims: dict):
+        exp = claims.get('exp')
+        if exp is None:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (claims, exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
 
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
 
-def _decode_token():
+
+token_cache = TokenCache()
+denylist    = Denylist(int(TOKEN_TTL.total_seconds()))
+
+
+def authenticate(token: str):
+    """
+    Retorna (claims, erro) para o token — verificação HMAC só no cache miss;
+    a denylist de revogação é consultada sempre.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return None, ('Token expirado. Faça login novamente.', 401)
+        except jwt.InvalidTokenError:
+            return None, ('Token inválido.', 401)
+        token_cache.put(token, claims)
+    if denylist.revogado(claims):
+        return None, ('Sessão encerrada. Faça login novamente.', 401)
+    return claims, None
+
+
+def sessao_ativa(claims: dict) -> bool:
+    """Claims já autenticadas continuam valendo (sem expirar nem ser revogadas)?"""
+    return claims.get('exp', 0) > time.time() and not denylist.revogado(claims)
+
+
+def decode_token():
     """Decodifica e valida o token JWT do header Authorization."""
     auth_header = request.headers.get('Authorization', '')
     token = auth_header.removeprefix('Bearer ').strip()
     if not token:
         return None, ('Token não fornecido', 401)
-    try:
-        return jwt.decode(token, SECRET_KEY, algorithms=['HS256']), None
-    except jwt.ExpiredSignatureError:
-        return None, ('Token expirado. Faça login novamente.', 401)
-    except jwt.InvalidTokenError:
-        return None, ('Token inválido.', 401)
-
-
-def token_required(f):
-    """Exige que o usuário esteja autenticado."""
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        data, err = _decode_token()
-        if err:
-            return jsonify({'error': err[0]}), err[1]
-        request.user = data
-        return f(*args, **kwargs)
-    return decorated
-
-
-def manager_required(f):
-    """Exige role admin ou gerente."""
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        data, err = _decode_token()
-        if err:
-            return jsonify({'error': err[0]}), err[1]
-        if data.get('role') not in ('admin', 'gerente'):
-            return jsonify({'error': 'Acesso negado — permissão insuficiente.'}), 403
-        request.user = data
-        return f(*args, **kwargs)
-    return decorated
-
-
-def admin_required(f):
-    """Exige role admin."""
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        data, err = _decode_token()
-        if err:
-            return jsonify({'error': err[0]}), err[1]
-        if data.get('role') != 'admin':
-            return jsonify({'error': 'Acesso negado — apenas administradores.'}), 403
-        request.user = data
-        return f(*args, **kwargs)
-    return decorated
+    return authenticate(token)
+
+
+def requires(roles=None):
+    """
+    Exige usuário autenticado e, se `roles` for informado, um dos roles
+    listados. Ex.: @requires(), @requires(roles=('admin', 'gerente')).
+    """
+    allowed = frozenset(roles) if roles else None
+    if allowed == {'admin'}:
+        denied = 'Acesso negado — apenas administradores.'
+    else:
+        denied = 'Acesso negado — permissão insuficiente.'
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            data, err = decode_token()
+            if err:
+                return jsonify({'error': err[0]}), err[1]
+            if allowed is not None and data.get('role') not in allowed:
+                return jsonify({'error': denied}), 403
+            # Cópia: as claims em cache são compartilhadas entre requisições
+            request.user = dict(data)
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
@@ -0,0 +1,396 @@
+"""
+Wayne Industries Security Platform
+Migrações de schema versionadas por PRAGMA user_version
+"""
+
+import sqlite3
+
+from analytics import reconstruir as reconstruir_analytics
+from models import LOGS_SCHEMA, connect, hash_password, rebuild_rollups
+
+# (versão, alvo, descrição, função) — alvo 'main' é o database.db e 'logs'
+# o schema das tabelas de log (o próprio main ou o arquivo LOGS_DB_PATH).
+# A numeração é global; cada arquivo guarda em user_version a maior versão
+# aplicada a ele. Migrações novas entram sempre no fim da lista.
+MIGRACOES = []
+
+
+def migracao(versao: int, alvo: str, descricao: str):
+    def decorator(fn):
+        MIGRACOES.append((versao, alvo, descricao, fn))
+        return fn
+    return decorator
+
+
+BASE_DDL = '''
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome        TEXT NOT NULL,
+        username    TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        cargo       TEXT DEFAULT 'Funcionário',
+        role        TEXT NOT NULL DEFAULT 'funcionario',
+        status      TEXT NOT NULL DEFAULT 'ativo',
+        created_at  TEXT DEFAULT (datetime('now'))
+    );
+
+    CREATE TABLE IF NOT EXISTS recursos (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome        TEXT NOT NULL,
+        categoria   TEXT NOT NULL,
+        status      TEXT NOT NULL DEFAULT 'ativo',
+        localizacao TEXT,
+        created_at  TEXT DEFAULT (datetime('now')),
+        updated_at  TEXT DEFAULT (datetime('now'))
+    );
+
+    CREATE TABLE IF NOT EXISTS areas (
+        id         INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome       TEXT NOT NULL,
+        setor      TEXT,
+        status     TEXT NOT NULL DEFAULT 'normal',
+        updated_at TEXT DEFAULT (datetime('now'))
+    );
+'''
+
+LOGS_DDL = '''
+    CREATE TABLE IF NOT EXISTS {s}.logs_acesso (
+        id        INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario   TEXT,
+        acao      TEXT NOT NULL,
+        status    TEXT NOT NULL,
+        ip        TEXT,
+        timestamp TEXT DEFAULT (datetime('now')),
+        detalhes  TEXT
+    );
+
+    -- Rollups de atividade por hora/dia (UTC), mantidos na mesma
+    -- transação de cada INSERT em logs_acesso pelo trigger abaixo
+    CREATE TABLE IF NOT EXISTS {s}.logs_rollup_hora (
+        hora   TEXT NOT NULL,
+        acao   TEXT NOT NULL,
+        status TEXT NOT NULL,
+        total  INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (hora, acao, status)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS {s}.logs_rollup_dia (
+        dia    TEXT NOT NULL,
+        acao   TEXT NOT NULL,
+        status TEXT NOT NULL,
+        total  INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, acao, status)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS {s}.trg_logs_rollup AFTER INSERT ON logs_acesso
+    BEGIN
+        INSERT INTO logs_rollup_hora (hora, acao, status, total)
+        VALUES (strftime('%Y-%m-%d %H:00:00', COALESCE(NEW.timestamp, datetime('now'))), NEW.acao, NEW.status, 1)
+        ON CONFLICT (hora, acao, status) DO UPDATE SET total = total + 1;
+
+        INSERT INTO logs_rollup_dia (dia, acao, status, total)
+        VALUES (date(COALESCE(NEW.timestamp, datetime('now'))), NEW.acao, NEW.status, 1)
+        ON CONFLICT (dia, acao, status) DO UPDATE SET total = total + 1;
+    END;
+
+    -- Índices de consulta do log: filtros por igualdade + ordem (timestamp, id)
+    CREATE INDEX IF NOT EXISTS {s}.idx_logs_timestamp  ON logs_acesso (timestamp);
+    CREATE INDEX IF NOT EXISTS {s}.idx_logs_usuario_ts ON logs_acesso (usuario, timestamp);
+    CREATE INDEX IF NOT EXISTS {s}.idx_logs_ip_ts      ON logs_acesso (ip, timestamp);
+    CREATE INDEX IF NOT EXISTS {s}.idx_logs_status_ts  ON logs_acesso (status, timestamp);
+    CREATE INDEX IF NOT EXISTS {s}.idx_logs_acao_ts    ON logs_acesso (acao, timestamp);
+'''
+
+
+# Busca textual (FTS5) sobre nome, categoria e localização dos recursos.
+# Tabela de conteúdo externo: o texto fica só em `recursos`; os triggers
+# mantêm o índice invertido em sincronia com INSERT/UPDATE/DELETE.
+RECURSOS_FTS_DDL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS recursos_fts USING fts5(
+        nome, categoria, localizacao,
+        content = 'recursos', content_rowid = 'id',
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_recursos_fts_ai AFTER INSERT ON recursos
+    BEGIN
+        INSERT INTO recursos_fts (rowid, nome, categoria, localizacao)
+        VALUES (NEW.id, NEW.nome, NEW.categoria, NEW.localizacao);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_recursos_fts_ad AFTER DELETE ON recursos
+    BEGIN
+        INSERT INTO recursos_fts (recursos_fts, rowid, nome, categoria, localizacao)
+        VALUES ('delete', OLD.id, OLD.nome, OLD.categoria, OLD.localizacao);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_recursos_fts_au AFTER UPDATE OF nome, categoria, localizacao ON recursos
+    BEGIN
+        INSERT INTO recursos_fts (recursos_fts, rowid, nome, categoria, localizacao)
+        VALUES ('delete', OLD.id, OLD.nome, OLD.categoria, OLD.localizacao);
+        INSERT INTO recursos_fts (rowid, nome, categoria, localizacao)
+        VALUES (NEW.id, NEW.nome, NEW.categoria, NEW.localizacao);
+    END;
+'''
+
+
+# Revogação de sessões (logout e usuários removidos/alterados)
+REVOGACAO_DDL = '''
+    CREATE TABLE IF NOT EXISTS tokens_revogados (
+        jti TEXT PRIMARY KEY,
+        exp INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS revogacoes_usuario (
+        user_id     INTEGER PRIMARY KEY,
+        revogado_em INTEGER NOT NULL    -- epoch em µs (v9; antes, em segundos)
+    );
+'''
+
+# Filtros da listagem de recursos, já na ordem de exibição
+RECURSOS_INDICES_DDL = '''
+    CREATE INDEX IF NOT EXISTS idx_recursos_categoria ON recursos (categoria, status, created_at);
+    CREATE INDEX IF NOT EXISTS idx_recursos_status    ON recursos (status, created_at);
+    CREATE INDEX IF NOT EXISTS idx_recursos_created   ON recursos (created_at);
+'''
+
+# Estado compartilhado entre processos (serve.py com vários workers)
+COERENCIA_DDL = '''
+    CREATE TABLE IF NOT EXISTS epocas (
+        nome  TEXT PRIMARY KEY,
+        valor INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS falhas_login (
+        id       INTEGER PRIMARY KEY,
+        pid      INTEGER NOT NULL,
+        tipo     TEXT NOT NULL,
+        ip       TEXT,
+        username TEXT,
+        ts       REAL NOT NULL
+    );
+'''
+
+# Sketches do analytics por hora e por dia (ver analytics.py): total de
+# ocorrências, top-k (JSON) e Count-Min/HyperLogLog comprimidos
+ANALYTICS_DDL = '''
+    CREATE TABLE IF NOT EXISTS {s}.analytics_hora (
+        hora    TEXT NOT NULL,
+        metrica TEXT NOT NULL,
+        total   INTEGER NOT NULL,
+        topk    TEXT NOT NULL,
+        cms     BLOB NOT NULL,
+        hll     BLOB NOT NULL,
+        PRIMARY KEY (metrica, hora)
+    );
+
+    CREATE TABLE IF NOT EXISTS {s}.analytics_dia (
+        dia     TEXT NOT NULL,
+        metrica TEXT NOT NULL,
+        total   INTEGER NOT NULL,
+        topk    TEXT NOT NULL,
+        cms     BLOB NOT NULL,
+        hll     BLOB NOT NULL,
+        PRIMARY KEY (metrica, dia)
+    );
+'''
+
+USUARIOS_PADRAO = [
+    ('Bruce Wayne',       'admin',  'wayne123',  'Diretor Executivo',    'admin'),
+    ('Bruce Wayne',       'bruce',  'batman456', 'Gerente de Segurança', 'gerente'),
+    ('Alfred Pennyworth', 'alfred', 'butler789', 'Mordomo / Assistente', 'funcionario'),
+]
+
+RECURSOS_PADRAO = [
+    ('Batmóvel MK-7',        'Veiculo',         'ativo',       'Garagem B-1'),
+    ('Batwing Prototype',    'Aeronave',        'manutencao',  'Hangar Alpha'),
+    ('Servidor Mainframe',   'TI',              'ativo',       'Data Center - Subsolo'),
+    ('Traje de Combate v3',  'Equipamento',     'ativo',       'Armaria Principal'),
+    ('Gerador de Backup',    'Infraestrutura',  'ativo',       'Sala de Energia'),
+    ('Sistema de Cameras',   'Seguranca',       'ativo',       'Sala de Controle'),
+    ('Helicoptero WI-1',     'Aeronave',        'inativo',     'Hangar Beta'),
+    ('Kit Medico Avancado',  'Equipamento',     'ativo',       'Enfermaria'),
+]
+
+AREAS_PADRAO = [
+    ('Batcaverna',        'Subsolo'),
+    ('Laboratorio P&D',   'Andar 12'),
+    ('Data Center',       'Subsolo'),
+    ('Armaria Principal', 'Andar B2'),
+    ('Sala de Controle',  'Andar 1'),
+    ('Hangar Alpha',      'Cobertura'),
+]
+
+LOGS_EXEMPLO = [
+    ('admin',        'Login',          'sucesso', '192.168.1.1',   'Login bem-sucedido'),
+    ('bruce',        'Login',          'sucesso', '192.168.1.2',   'Login bem-sucedido'),
+    ('desconhecido', 'Login',          'negado',  '10.0.0.99',     'Credenciais invalidas'),
+    ('alfred',       'Acesso Recurso', 'sucesso', '192.168.1.3',   'Acesso ao Kit Medico'),
+    ('admin',        'Editar Recurso', 'sucesso', '192.168.1.1',   'Batmovel MK-7 atualizado'),
+    ('hacker',       'Login',          'negado',  '185.220.101.5', 'Tentativa de forca bruta'),
+]
+
+
+def executar_script(conn, sql: str):
+    """
+    Executa um script SQL comando a comando, sem o COMMIT implícito do
+    executescript() — mantém tudo dentro da transação da migração.
+    """
+    comando = ''
+    for linha in sql.splitlines(keepends=True):
+        comando += linha
+        if sqlite3.complete_statement(comando):
+            conn.execute(comando)
+            comando = ''
+    if comando.strip():
+        conn.execute(comando)
+
+
+def _vazia(conn, tabela: str) -> bool:
+    return not conn.execute(f'SELECT EXISTS (SELECT 1 FROM {tabela})').fetchone()[0]
+
+
+# ──────────────────────────────────────────────────────────────
+# Migrações
+# ──────────────────────────────────────────────────────────────
+@migracao(1, 'main', 'Tabelas de usuários, recursos e áreas')
+def _v1_base(conn, s):
+    executar_script(conn, BASE_DDL)
+
+
+@migracao(2, 'logs', 'Log de acesso, rollups e índices')
+def _v2_logs(conn, s):
+    executar_script(conn, LOGS_DDL.format(s=s))
+    if s != 'main':
+        _mover_logs_para_arquivo_proprio(conn)
+    # Banco antigo com logs mas sem rollups — backfill
+    if not _vazia(conn, 'logs_acesso') and _vazia(conn, 'logs_rollup_hora'):
+        rebuild_rollups(conn)
+
+
+@migracao(3, 'main', 'Revogação de sessões')
+def _v3_revogacao(conn, s):
+    executar_script(conn, REVOGACAO_DDL)
+
+
+@migracao(4, 'main', 'Índices e busca textual de recursos')
+def _v4_busca_recursos(conn, s):
+    executar_script(conn, RECURSOS_INDICES_DDL)
+    executar_script(conn, RECURSOS_FTS_DDL)
+    conn.execute("INSERT INTO recursos_fts (recursos_fts) VALUES ('rebuild')")
+
+
+@migracao(5, 'main', 'Dados iniciais')
+def _v5_seed(conn, s):
+    conn.executemany(
+        'INSERT OR IGNORE INTO usuarios (nome, username, password_hash, cargo, role) VALUES (?,?,?,?,?)',
+        [(nome, username, hash_password(senha), cargo, role)
+         for nome, username, senha, cargo, role in USUARIOS_PADRAO]
+    )
+    # Recursos e áreas só num banco vazio
+    if _vazia(conn, 'recursos'):
+        conn.executemany(
+            'INSERT INTO recursos (nome, categoria, status, localizacao) VALUES (?,?,?,?)',
+            RECURSOS_PADRAO
+        )
+    if _vazia(conn, 'areas'):
+        conn.executemany('INSERT INTO areas (nome, setor) VALUES (?,?)', AREAS_PADRAO)
+
+
+@migracao(6, 'logs', 'Logs de exemplo')
+def _v6_logs_exemplo(conn, s):
+    if _vazia(conn, 'logs_acesso'):
+        conn.executemany(
+            'INSERT INTO logs_acesso (usuario, acao, status, ip, detalhes) VALUES (?,?,?,?,?)',
+            LOGS_EXEMPLO
+        )
+
+
+@migracao(7, 'main', 'Épocas e falhas de login compartilhadas entre processos')
+def _v7_coerencia(conn, s):
+    executar_script(conn, COERENCIA_DDL)
+
+
+@migracao(8, 'logs', 'Sketches do analytics de logs')
+def _v8_analytics(conn, s):
+    executar_script(conn, ANALYTICS_DDL.format(s=s))
+    if not _vazia(conn, 'logs_acesso'):
+        reconstruir_analytics(conn)
+
+
+@migracao(9, 'main', 'Revogações de usuário em microssegundos')
+def _v9_revogacao_us(conn, s):
+    conn.execute('UPDATE revogacoes_usuario SET revogado_em = revogado_em * 1000000')
+
+
+def _mover_logs_para_arquivo_proprio(conn):
+    """Migra logs de um database.db antigo para o arquivo de logs dedicado."""
+    existe = conn.execute(
+        "SELECT 1 FROM main.sqlite_master WHERE type = 'table' AND name = 'logs_acesso'"
+    ).fetchone()
+    if not existe:
+        return
+    # O trigger do schema de logs recalcula os rollups das linhas copiadas
+    conn.execute('INSERT OR IGNORE INTO logs.logs_acesso SELECT * FROM main.logs_acesso')
+    conn.execute('DROP TABLE main.logs_acesso')
+    conn.execute('DROP TABLE IF EXISTS main.logs_rollup_hora')
+    conn.execute('DROP TABLE IF EXISTS main.logs_rollup_dia')
+    # Os sketches do analytics são refeitos no schema de logs pela v8
+    conn.execute('DROP TABLE IF EXISTS main.analytics_hora')
+    conn.execute('DROP TABLE IF EXISTS main.analytics_dia')
+    print("[OK] Logs migrados para o banco dedicado.")
+
+
+# ──────────────────────────────────────────────────────────────
+# Execução
+# ──────────────────────────────────────────────────────────────
+def _schemas() -> dict:
+    return {'main': 'main', 'logs': LOGS_SCHEMA}
+
+
+def versoes(conn) -> dict:
+    """user_version atual de cada schema."""
+    return {
+        schema: conn.execute(f'PRAGMA {schema}.user_version').fetchone()[0]
+        for schema in set(_schemas().values())
+    }
+
+
+def migrar(conn) -> list:
+    """
+    Aplica as migrações pendentes numa única transação e retorna as
+    descrições aplicadas. Com o banco em dia, custa só a leitura de
+    user_version.
+    """
+    alvos   = _schemas()
+    atuais  = versoes(conn)
+    pendentes = [m for m in MIGRACOES if m[0] > atuais[alvos[m[1]]]]
+    if not pendentes:
+        return []
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for _, _, _, fn in pendentes:
+            fn(conn, alvos['logs'])
+        for schema in atuais:
+            ultima = max(v for v, alvo, _, _ in MIGRACOES if alvos[alvo] == schema)
+            conn.execute(f'PRAGMA {schema}.user_version = {ultima}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return [f'v{v} {descricao}' for v, _, descricao, _ in pendentes]
+
+
+def init_db():
+    """Cria ou atualiza o banco até a última versão do schema."""
+    conn = connect()
+    try:
+        aplicadas = migrar(conn)
+        atuais = versoes(conn)
+    finally:
+        conn.close()
+    for descricao in aplicadas:
+        print(f"[OK] Migração aplicada: {descricao}")
+    detalhe = ' · '.join(f'{schema} v{versao}' for schema, versao in sorted(atuais.items()))
+    print(f"[OK] Banco de dados em dia ({detalhe}).")
@@ -6,131 +6,288 @@ Módulo de banco de dados — inicialização e acesso SQLite
 import sqlite3
 import hashlib
 import os
+import queue
+import threading
+import time
 
-DB_PATH = os.path.join(os.path.dirname(__file__), 'database.db')
+from flask import g, has_app_context
 
+DB_PATH = os.environ.get('DATABASE_PATH', os.path.join(os.path.dirname(__file__), 'database.db'))
 
-def get_db():
-    """Retorna conexão com o banco de dados."""
-    conn = sqlite3.connect(DB_PATH)
+# Tamanho dos pools: leitores podem ser muitos (WAL), escritores poucos
+POOL_READ_SIZE  = int(os.environ.get('DB_POOL_READ', 8))
+POOL_WRITE_SIZE = int(os.environ.get('DB_POOL_WRITE', 2))
+POOL_TIMEOUT    = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+
+# Banco separado opcional para as tabelas de log (ATTACH como schema 'logs'):
+# escrita de logs e CRUD de usuários/recursos deixam de disputar o mesmo lock
+LOGS_DB_PATH = os.environ.get('LOGS_DB_PATH') or None
+LOGS_SCHEMA  = 'logs' if LOGS_DB_PATH else 'main'
+
+# Pragmas aplicados a toda conexão nova
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous',  'NORMAL'),
+    ('cache_size',   -16000),        # ~16 MB de page cache
+    ('mmap_size',    268435456),     # 256 MB mapeados em memória
+    ('busy_timeout', 5000),
+    ('temp_store',   'MEMORY'),
+)
+
+# Pragmas próprios do arquivo de logs — muitas escritas pequenas,
+# checkpoints menos frequentes e WAL com tamanho limitado
+LOGS_PRAGMAS = (
+    ('journal_mode',       'WAL'),
+    ('synchronous',        'NORMAL'),
+    ('cache_size',         -32000),
+    ('mmap_size',          268435456),
+    ('wal_autocheckpoint', 4000),
+    ('journal_size_limit', 67108864),
+)
+
+
+# Observador de consultas, chamado com (sql, segundos) a cada execute —
+# instalado por metrics.py; sem observador não há custo de medição
+_observador_consultas = None
+
+
+def observar_consultas(fn):
+    """Registra `fn(sql, segundos)` para toda consulta executada."""
+    global _observador_consultas
+    _observador_consultas = fn
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor que mede o tempo de execute/executemany."""
+
+    def execute(self, sql, params=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            _observador_consultas(sql, time.perf_counter() - inicio)
+
+    def executemany(self, sql, seq):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, seq)
+        finally:
+            _observador_consultas(sql, time.perf_counter() - inicio)
+
+
+class PooledConnection(sqlite3.Connection):
+    """Conexão SQLite que volta ao pool em vez de ser fechada."""
+
+    pool     = None
+    in_use   = False
+    checkout = 0        # nº da retirada atual do pool (ver release)
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = TimedCursor if _observador_consultas else sqlite3.Cursor
+        return super().cursor(factory)
+
+    # Atalhos do sqlite3 reescritos para passar pelo cursor() acima
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+
+def connect(path: str = None, readonly: bool = False) -> PooledConnection:
+    """Abre uma conexão avulsa (fora do pool) com os pragmas padrão."""
+    conn = sqlite3.connect(path or DB_PATH, factory=PooledConnection, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    if LOGS_DB_PATH:
+        conn.execute('ATTACH DATABASE ? AS logs', (LOGS_DB_PATH,))
+        for name, value in LOGS_PRAGMAS:
+            conn.execute(f'PRAGMA logs.{name} = {value}')
+    if readonly:
+        conn.execute('PRAGMA query_only = ON')
+    return conn
+
+
+class ConnectionPool:
+    """Pool de conexões SQLite reutilizáveis entre requisições."""
+
+    def __init__(self, path: str, size: int, readonly: bool = False):
+        self.path     = path
+        self.size     = size
+        self.readonly = readonly
+        self._idle    = queue.LifoQueue()
+        self._slots   = threading.BoundedSemaphore(size)
+        self._fechado = False
+        self._lock    = threading.Lock()
+
+    def _connect(self) -> PooledConnection:
+        conn = connect(self.path, readonly=self.readonly)
+        conn.pool = self
+        return conn
+
+    def acquire(self, timeout: float = POOL_TIMEOUT) -> PooledConnection:
+        if not self._slots.acquire(timeout=timeout):
+            raise sqlite3.OperationalError('Pool de conexões esgotado.')
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+        conn.in_use = True
+        conn.checkout += 1
+        return conn
+
+    def release(self, conn: PooledConnection, checkout: int = None):
+        """
+        Devolve a conexão ao pool. Com `checkout`, só devolve se ela ainda
+        estiver nessa retirada — uma liberação atrasada não devolve a
+        conexão que outra thread retirou nesse meio-tempo.
+        """
+        if not conn.in_use or (checkout is not None and checkout != conn.checkout):
+            return
+        conn.in_use = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Conexão quebrada — descarta e libera a vaga
+            sqlite3.Connection.close(conn)
+        else:
+            with self._lock:
+                fechado = self._fechado
+                if not fechado:
+                    self._idle.put(conn)
+            if fechado:
+                sqlite3.Connection.close(conn)
+        self._slots.release()
+
+    def preencher(self):
+        """Abre de antemão todas as conexões do pool."""
+        conns = [self.acquire() for _ in range(self.size)]
+        for conn in conns:
+            self.release(conn)
+
+    def close_all(self):
+        """Fecha as conexões ociosas; as em uso são fechadas ao serem devolvidas."""
+        with self._lock:
+            self._fechado = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            sqlite3.Connection.close(conn)
+
+
+_pools = {
+    'read':  ConnectionPool(DB_PATH, POOL_READ_SIZE, readonly=True),
+    'write': ConnectionPool(DB_PATH, POOL_WRITE_SIZE),
+}
+
+
+def preencher_pools():
+    """Abre as conexões dos pools antes do primeiro request (aquecimento)."""
+    for pool in _pools.values():
+        pool.preencher()
+
+
+def _recriar_pools():
+    """Após um fork, o filho abandona as conexões herdadas e abre as próprias."""
+    for mode, pool in list(_pools.items()):
+        _pools[mode] = ConnectionPool(pool.path, pool.size, readonly=pool.readonly)
+
+
+os.register_at_fork(after_in_child=_recriar_pools)
+
+
+def get_db(readonly: bool = False):
+    """
+    Retorna conexão do pool (leitura ou escrita).
+
+    Dentro de um app context a conexão fica associada a `g` e é devolvida
+    automaticamente no teardown; `conn.close()` também a devolve ao pool.
+    """
+    mode = 'read' if readonly else 'write'
+    if not has_app_context():
+        return _pools[mode].acquire()
+    return conexao_do_contexto(mode, _pools[mode].acquire)
+
+
+def conexao_do_contexto(chave: str, retirar):
+    """
+    Conexão `chave` presa ao app context. Se ainda não há uma, ou se a
+    anterior já foi devolvida (conn.close()), retira outra com `retirar()`
+    e guarda junto o nº da retirada, para o teardown só devolver o que
+    este contexto ainda possui.
+    """
+    conns = g.setdefault('_db_conns', {})
+    atual = conns.get(chave)
+    if atual is not None:
+        conn, checkout = atual
+        if conn.in_use and conn.checkout == checkout:
+            return conn
+    conn = retirar()
+    if conn is not None:
+        conns[chave] = (conn, conn.checkout)
     return conn
 
 
+def release_db(_exc=None):
+    """Devolve ao pool as conexões ainda presas ao app context."""
+    for conn, checkout in g.pop('_db_conns', {}).values():
+        conn.pool.release(conn, checkout)
+
+
+def init_app(app):
+    """Registra a liberação automática das conexões no teardown."""
+    app.teardown_appcontext(release_db)
+
+
 def hash_password(password: str) -> str:
     """Gera hash SHA-256 da senha."""
     return hashlib.sha256(password.encode()).hexdigest()
 
 
-def init_db():
-    """Inicializa o banco de dados com tabelas e dados padrão."""
-    conn = get_db()
-    cursor = conn.cursor()
-
-    # Criar tabelas
-    cursor.executescript('''
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome        TEXT NOT NULL,
-            username    TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            cargo       TEXT DEFAULT 'Funcionário',
-            role        TEXT NOT NULL DEFAULT 'funcionario',
-            status      TEXT NOT NULL DEFAULT 'ativo',
-            created_at  TEXT DEFAULT (datetime('now'))
-        );
-
-        CREATE TABLE IF NOT EXISTS recursos (
-            id          INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome        TEXT NOT NULL,
-            categoria   TEXT NOT NULL,
-            status      TEXT NOT NULL DEFAULT 'ativo',
-            localizacao TEXT,
-            created_at  TEXT DEFAULT (datetime('now')),
-            updated_at  TEXT DEFAULT (datetime('now'))
-        );
-
-        CREATE TABLE IF NOT EXISTS logs_acesso (
-            id        INTEGER PRIMARY KEY AUTOINCREMENT,
-            usuario   TEXT,
-            acao      TEXT NOT NULL,
-            status    TEXT NOT NULL,
-            ip        TEXT,
-            timestamp TEXT DEFAULT (datetime('now')),
-            detalhes  TEXT
-        );
-
-        CREATE TABLE IF NOT EXISTS areas (
-            id         INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome       TEXT NOT NULL,
-            setor      TEXT,
-            status     TEXT NOT NULL DEFAULT 'normal',
-            updated_at TEXT DEFAULT (datetime('now'))
-        );
-    ''')
-
-    # Usuários padrão (inserir apenas se não existirem)
-    usuarios_padrao = [
-        ('Bruce Wayne',       'admin',  hash_password('wayne123'),   'Diretor Executivo',       'admin'),
-        ('Bruce Wayne',       'bruce',  hash_password('batman456'),  'Gerente de Segurança',    'gerente'),
-        ('Alfred Pennyworth', 'alfred', hash_password('butler789'), 'Mordomo / Assistente',    'funcionario'),
-    ]
-    for nome, username, pw_hash, cargo, role in usuarios_padrao:
-        cursor.execute(
-            'INSERT OR IGNORE INTO usuarios (nome, username, password_hash, cargo, role) VALUES (?,?,?,?,?)',
-            (nome, username, pw_hash, cargo, role)
-        )
-
-    # Recursos iniciais — só insere se a tabela estiver vazia
-    if cursor.execute('SELECT COUNT(*) FROM recursos').fetchone()[0] == 0:
-        recursos_padrao = [
-            ('Batmóvel MK-7',        'Veiculo',         'ativo',       'Garagem B-1'),
-            ('Batwing Prototype',    'Aeronave',        'manutencao',  'Hangar Alpha'),
-            ('Servidor Mainframe',   'TI',              'ativo',       'Data Center - Subsolo'),
-            ('Traje de Combate v3',  'Equipamento',     'ativo',       'Armaria Principal'),
-            ('Gerador de Backup',    'Infraestrutura',  'ativo',       'Sala de Energia'),
-            ('Sistema de Cameras',   'Seguranca',       'ativo',       'Sala de Controle'),
-            ('Helicoptero WI-1',     'Aeronave',        'inativo',     'Hangar Beta'),
-            ('Kit Medico Avancado',  'Equipamento',     'ativo',       'Enfermaria'),
-        ]
-        for nome, cat, status, loc in recursos_padrao:
-            cursor.execute(
-                'INSERT INTO recursos (nome, categoria, status, localizacao) VALUES (?,?,?,?)',
-                (nome, cat, status, loc)
-            )
-
-    # Areas de seguranca — so insere se vazio
-    if cursor.execute('SELECT COUNT(*) FROM areas').fetchone()[0] == 0:
-        areas_padrao = [
-            ('Batcaverna',        'Subsolo'),
-            ('Laboratorio P&D',   'Andar 12'),
-            ('Data Center',       'Subsolo'),
-            ('Armaria Principal', 'Andar B2'),
-            ('Sala de Controle',  'Andar 1'),
-            ('Hangar Alpha',      'Cobertura'),
-        ]
-        for nome, setor in areas_padrao:
-            cursor.execute(
-                'INSERT INTO areas (nome, setor) VALUES (?,?)',
-                (nome, setor)
-            )
-
-    # Logs de exemplo — so insere se vazio
-    if cursor.execute('SELECT COUNT(*) FROM logs_acesso').fetchone()[0] == 0:
-        logs_exemplo = [
-            ('admin',        'Login',          'sucesso', '192.168.1.1',  'Login bem-sucedido'),
-            ('bruce',        'Login',          'sucesso', '192.168.1.2',  'Login bem-sucedido'),
-            ('desconhecido', 'Login',          'negado',  '10.0.0.99',   'Credenciais invalidas'),
-            ('alfred',       'Acesso Recurso', 'sucesso', '192.168.1.3', 'Acesso ao Kit Medico'),
-            ('admin',        'Editar Recurso', 'sucesso', '192.168.1.1', 'Batmovel MK-7 atualizado'),
-            ('hacker',       'Login',          'negado',  '185.220.101.5','Tentativa de forca bruta'),
-        ]
-        for usuario, acao, status, ip, det in logs_exemplo:
-            cursor.execute(
-                'INSERT INTO logs_acesso (usuario, acao, status, ip, detalhes) VALUES (?,?,?,?,?)',
-                (usuario, acao, status, ip, det)
-            )
-
-    conn.commit()
-    conn.close()
-    print("[OK] Banco de dados inicializado com sucesso.")
+_ROLLUPS = (
+    ('logs_rollup_hora', 'hora', "strftime('%Y-%m-%d %H:00:00', timestamp)"),
+    ('logs_rollup_dia',  'dia',  'date(timestamp)'),
+)
+
+
+def rebuild_rollups(conn=None, arquivos=()):
+    """
+    Recalcula os rollups de logs_acesso a partir das linhas brutas (backfill).
+    `arquivos` são os segmentos já arquivados (retencao.segmentos()), somados
+    aos logs quentes para que os meses antigos não sumam dos rollups.
+    Com `conn` informada, o commit fica a cargo de quem chamou.
+    """
+    own  = conn is None
+    conn = conn or get_db()
+    for tabela, chave, expr in _ROLLUPS:
+        conn.execute(f'DELETE FROM {tabela}')
+        agregado = (f'SELECT {expr} AS {chave}, acao, status, COUNT(*) FROM logs_acesso '
+                    f'WHERE timestamp IS NOT NULL GROUP BY {chave}, acao, status')
+        upsert   = (f'INSERT INTO {tabela} ({chave}, acao, status, total) VALUES (?, ?, ?, ?) '
+                    f'ON CONFLICT ({chave}, acao, status) DO UPDATE SET total = total + excluded.total')
+        conn.execute(f'INSERT INTO {tabela} ({chave}, acao, status, total) {agregado}')
+        # Segmentos abertos à parte: ATTACH não é permitido dentro da transação
+        for caminho in arquivos:
+            arquivo = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+            try:
+                conn.executemany(upsert, arquivo.execute(agregado).fetchall())
+            finally:
+                arquivo.close()
+    if own:
+        conn.commit()
+        conn.close()
@@ -0,0 +1,150 @@
+"""
+Wayne Industries Security Platform
+Retenção do log de acesso — arquivamento mensal de logs antigos
+"""
+
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from models import connect
+
+LOG_RETENTION_DAYS     = max(1, int(os.environ.get('LOG_RETENTION_DAYS', 90)))
+LOG_ARCHIVE_DIR        = os.environ.get('LOG_ARCHIVE_DIR', os.path.join(os.path.dirname(__file__), 'arquivo_logs'))
+LOG_ARCHIVE_BATCH      = int(os.environ.get('LOG_ARCHIVE_BATCH', 500))
+LOG_ARCHIVE_INTERVAL   = float(os.environ.get('LOG_ARCHIVE_INTERVAL', 60))
+
+COLUNAS = 'id, usuario, acao, status, ip, timestamp, detalhes'
+
+# Um arquivo SQLite por mês, com o mesmo formato da tabela quente
+SEGMENTO_DDL = '''
+    CREATE TABLE IF NOT EXISTS arq.logs_acesso (
+        id        INTEGER PRIMARY KEY,
+        usuario   TEXT,
+        acao      TEXT NOT NULL,
+        status    TEXT NOT NULL,
+        ip        TEXT,
+        timestamp TEXT,
+        detalhes  TEXT
+    );
+    CREATE INDEX IF NOT EXISTS arq.idx_logs_timestamp ON logs_acesso (timestamp);
+    CREATE INDEX IF NOT EXISTS arq.idx_logs_status_ts ON logs_acesso (status, timestamp);
+'''
+
+logger = logging.getLogger(__name__)
+
+
+def limite_retencao() -> str:
+    """Timestamp UTC a partir do qual os logs permanecem na tabela quente."""
+    corte = datetime.now(timezone.utc) - timedelta(days=LOG_RETENTION_DAYS)
+    return corte.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _caminho_segmento(mes: str) -> str:
+    return os.path.join(LOG_ARCHIVE_DIR, f"logs_{mes.replace('-', '_')}.db")
+
+
+def arquivar_lote(batch: int = LOG_ARCHIVE_BATCH) -> int:
+    """
+    Move até `batch` logs mais antigos que a retenção para os segmentos
+    mensais. Retorna quantas linhas foram movidas.
+
+    A cópia usa INSERT OR IGNORE, então repetir um lote interrompido entre
+    a gravação no segmento e o DELETE na tabela quente é seguro.
+    """
+    conn = connect()
+    try:
+        rows = conn.execute(
+            f'SELECT {COLUNAS} FROM logs_acesso WHERE timestamp < ? ORDER BY timestamp, id LIMIT ?',
+            (limite_retencao(), batch)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        por_mes = {}
+        for r in rows:
+            por_mes.setdefault(r['timestamp'][:7], []).append(tuple(r))
+
+        os.makedirs(LOG_ARCHIVE_DIR, exist_ok=True)
+        for mes, linhas in por_mes.items():
+            conn.execute('ATTACH DATABASE ? AS arq', (_caminho_segmento(mes),))
+            try:
+                conn.executescript(SEGMENTO_DDL)
+                with conn:
+                    conn.executemany(f'INSERT OR IGNORE INTO arq.logs_acesso ({COLUNAS}) VALUES (?,?,?,?,?,?,?)', linhas)
+                    conn.executemany('DELETE FROM logs_acesso WHERE id = ?', [(l[0],) for l in linhas])
+            finally:
+                conn.execute('DETACH DATABASE arq')
+        return len(rows)
+    finally:
+        conn.close()
+
+
+def arquivar_tudo(batch: int = LOG_ARCHIVE_BATCH, pausa: float = 0.05) -> int:
+    """Arquiva tudo o que passou da retenção, em lotes pequenos."""
+    total = 0
+    while True:
+        n = arquivar_lote(batch)
+        total += n
+        if n < batch:
+            return total
+        time.sleep(pausa)
+
+
+def segmentos(desde: str = None, ate: str = None):
+    """Segmentos arquivados que cobrem a faixa pedida, do mais recente ao mais antigo."""
+    arquivos = sorted(glob.glob(os.path.join(LOG_ARCHIVE_DIR, 'logs_????_??.db')), reverse=True)
+    for caminho in arquivos:
+        mes = os.path.basename(caminho)[5:12].replace('_', '-')
+        if desde and mes < desde[:7]:
+            continue
+        if ate and mes > ate[:7]:
+            continue
+        yield caminho
+
+
+def abrir_segmento(caminho: str) -> sqlite3.Connection:
+    """Abre um segmento arquivado somente para leitura."""
+    conn = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def consultar_arquivo(where: str, params: list, limit: int, desde: str = None, ate: str = None):
+    """
+    Executa a mesma consulta de /logs nos segmentos arquivados, em ordem
+    (timestamp, id) decrescente, até reunir `limit` linhas.
+    """
+    resultado = []
+    for caminho in segmentos(desde, ate):
+        if len(resultado) >= limit:
+            break
+        conn = abrir_segmento(caminho)
+        try:
+            resultado += conn.execute(
+                f'SELECT {COLUNAS} FROM logs_acesso{where} ORDER BY timestamp DESC, id DESC LIMIT ?',
+                params + [limit - len(resultado)]
+            ).fetchall()
+        finally:
+            conn.close()
+    return resultado
+
+
+def iniciar_arquivamento():
+    """Thread de fundo que arquiva em lotes pequenos sem travar as requisições."""
+    def loop():
+        while True:
+            try:
+                n = arquivar_lote()
+            except Exception:
+                logger.exception('Falha ao arquivar logs antigos.')
+                n = 0
+            time.sleep(0.05 if n >= LOG_ARCHIVE_BATCH else LOG_ARCHIVE_INTERVAL)
+
+    thread = threading.Thread(target=loop, name='log-archiver', daemon=True)
+    thread.start()
+    return thread
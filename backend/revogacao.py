@@ -0,0 +1,118 @@
+"""
+Wayne Industries Security Platform
+Revogação de tokens — denylist persistida no SQLite e consultada em memória
+"""
+
+import threading
+import time
+
+from coerencia import epocas
+from models import connect
+
+# Intervalo mínimo entre podas das entradas que já expiraram
+PODA_INTERVALO = 600
+
+
+class Denylist:
+    """
+    Tokens revogados por `jti` e usuários revogados por "emitidos antes
+    de T" (em microssegundos: um login logo após a revogação, no mesmo
+    segundo ou milissegundo, continua válido). A consulta por requisição é só um lookup
+    em dict; o SQLite guarda o estado para reinícios e é podado, fora do
+    caminho das requisições, conforme os tokens expiram.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl        = ttl
+        self._jtis      = {}     # jti -> exp
+        self._usuarios  = {}     # user_id -> revogado_em (µs)
+        self._lock      = threading.Lock()
+        self._carregado = False
+        self._proxima_poda = 0.0
+        # Revogações feitas em outros workers
+        epocas.ao_mudar('revogacao', lambda *_: self.carregar())
+
+    def carregar(self):
+        """(Re)lê do banco as revogações ainda vigentes."""
+        agora = int(time.time())
+        conn = connect()
+        try:
+            jtis = dict(conn.execute(
+                'SELECT jti, exp FROM tokens_revogados WHERE exp > ?', (agora,)
+            ).fetchall())
+            usuarios = dict(conn.execute(
+                'SELECT user_id, revogado_em FROM revogacoes_usuario WHERE revogado_em > ?',
+                ((agora - self.ttl) * 1_000_000,)
+            ).fetchall())
+        finally:
+            conn.close()
+        with self._lock:
+            # Soma ao que já está em memória: uma revogação local feita
+            # durante a leitura não pode se perder
+            self._jtis = {**self._jtis, **jtis}
+            for uid, t in self._usuarios.items():
+                usuarios[uid] = max(t, usuarios.get(uid, 0))
+            self._usuarios = usuarios
+            self._carregado = True
+        self._podar_se_devido()
+
+    def revogado(self, claims: dict) -> bool:
+        if not self._carregado:
+            self.carregar()
+        jti = claims.get('jti')
+        if jti is not None and jti in self._jtis:
+            return True
+        limite = self._usuarios.get(claims.get('user_id'))
+        if limite is None:
+            return False
+        # Emissão em µs; tokens anteriores ao iat_us só têm iat em segundos
+        return claims.get('iat_us', claims.get('iat', 0) * 1_000_000) < limite
+
+    def revogar_token(self, jti: str, exp: int):
+        with self._lock:
+            self._jtis[jti] = exp
+        conn = connect()
+        try:
+            with conn:
+                conn.execute('INSERT OR IGNORE INTO tokens_revogados (jti, exp) VALUES (?,?)', (jti, exp))
+        finally:
+            conn.close()
+        epocas.avancar('revogacao')
+        self._podar_se_devido()
+
+    def revogar_usuario(self, user_id: int):
+        """Invalida todos os tokens do usuário emitidos até agora."""
+        agora = time.time_ns() // 1000
+        with self._lock:
+            self._usuarios[user_id] = agora
+        conn = connect()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO revogacoes_usuario (user_id, revogado_em) VALUES (?,?) '
+                    'ON CONFLICT (user_id) DO UPDATE SET revogado_em = excluded.revogado_em',
+                    (user_id, agora)
+                )
+        finally:
+            conn.close()
+        epocas.avancar('revogacao')
+        self._podar_se_devido()
+
+    def _podar_se_devido(self):
+        if time.time() >= self._proxima_poda:
+            self.podar()
+
+    def podar(self):
+        """Descarta revogações de tokens que já expiraram de qualquer forma."""
+        agora = time.time()
+        self._proxima_poda = agora + PODA_INTERVALO
+        with self._lock:
+            self._jtis = {j: e for j, e in self._jtis.items() if e > agora}
+            self._usuarios = {u: t for u, t in self._usuarios.items() if t > (agora - self.ttl) * 1_000_000}
+        conn = connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM tokens_revogados WHERE exp <= ?', (int(agora),))
+                conn.execute('DELETE FROM revogacoes_usuario WHERE revogado_em <= ?', (int((agora - self.ttl) * 1_000_000),))
+        finally:
+            conn.close()
@@ -4,13 +4,18 @@ Rotas de autenticação — login, logout, perfil
 """
 
 import os
+import uuid
 import jwt
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta, timezone
 from flask import Blueprint, request, jsonify
 from models import get_db, hash_password
+from middleware import requires, denylist, TOKEN_TTL, decode_token
+from logwriter import registrar_log
+from throttle import login_throttle
 
 auth_bp = Blueprint('auth', __name__)
 SECRET_KEY = os.environ.get('SECRET_KEY', 'wayne-industries-secret-key-2024')
+EPOCH      = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
 @auth_bp.route('/login', methods=['POST'])
@@ -21,32 +26,35 @@ def login():
     password = body.get('password', '')
     ip = request.remote_addr
 
-    conn = get_db()
-    cur = conn.cursor()
+    # Barra IPs/usuários com falhas demais antes de qualquer acesso ao banco
+    if login_throttle.bloqueado(ip, username):
+        return jsonify({'error': 'Muitas tentativas de login. Tente novamente em instantes.'}), 429
 
-    user = cur.execute(
+    conn = get_db(readonly=True)
+    user = conn.execute(
         "SELECT * FROM usuarios WHERE username = ? AND status = 'ativo'",
         (username,)
     ).fetchone()
+    conn.close()
 
     if user and user['password_hash'] == hash_password(password):
-        # Gera token JWT com expiração de 8 horas
+        # Gera token JWT com expiração de 8 horas; jti identifica o token na revogação
+        agora = datetime.now(timezone.utc)
         payload = {
+            'jti': uuid.uuid4().hex,
+            'iat': agora,
+            'iat_us': (agora - EPOCH) // timedelta(microseconds=1),    # iat do JWT é em segundos
             'user_id': user['id'],
             'username': user['username'],
             'nome': user['nome'],
             'role': user['role'],
             'cargo': user['cargo'],
-            'exp': datetime.now(timezone.utc) + timedelta(hours=8),
+            'exp': agora + TOKEN_TTL,
         }
         token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
 
-        cur.execute(
-            'INSERT INTO logs_acesso (usuario, acao, status, ip, detalhes) VALUES (?,?,?,?,?)',
-            (username, 'Login', 'sucesso', ip, 'Login bem-sucedido')
-        )
-        conn.commit()
-        conn.close()
+        registrar_log(username, 'Login', 'sucesso', ip, 'Login bem-sucedido')
+        login_throttle.sucesso(username)
 
         return jsonify({
             'token': token,
@@ -59,31 +67,24 @@ def login():
             }
         })
 
-    # Falha na autenticação
-    cur.execute(
-        'INSERT INTO logs_acesso (usuario, acao, status, ip, detalhes) VALUES (?,?,?,?,?)',
-        (username or 'desconhecido', 'Login', 'negado', ip, 'Credenciais inválidas')
-    )
-    conn.commit()
-    conn.close()
+    # Falha na autenticação — gravada em lote pelo log writer, sem
+    # disputar o lock de escrita com os logins legítimos
+    registrar_log(username or 'desconhecido', 'Login', 'negado', ip, 'Credenciais inválidas')
+    login_throttle.falha(ip, username)
     return jsonify({'error': 'Credenciais inválidas. Acesso negado.'}), 401
 
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
-    """Encerra a sessão (client-side — apenas confirma no servidor)."""
+    """Encerra a sessão revogando o token apresentado, se houver um válido."""
+    data, err = decode_token()
+    if not err and data.get('jti'):
+        denylist.revogar_token(data['jti'], int(data['exp']))
     return jsonify({'message': 'Logout realizado com sucesso.'})
 
 
 @auth_bp.route('/me', methods=['GET'])
+@requires()
 def me():
     """Retorna dados do usuário autenticado."""
-    auth_header = request.headers.get('Authorization', '')
-    token = auth_header.removeprefix('Bearer ').strip()
-    if not token:
-        return jsonify({'error': 'Não autenticado'}), 401
-    try:
-        data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        return jsonify(data)
-    except jwt.PyJWTError:
-        return jsonify({'error': 'Token inválido'}), 401
+    return jsonify(request.user)
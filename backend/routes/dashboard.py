@@ -3,48 +3,73 @@ Wayne Industries Security Platform
 Rotas do dashboard — estatísticas e atividade recente
 """
 
-from flask import Blueprint, jsonify
-from models import get_db
-from middleware import token_required
+from datetime import datetime, time, timedelta, timezone
+from flask import Blueprint, request, jsonify
+from snapshots import get_db_relatorio, versao_snapshot
+from middleware import requires
+from cache import cached
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Janela padrão do histograma: 7 dias em BRT (UTC-3)
+DEFAULT_DAYS = 7
+DEFAULT_TZ   = -3
+MAX_DAYS     = 90
+
 
 @dashboard_bp.route('/dashboard/stats', methods=['GET'])
-@token_required
+@requires()
+@cached('recursos', 'usuarios', 'logs_acesso', origem=versao_snapshot)
 def get_stats():
-    """Retorna métricas consolidadas para o dashboard."""
-    conn = get_db()
-    cur  = conn.cursor()
+    """
+    Retorna métricas consolidadas para o dashboard.
+
+    Query params opcionais:
+      ?days=7   janela do histograma de atividade (1–90 dias)
+      ?tz=-3    deslocamento em horas do fuso usado para agrupar por dia
+    """
+    days = max(1, min(request.args.get('days', DEFAULT_DAYS, type=int), MAX_DAYS))
+    tz   = max(-12, min(request.args.get('tz', DEFAULT_TZ, type=int), 14))
 
-    total_recursos  = cur.execute('SELECT COUNT(*) FROM recursos').fetchone()[0]
-    recursos_ativos = cur.execute("SELECT COUNT(*) FROM recursos WHERE status = 'ativo'").fetchone()[0]
-    total_usuarios  = cur.execute("SELECT COUNT(*) FROM usuarios WHERE status = 'ativo'").fetchone()[0]
+    conn = get_db_relatorio()
+    cur  = conn.cursor()
 
-    # Alertas últimas 24h — compara UTC com UTC
-    alertas_24h = cur.execute(
-        "SELECT COUNT(*) FROM logs_acesso WHERE status = 'negado' AND timestamp > datetime('now', '-24 hours')"
-    ).fetchone()[0]
+    # Contadores em uma única consulta — alertas 24h comparam UTC com UTC
+    totais = cur.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM recursos)                            AS total_recursos,
+            (SELECT COUNT(*) FROM recursos WHERE status = 'ativo')     AS recursos_ativos,
+            (SELECT COUNT(*) FROM usuarios WHERE status = 'ativo')     AS total_usuarios,
+            -- horas completas vêm do rollup; só a hora parcial do limite é lida dos logs brutos
+            (SELECT COALESCE(SUM(total), 0) FROM logs_rollup_hora
+              WHERE status = 'negado' AND hora > strftime('%Y-%m-%d %H:00:00', 'now', '-24 hours'))
+          + (SELECT COUNT(*) FROM logs_acesso
+              WHERE status = 'negado'
+                AND timestamp > datetime('now', '-24 hours')
+                AND timestamp < strftime('%Y-%m-%d %H:00:00', 'now', '-23 hours')) AS alertas_24h,
+            -- anomalias detectadas (logs com status 'alerta'), mesma composição
+            (SELECT COALESCE(SUM(total), 0) FROM logs_rollup_hora
+              WHERE status = 'alerta' AND hora > strftime('%Y-%m-%d %H:00:00', 'now', '-24 hours'))
+          + (SELECT COUNT(*) FROM logs_acesso
+              WHERE status = 'alerta'
+                AND timestamp > datetime('now', '-24 hours')
+                AND timestamp < strftime('%Y-%m-%d %H:00:00', 'now', '-23 hours')) AS anomalias_24h
+    ''').fetchone()
 
     # Últimas 10 ações
     atividades = cur.execute(
         'SELECT * FROM logs_acesso ORDER BY timestamp DESC LIMIT 10'
     ).fetchall()
 
-    # Atividade dos últimos 7 dias agrupada por dia em BRT (UTC-3)
-    # date(timestamp, '-3 hours') converte o timestamp UTC para data BRT
-    atividade_semanal = []
-    dias_labels = []
-    for i in range(6, -1, -1):
-        contagem = cur.execute(
-            "SELECT COUNT(*) FROM logs_acesso WHERE date(timestamp, '-3 hours') = date('now', '-3 hours', ?)",
-            (f'-{i} days',)
-        ).fetchone()[0]
-        atividade_semanal.append(contagem)
-        label = cur.execute(
-            "SELECT strftime('%d/%m', date('now', '-3 hours', ?))", (f'-{i} days',)
-        ).fetchone()[0]
-        dias_labels.append(label)
+    # Histograma diário no fuso pedido, somado a partir do rollup por hora
+    # (a janela começa sempre em hora cheia UTC, então a soma é exata)
+    dias, inicio_utc = _janela_dias(days, tz)
+    contagens = dict(cur.execute(
+        'SELECT date(hora, ?) AS dia, SUM(total) FROM logs_rollup_hora WHERE hora >= ? GROUP BY dia',
+        (f'{tz:+d} hours', inicio_utc)
+    ).fetchall())
+    atividade_semanal = [contagens.get(d.isoformat(), 0) for d in dias]
+    dias_labels       = [d.strftime('%d/%m') for d in dias]
 
     # Recursos por categoria
     por_categoria = cur.execute(
@@ -53,12 +78,22 @@ def get_stats():
 
     conn.close()
     return jsonify({
-        'total_recursos':       total_recursos,
-        'recursos_ativos':      recursos_ativos,
-        'total_usuarios':       total_usuarios,
-        'alertas_24h':          alertas_24h,
+        'total_recursos':       totais['total_recursos'],
+        'recursos_ativos':      totais['recursos_ativos'],
+        'total_usuarios':       totais['total_usuarios'],
+        'alertas_24h':          totais['alertas_24h'],
+        'anomalias_24h':        totais['anomalias_24h'],
         'atividades_recentes':  [dict(a) for a in atividades],
         'atividade_semanal':    atividade_semanal,
         'dias_labels':          dias_labels,
         'recursos_por_categoria': [dict(c) for c in por_categoria],
     })
+
+
+def _janela_dias(days: int, tz: int):
+    """Retorna os dias locais da janela e o início dela em UTC (formato SQLite)."""
+    agora_local = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=tz)
+    hoje  = agora_local.date()
+    dias  = [hoje - timedelta(days=i) for i in range(days - 1, -1, -1)]
+    inicio_utc = datetime.combine(dias[0], time.min) - timedelta(hours=tz)
+    return dias, inicio_utc.strftime('%Y-%m-%d %H:%M:%S')
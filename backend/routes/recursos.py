@@ -3,42 +3,80 @@ Wayne Industries Security Platform
 Rotas CRUD de recursos (equipamentos, veículos, dispositivos)
 """
 
+import os
+import re
 from flask import Blueprint, request, jsonify
 from models import get_db
-from middleware import token_required
+from middleware import requires
+from cache import cached, bump
+from logwriter import registrar_acao
+from lote import Resultados, buscar_por_id, campo_nao_texto, falha_do_lote, ler_operacoes, proximos_ids
+from serializacao import json_cursor
 
 recursos_bp = Blueprint('recursos', __name__)
 
+POR_PAGINA     = int(os.environ.get('RECURSOS_POR_PAGINA', 50))
+MAX_POR_PAGINA = int(os.environ.get('RECURSOS_MAX_POR_PAGINA', 500))
+MAX_TERMOS     = 8
+
 
 @recursos_bp.route('/recursos', methods=['GET'])
-@token_required
+@requires()
+@cached('recursos')
 def list_recursos():
-    """Lista todos os recursos com filtros opcionais por categoria e status."""
+    """
+    Lista recursos com busca textual e filtros opcionais, paginada:
+      ?q=bat movel          termos com prefixo, ordenados por relevância
+      ?categoria=TI&status=ativo
+      ?pagina=1&por_pagina=50
+    O total de resultados vai no header X-Total-Count.
+    """
     categoria = request.args.get('categoria', '').strip()
     status    = request.args.get('status', '').strip()
+    termos    = _consulta_fts(request.args.get('q', ''))
+    pagina     = max(request.args.get('pagina', 1, type=int) or 1, 1)
+    por_pagina = min(max(request.args.get('por_pagina', POR_PAGINA, type=int) or POR_PAGINA, 1),
+                     MAX_POR_PAGINA)
 
-    query  = 'SELECT * FROM recursos'
     params = []
     conds  = []
-
+    if termos:
+        origem = 'recursos_fts JOIN recursos r ON r.id = recursos_fts.rowid'
+        conds.append('recursos_fts MATCH ?')
+        params.append(termos)
+        # Peso maior para acertos no nome do que na localização/categoria
+        ordem = 'bm25(recursos_fts, 10.0, 2.0, 4.0), r.created_at DESC, r.id DESC'
+    else:
+        origem = 'recursos r'
+        ordem  = 'r.created_at DESC, r.id DESC'
     if categoria:
-        conds.append('categoria = ?')
+        conds.append('r.categoria = ?')
         params.append(categoria)
     if status:
-        conds.append('status = ?')
+        conds.append('r.status = ?')
         params.append(status)
-    if conds:
-        query += ' WHERE ' + ' AND '.join(conds)
-    query += ' ORDER BY created_at DESC'
+    where = (' WHERE ' + ' AND '.join(conds)) if conds else ''
+
+    conn  = get_db(readonly=True)
+    total = conn.execute(f'SELECT COUNT(*) FROM {origem}{where}', params).fetchone()[0]
+    cur   = conn.execute(
+        f'SELECT r.* FROM {origem}{where} ORDER BY {ordem} LIMIT ? OFFSET ?',
+        params + [por_pagina, (pagina - 1) * por_pagina]
+    )
+    return json_cursor(cur, conn, headers={'X-Total-Count': str(total)})
 
-    conn = get_db()
-    rows = conn.execute(query, params).fetchall()
-    conn.close()
-    return jsonify([dict(r) for r in rows])
+
+def _consulta_fts(texto: str) -> str:
+    """
+    Converte o texto digitado numa consulta FTS5 segura: cada palavra vira
+    um termo entre aspas com busca por prefixo ("bat"* "mov"*), todos
+    obrigatórios. Operadores e aspas do usuário são descartados.
+    """
+    return ' '.join(f'"{t}"*' for t in re.findall(r'\w+', texto)[:MAX_TERMOS])
 
 
 @recursos_bp.route('/recursos', methods=['POST'])
-@token_required
+@requires()
 def create_recurso():
     """Cria um novo recurso."""
     body = request.get_json(silent=True) or {}
@@ -54,15 +92,16 @@ def create_recurso():
         (nome, categoria, body.get('status', 'ativo'), body.get('localizacao', ''))
     )
     rid = cur.lastrowid
-    _log(cur, request, f"Recurso '{nome}' criado", 'Criar Recurso')
     conn.commit()
+    bump('recursos')
+    registrar_acao('Criar Recurso', f"Recurso '{nome}' criado")
     row = conn.execute('SELECT * FROM recursos WHERE id = ?', (rid,)).fetchone()
     conn.close()
     return jsonify(dict(row)), 201
 
 
 @recursos_bp.route('/recursos/<int:rid>', methods=['PUT'])
-@token_required
+@requires()
 def update_recurso(rid):
     """Atualiza um recurso existente."""
     body = request.get_json(silent=True) or {}
@@ -78,15 +117,16 @@ def update_recurso(rid):
         "UPDATE recursos SET nome=?, categoria=?, status=?, localizacao=?, updated_at=datetime('now') WHERE id=?",
         (body.get('nome'), body.get('categoria'), body.get('status'), body.get('localizacao'), rid)
     )
-    _log(cur, request, f"Recurso ID {rid} atualizado", 'Editar Recurso')
     conn.commit()
+    bump('recursos')
+    registrar_acao('Editar Recurso', f"Recurso ID {rid} atualizado")
     row = conn.execute('SELECT * FROM recursos WHERE id = ?', (rid,)).fetchone()
     conn.close()
     return jsonify(dict(row))
 
 
 @recursos_bp.route('/recursos/<int:rid>', methods=['DELETE'])
-@token_required
+@requires()
 def delete_recurso(rid):
     """Remove um recurso."""
     conn = get_db()
@@ -99,15 +139,89 @@ def delete_recurso(rid):
 
     nome = dict(existing)['nome']
     cur.execute('DELETE FROM recursos WHERE id = ?', (rid,))
-    _log(cur, request, f"Recurso '{nome}' removido", 'Remover Recurso')
     conn.commit()
     conn.close()
+    bump('recursos')
+    registrar_acao('Remover Recurso', f"Recurso '{nome}' removido")
     return jsonify({'message': f"Recurso '{nome}' removido com sucesso."})
 
 
-def _log(cur, req, detalhes: str, acao: str):
-    """Registra ação no log de acesso."""
-    cur.execute(
-        'INSERT INTO logs_acesso (usuario, acao, status, ip, detalhes) VALUES (?,?,?,?,?)',
-        (req.user.get('username'), acao, 'sucesso', req.remote_addr, detalhes)
-    )
+@recursos_bp.route('/recursos/lote', methods=['POST'])
+@requires()
+def lote_recursos():
+    """
+    Aplica um lote de operações em uma única transação:
+      {"operacoes": [{"op": "create", "nome": ..., "categoria": ...},
+                     {"op": "update", "id": 1, "status": "inativo"},
+                     {"op": "delete", "id": 2}]}
+    Campos omitidos num update mantêm o valor atual. Retorna o resultado
+    de cada item; itens inválidos não impedem os demais.
+    """
+    ops, err = ler_operacoes(request.get_json(silent=True) or {})
+    if err:
+        return jsonify({'error': err[0]}), err[1]
+
+    res = Resultados(len(ops))
+    criar, atualizar, remover = [], [], []
+    for i, op in enumerate(ops):
+        tipo = op.get('op') if isinstance(op, dict) else None
+        campo = campo_nao_texto(op, ('nome', 'categoria', 'status', 'localizacao')) if tipo in ('create', 'update') else None
+        if campo:
+            res.erro(i, f'Campo "{campo}" deve ser texto.')
+        elif tipo == 'create':
+            nome      = str(op.get('nome') or '').strip()
+            categoria = str(op.get('categoria') or '').strip()
+            if not nome or not categoria:
+                res.erro(i, 'Nome e categoria são obrigatórios.')
+                continue
+            criar.append((i, (nome, categoria, op.get('status') or 'ativo', op.get('localizacao') or '')))
+        elif tipo in ('update', 'delete'):
+            if not isinstance(op.get('id'), int):
+                res.erro(i, 'Campo "id" inteiro é obrigatório.')
+                continue
+            (atualizar if tipo == 'update' else remover).append((i, op))
+        else:
+            res.erro(i, 'Operação inválida. Use: create, update ou delete.')
+
+    conn = get_db()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        existentes = buscar_por_id(
+            conn, 'SELECT id FROM recursos WHERE id IN ({})',
+            [op['id'] for _, op in atualizar + remover]
+        )
+        for i, op in atualizar + remover:
+            if op['id'] not in existentes:
+                res.erro(i, 'Recurso não encontrado.')
+        atualizar = [(i, op) for i, op in atualizar if not res.falhou(i)]
+        remover   = [(i, op) for i, op in remover if not res.falhou(i)]
+
+        ids = proximos_ids(conn, 'recursos', len(criar))
+        conn.executemany(
+            'INSERT INTO recursos (nome, categoria, status, localizacao) VALUES (?,?,?,?)',
+            [valores for _, valores in criar]
+        )
+        conn.executemany(
+            "UPDATE recursos SET nome = COALESCE(?, nome), categoria = COALESCE(?, categoria), "
+            "status = COALESCE(?, status), localizacao = COALESCE(?, localizacao), "
+            "updated_at = datetime('now') WHERE id = ?",
+            [(op.get('nome'), op.get('categoria'), op.get('status'), op.get('localizacao'), op['id'])
+             for _, op in atualizar]
+        )
+        conn.executemany('DELETE FROM recursos WHERE id = ?', [(op['id'],) for _, op in remover])
+        conn.commit()
+    except Exception as exc:
+        conn.rollback()
+        conn.close()
+        mensagem, status = falha_do_lote(exc, 'dados em conflito com os já cadastrados.')
+        return jsonify({'error': mensagem}), status
+    conn.close()
+
+    for (i, _), rid in zip(criar, ids):
+        res.ok(i, id=rid)
+    for i, op in atualizar + remover:
+        res.ok(i, id=op['id'])
+
+    bump('recursos')
+    registrar_acao('Lote Recursos', f'{len(criar)} criados, {len(atualizar)} atualizados, {len(remover)} removidos')
+    return jsonify(res.resumo(criados=len(criar), atualizados=len(atualizar), removidos=len(remover)))
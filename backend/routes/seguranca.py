@@ -3,38 +3,244 @@ Wayne Industries Security Platform
 Rotas de segurança — logs de acesso e controle de áreas
 """
 
-from flask import Blueprint, request, jsonify
-from models import get_db
-from middleware import token_required, manager_required
+import base64
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from flask import Blueprint, Response, request, jsonify
+from analytics import ANALYTICS_DAILY_RETENTION, ANALYTICS_TOPK, METRICAS, CountMin, HyperLogLog, SpaceSaving, analytics, janela
+from models import get_db, connect
+from middleware import requires, sessao_ativa
+from cache import cached, bump
+from deteccao import detector
+from logwriter import log_writer, registrar_acao
+from eventos import bus, publicar_area, publicar_logs, sse_stream
+from retencao import abrir_segmento, consultar_arquivo, limite_retencao, segmentos
+from serializacao import json_cursor, json_linhas
+from snapshots import abrir as abrir_snapshot, get_db_relatorio, versao_snapshot
 
 seguranca_bp = Blueprint('seguranca', __name__)
 
+# Novos logs gravados viram eventos do feed /eventos, entram no analytics
+# e passam pelas regras de detecção de anomalias
+log_writer.adicionar_ouvinte(publicar_logs, com_ids=True)
+log_writer.adicionar_ouvinte(analytics.registrar)
+log_writer.adicionar_ouvinte(detector.ouvir)
+
+# Colunas aceitas como filtro de igualdade em /logs (todas indexadas)
+LOG_FILTROS = ('usuario', 'ip', 'status', 'acao')
+
+# Exportação em streaming
+EXPORT_BATCH   = 1000
+EXPORT_COLUNAS = ('id', 'timestamp', 'usuario', 'acao', 'status', 'ip', 'detalhes')
+
 
 @seguranca_bp.route('/logs', methods=['GET'])
-@token_required
+@requires()
 def get_logs():
-    """Retorna log de tentativas de acesso (padrão: últimas 100 entradas)."""
-    limit = min(int(request.args.get('limit', 100)), 500)
-    conn  = get_db()
-    rows  = conn.execute(
-        'SELECT * FROM logs_acesso ORDER BY timestamp DESC LIMIT ?', (limit,)
+    """
+    Retorna log de tentativas de acesso, do mais recente para o mais antigo.
+
+    Filtros opcionais: usuario, ip, status, acao, desde, ate (UTC,
+    'YYYY-MM-DD HH:MM:SS'); faixas anteriores à retenção, ou ?arquivo=1,
+    também consultam os segmentos arquivados. Paginação por cursor em (timestamp, id): o
+    header X-Next-Cursor traz o token da próxima página, enviado de volta
+    em ?cursor=. Padrão: 100 entradas por página, máximo 500.
+    """
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+    conds, params = _filtros_logs(request.args)
+
+    token = request.args.get('cursor', '').strip()
+    if token:
+        try:
+            ts, lid = _decode_cursor(token)
+        except ValueError:
+            return jsonify({'error': 'Cursor inválido.'}), 400
+        # Primeiro termo delimita a faixa no índice; o segundo desempata por id
+        conds.append('timestamp <= ? AND (timestamp < ? OR id < ?)')
+        params += [ts, ts, lid]
+
+    where = (' WHERE ' + ' AND '.join(conds)) if conds else ''
+    ordem = ' ORDER BY timestamp DESC, id DESC'
+
+    # Fim da página e existência de uma próxima, lidos só do índice — o
+    # header X-Next-Cursor precisa sair antes do corpo em streaming. Borda e
+    # corpo na mesma transação de leitura (mesmo snapshot do WAL): logs
+    # gravados entre as duas consultas não deslocam a página em relação ao
+    # cursor. A transação termina quando a conexão volta ao pool.
+    conn  = get_db(readonly=True)
+    if not conn.in_transaction:
+        conn.execute('BEGIN')
+    borda = conn.execute(
+        f'SELECT timestamp, id FROM logs_acesso{where}{ordem} LIMIT 2 OFFSET ?', params + [limit - 1]
     ).fetchall()
-    conn.close()
-    return jsonify([dict(r) for r in rows])
+
+    # Completa a página com os segmentos arquivados quando a faixa pedida
+    # (ou ?arquivo=1) vai além da retenção da tabela quente
+    if len(borda) < 2 and _inclui_arquivo(request.args):
+        rows = conn.execute(f'SELECT * FROM logs_acesso{where}{ordem} LIMIT ?', params + [limit]).fetchall()
+        conn.close()
+        rows += consultar_arquivo(
+            where, params, limit + 1 - len(rows),
+            request.args.get('desde', '').strip() or None,
+            request.args.get('ate', '').strip() or None,
+        )
+        headers = {}
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            headers['X-Next-Cursor'] = _encode_cursor(last['timestamp'], last['id'])
+        return json_linhas(rows[:limit], headers)
+
+    headers = {}
+    if len(borda) == 2:
+        headers['X-Next-Cursor'] = _encode_cursor(borda[0]['timestamp'], borda[0]['id'])
+    cur = conn.execute(f'SELECT * FROM logs_acesso{where}{ordem} LIMIT ?', params + [limit])
+    return json_cursor(cur, conn, headers)
+
+
+def _filtros_logs(args):
+    """Monta as condições WHERE a partir dos filtros de log da query string."""
+    conds, params = [], []
+    for campo in LOG_FILTROS:
+        valor = args.get(campo, '').strip()
+        if valor:
+            conds.append(f'{campo} = ?')
+            params.append(valor)
+    desde = args.get('desde', '').strip()
+    ate   = args.get('ate', '').strip()
+    if desde:
+        conds.append('timestamp >= ?')
+        params.append(desde)
+    if ate:
+        conds.append('timestamp < ?')
+        params.append(ate)
+    return conds, params
+
+
+def _inclui_arquivo(args) -> bool:
+    if args.get('arquivo') == '1':
+        return True
+    desde = args.get('desde', '').strip()
+    return bool(desde) and desde < limite_retencao()
+
+
+def _encode_cursor(timestamp: str, lid: int) -> str:
+    raw = json.dumps([timestamp, lid], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(token: str):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        ts, lid = json.loads(raw)
+    except Exception as exc:
+        raise ValueError('cursor inválido') from exc
+    if not isinstance(ts, str) or not isinstance(lid, int):
+        raise ValueError('cursor inválido')
+    return ts, lid
+
+
+@seguranca_bp.route('/logs/export', methods=['GET'])
+@requires(roles=('admin', 'gerente'))
+def export_logs():
+    """
+    Exporta o log de acesso em ordem cronológica como NDJSON (padrão) ou
+    CSV (?formato=csv), em streaming — memória constante qualquer que seja
+    a faixa. Aceita os mesmos filtros de /logs; ?gzip=1 comprime em tempo real.
+    """
+    formato = request.args.get('formato', 'ndjson').strip().lower()
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Formato inválido. Use: ndjson ou csv.'}), 400
+    compactar = request.args.get('gzip') == '1'
+
+    conds, params = _filtros_logs(request.args)
+    where = (' WHERE ' + ' AND '.join(conds)) if conds else ''
+    desde = request.args.get('desde', '').strip() or None
+    ate   = request.args.get('ate', '').strip() or None
+    arquivo = _inclui_arquivo(request.args)
+
+    linhas = _linhas_export(where, params, arquivo, desde, ate)
+    corpo  = _ndjson(linhas) if formato == 'ndjson' else _csv(linhas)
+    if compactar:
+        corpo = _gzip(corpo)
+
+    registrar_acao('Exportar Logs', f"Exportação {formato}{' (gzip)' if compactar else ''}{where and ' com filtros'}")
+
+    nome = f"logs_acesso_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.{formato}"
+    if compactar:
+        nome += '.gz'
+        mimetype = 'application/gzip'
+    else:
+        mimetype = 'application/x-ndjson' if formato == 'ndjson' else 'text/csv'
+    return Response(corpo, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{nome}"'})
+
+
+def _linhas_export(where, params, incluir_arquivo, desde, ate):
+    """Gera as linhas em lotes de fetchmany: segmentos arquivados (mais antigos) e depois a tabela quente."""
+    sql = f'SELECT * FROM logs_acesso{where} ORDER BY timestamp, id'
+    if incluir_arquivo:
+        # Com os segmentos, lê do principal: um snapshot anterior a um
+        # arquivamento repetiria as linhas movidas para o segmento
+        fontes = [abrir_segmento(c) for c in reversed(list(segmentos(desde, ate)))]
+        fontes.append(connect(readonly=True))
+    else:
+        fontes = [abrir_snapshot()]
+    try:
+        for conn in fontes:
+            cur = conn.execute(sql, params)
+            while True:
+                lote = cur.fetchmany(EXPORT_BATCH)
+                if not lote:
+                    break
+                yield from lote
+    finally:
+        for conn in fontes:
+            conn.close()
+
+
+def _ndjson(linhas):
+    for r in linhas:
+        yield json.dumps(dict(r), ensure_ascii=False) + '\n'
+
+
+def _csv(linhas):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUNAS)
+    n = 0
+    for r in linhas:
+        writer.writerow([r[c] for c in EXPORT_COLUNAS])
+        n += 1
+        if n % EXPORT_BATCH == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def _gzip(chunks):
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits=31 -> formato gzip
+    for chunk in chunks:
+        data = comp.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield comp.flush()
 
 
 @seguranca_bp.route('/areas', methods=['GET'])
-@token_required
+@requires()
+@cached('areas')
 def get_areas():
     """Retorna todas as áreas de segurança."""
-    conn = get_db()
-    rows = conn.execute('SELECT * FROM areas ORDER BY id').fetchall()
-    conn.close()
-    return jsonify([dict(r) for r in rows])
+    conn = get_db(readonly=True)
+    return json_cursor(conn.execute('SELECT * FROM areas ORDER BY id'), conn)
 
 
 @seguranca_bp.route('/areas/<int:aid>', methods=['PUT'])
-@manager_required
+@requires(roles=('admin', 'gerente'))
 def update_area(aid):
     """Atualiza o status de uma área (normal / alerta / bloqueado)."""
     body       = request.get_json(silent=True) or {}
@@ -53,17 +259,130 @@ def update_area(aid):
         "UPDATE areas SET status = ?, updated_at = datetime('now') WHERE id = ?",
         (new_status, aid)
     )
-    cur.execute(
-        'INSERT INTO logs_acesso (usuario, acao, status, ip, detalhes) VALUES (?,?,?,?,?)',
-        (
-            request.user.get('username'),
-            'Alterar Área',
-            'sucesso',
-            request.remote_addr,
-            f"Área '{dict(area)['nome']}' → {new_status}"
-        )
-    )
     conn.commit()
-    updated = conn.execute('SELECT * FROM areas WHERE id = ?', (aid,)).fetchone()
+    bump('areas')
+    registrar_acao('Alterar Área', f"Área '{dict(area)['nome']}' → {new_status}", sync=True)
+    updated = dict(conn.execute('SELECT * FROM areas WHERE id = ?', (aid,)).fetchone())
     conn.close()
-    return jsonify(dict(updated))
+    publicar_area(updated)
+    return jsonify(updated)
+
+
+@seguranca_bp.route('/eventos', methods=['GET'])
+@requires()
+def eventos():
+    """
+    Feed Server-Sent Events com mudanças de status de áreas ('area') e
+    novos registros do log de acesso ('log'), com heartbeat periódico.
+    O stream se encerra no primeiro heartbeat após o token expirar ou ser
+    revogado.
+    """
+    sub = bus.subscribe()
+    if sub is None:
+        return jsonify({'error': 'Limite de conexões de eventos atingido.'}), 503
+    claims = request.user
+    return Response(sse_stream(sub, lambda: sessao_ativa(claims)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# ──────────────────────────────────────────────────────────────
+# Analytics aproximado (sketches por hora/dia — ver analytics.py)
+# ──────────────────────────────────────────────────────────────
+@seguranca_bp.route('/seguranca/analytics/top', methods=['GET'])
+@requires(roles=('admin', 'gerente'))
+@cached('analytics', origem=versao_snapshot)
+def analytics_top():
+    """
+    Chaves mais frequentes da métrica na janela (Space-Saving).
+    Parâmetros: metrica, n (padrão 10), horas (padrão 24) ou desde/ate.
+    """
+    metrica, jan, erro = _analytics_params()
+    if erro:
+        return erro
+    n = max(1, min(request.args.get('n', 10, type=int), ANALYTICS_TOPK))
+
+    total, topk = 0, SpaceSaving()
+    for _, parcial, sketch in analytics.periodos(get_db_relatorio(), metrica, jan, 'topk'):
+        total += parcial
+        topk.somar(sketch)
+    return jsonify({
+        'metrica': metrica,
+        'desde': jan['desde'],
+        'ate': jan['ate'],
+        'total': total,
+        # Contagem real entre estimativa - erro e estimativa
+        'itens': [{'chave': c, 'estimativa': qtd, 'erro': e} for c, qtd, e in topk.top(n)],
+        # Nenhuma chave fora da lista passou deste número
+        'max_fora_da_lista': topk.minimo,
+    })
+
+
+@seguranca_bp.route('/seguranca/analytics/contagem', methods=['GET'])
+@requires(roles=('admin', 'gerente'))
+@cached('analytics', origem=versao_snapshot)
+def analytics_contagem():
+    """Ocorrências de uma chave (?chave=) na janela (Count-Min)."""
+    metrica, jan, erro = _analytics_params()
+    if erro:
+        return erro
+    chave = request.args.get('chave', '').strip()
+    if not chave:
+        return jsonify({'error': 'Informe a chave.'}), 400
+
+    cms = CountMin()
+    for _, _, sketch in analytics.periodos(get_db_relatorio(), metrica, jan, 'cms'):
+        cms.somar(sketch)
+    return jsonify({
+        'metrica': metrica,
+        'chave': chave,
+        'desde': jan['desde'],
+        'ate': jan['ate'],
+        'total': cms.total,
+        # Nunca subestima; excede a real em até erro_max com essa confiança
+        'estimativa': cms.estimar(chave),
+        'erro_max': cms.erro_max,
+        'confianca': CountMin.confianca(),
+    })
+
+
+@seguranca_bp.route('/seguranca/analytics/distintos', methods=['GET'])
+@requires(roles=('admin', 'gerente'))
+@cached('analytics', origem=versao_snapshot)
+def analytics_distintos():
+    """Chaves distintas na janela e por hora (ou por dia) (HyperLogLog)."""
+    metrica, jan, erro = _analytics_params()
+    if erro:
+        return erro
+
+    hll, serie = HyperLogLog(), []
+    for rotulo, parcial, sketch in analytics.periodos(get_db_relatorio(), metrica, jan, 'hll'):
+        hll.somar(sketch)
+        serie.append({'periodo': rotulo, 'total': parcial, 'estimativa': sketch.estimar()})
+    return jsonify({
+        'metrica': metrica,
+        'desde': jan['desde'],
+        'ate': jan['ate'],
+        'estimativa': hll.estimar(),
+        'erro_padrao': HyperLogLog.erro_padrao(),
+        'granularidade': jan['granularidade'],
+        'serie': serie,
+    })
+
+
+def _analytics_params():
+    """(metrica, janela, resposta de erro ou None) a partir da query string."""
+    metrica = request.args.get('metrica', 'ips_negados')
+    if metrica not in METRICAS:
+        return None, None, (jsonify({'error': f"Métrica inválida. Use: {', '.join(METRICAS)}."}), 400)
+    args = request.args.to_dict()
+    # ?horas= além da retenção diária vira a janela máxima (e não estoura
+    # o timedelta de janela())
+    horas_max = ANALYTICS_DAILY_RETENTION * 24
+    if args.get('horas', '').strip().isdigit() and int(args['horas']) > horas_max:
+        args['horas'] = str(horas_max)
+    try:
+        return metrica, janela(args), None
+    except ValueError as exc:
+        return None, None, (jsonify({'error': str(exc)}), 400)
+    except OverflowError:
+        return None, None, (jsonify({'error': 'Data fora do intervalo aceito.'}), 400)
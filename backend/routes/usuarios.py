@@ -5,25 +5,29 @@ Rotas CRUD de usuários — protegidas por role
 
 from flask import Blueprint, request, jsonify
 from models import get_db, hash_password
-from middleware import token_required, manager_required, admin_required
+from middleware import requires, denylist
+from cache import cached, bump
+from logwriter import registrar_acao
+from lote import Resultados, buscar_em_blocos, buscar_por_id, campo_nao_texto, falha_do_lote, ler_operacoes, proximos_ids
+from serializacao import json_cursor
 
 usuarios_bp = Blueprint('usuarios', __name__)
 
 
 @usuarios_bp.route('/usuarios', methods=['GET'])
-@manager_required
+@requires(roles=('admin', 'gerente'))
+@cached('usuarios')
 def list_usuarios():
     """Lista todos os usuários (admin e gerente apenas)."""
-    conn = get_db()
-    rows = conn.execute(
+    conn = get_db(readonly=True)
+    cur  = conn.execute(
         'SELECT id, nome, username, cargo, role, status, created_at FROM usuarios ORDER BY created_at DESC'
-    ).fetchall()
-    conn.close()
-    return jsonify([dict(r) for r in rows])
+    )
+    return json_cursor(cur, conn)
 
 
 @usuarios_bp.route('/usuarios', methods=['POST'])
-@admin_required
+@requires(roles=('admin',))
 def create_usuario():
     """Cria novo usuário (admin apenas)."""
     body = request.get_json(silent=True) or {}
@@ -41,22 +45,23 @@ def create_usuario():
             (nome, username, hash_password(password), body.get('cargo', 'Funcionário'), body.get('role', 'funcionario'))
         )
         uid = cur.lastrowid
-        _log(cur, request, f"Usuário '{username}' criado", 'Criar Usuário')
         conn.commit()
+        bump('usuarios')
         row = conn.execute(
             'SELECT id, nome, username, cargo, role, status, created_at FROM usuarios WHERE id = ?', (uid,)
         ).fetchone()
         conn.close()
-        return jsonify(dict(row)), 201
     except Exception as exc:
         conn.close()
         if 'UNIQUE' in str(exc):
             return jsonify({'error': 'Username já cadastrado.'}), 400
         return jsonify({'error': str(exc)}), 400
+    registrar_acao('Criar Usuário', f"Usuário '{username}' criado", sync=True)
+    return jsonify(dict(row)), 201
 
 
 @usuarios_bp.route('/usuarios/<int:uid>', methods=['PUT'])
-@admin_required
+@requires(roles=('admin',))
 def update_usuario(uid):
     """Atualiza dados de um usuário (admin apenas)."""
     body = request.get_json(silent=True) or {}
@@ -80,8 +85,12 @@ def update_usuario(uid):
             (body.get('nome'), body.get('cargo'), body.get('role'), body.get('status'), uid)
         )
 
-    _log(cur, request, f"Usuário ID {uid} atualizado", 'Editar Usuário')
     conn.commit()
+    bump('usuarios')
+    # Role ou status alterados invalidam os tokens já emitidos (claims desatualizadas)
+    if (body.get('role'), body.get('status')) != (existing['role'], existing['status']):
+        denylist.revogar_usuario(uid)
+    registrar_acao('Editar Usuário', f"Usuário ID {uid} atualizado", sync=True)
     row = conn.execute(
         'SELECT id, nome, username, cargo, role, status, created_at FROM usuarios WHERE id = ?', (uid,)
     ).fetchone()
@@ -90,7 +99,7 @@ def update_usuario(uid):
 
 
 @usuarios_bp.route('/usuarios/<int:uid>', methods=['DELETE'])
-@admin_required
+@requires(roles=('admin',))
 def delete_usuario(uid):
     """Remove usuário (admin apenas)."""
     conn = get_db()
@@ -108,14 +117,117 @@ def delete_usuario(uid):
         return jsonify({'error': 'Você não pode remover sua própria conta.'}), 400
 
     cur.execute('DELETE FROM usuarios WHERE id = ?', (uid,))
-    _log(cur, request, f"Usuário '{uname}' removido", 'Remover Usuário')
     conn.commit()
     conn.close()
+    bump('usuarios')
+    denylist.revogar_usuario(uid)
+    registrar_acao('Remover Usuário', f"Usuário '{uname}' removido", sync=True)
     return jsonify({'message': f"Usuário '{uname}' removido com sucesso."})
 
 
-def _log(cur, req, detalhes: str, acao: str):
-    cur.execute(
-        'INSERT INTO logs_acesso (usuario, acao, status, ip, detalhes) VALUES (?,?,?,?,?)',
-        (req.user.get('username'), acao, 'sucesso', req.remote_addr, detalhes)
-    )
+@usuarios_bp.route('/usuarios/lote', methods=['POST'])
+@requires(roles=('admin',))
+def lote_usuarios():
+    """
+    Aplica um lote de operações de usuários em uma única transação
+    (admin apenas) — mesmo formato de /recursos/lote:
+      create: nome, username, [password, cargo, role]
+      update: id, [nome, cargo, role, status, password]
+      delete: id
+    """
+    ops, err = ler_operacoes(request.get_json(silent=True) or {})
+    if err:
+        return jsonify({'error': err[0]}), err[1]
+
+    res = Resultados(len(ops))
+    criar, atualizar, remover = [], [], []
+    for i, op in enumerate(ops):
+        tipo = op.get('op') if isinstance(op, dict) else None
+        campo = campo_nao_texto(op, ('nome', 'username', 'password', 'cargo', 'role', 'status')) if tipo in ('create', 'update') else None
+        if campo:
+            res.erro(i, f'Campo "{campo}" deve ser texto.')
+        elif tipo == 'create':
+            nome     = str(op.get('nome') or '').strip()
+            username = str(op.get('username') or '').strip()
+            if not nome or not username:
+                res.erro(i, 'Nome e username são obrigatórios.')
+                continue
+            criar.append((i, (nome, username, hash_password(op.get('password') or 'wayne123'),
+                              op.get('cargo') or 'Funcionário', op.get('role') or 'funcionario')))
+        elif tipo in ('update', 'delete'):
+            if not isinstance(op.get('id'), int):
+                res.erro(i, 'Campo "id" inteiro é obrigatório.')
+                continue
+            (atualizar if tipo == 'update' else remover).append((i, op))
+        else:
+            res.erro(i, 'Operação inválida. Use: create, update ou delete.')
+
+    conn = get_db()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+
+        # Usernames repetidos no próprio lote ou já cadastrados
+        vistos = set()
+        for i, valores in criar:
+            if valores[1] in vistos:
+                res.erro(i, 'Username repetido no lote.')
+            vistos.add(valores[1])
+        cadastrados = {r['username'] for r in buscar_em_blocos(
+            conn, 'SELECT username FROM usuarios WHERE username IN ({})', vistos
+        )}
+        for i, valores in criar:
+            if valores[1] in cadastrados and not res.falhou(i):
+                res.erro(i, 'Username já cadastrado.')
+        criar = [(i, v) for i, v in criar if not res.falhou(i)]
+
+        existentes = buscar_por_id(
+            conn, 'SELECT id, username, role, status FROM usuarios WHERE id IN ({})',
+            [op['id'] for _, op in atualizar + remover]
+        )
+        for i, op in atualizar + remover:
+            if op['id'] not in existentes:
+                res.erro(i, 'Usuário não encontrado.')
+        for i, op in remover:
+            if not res.falhou(i) and existentes[op['id']]['username'] == request.user.get('username'):
+                res.erro(i, 'Você não pode remover sua própria conta.')
+        atualizar = [(i, op) for i, op in atualizar if not res.falhou(i)]
+        remover   = [(i, op) for i, op in remover if not res.falhou(i)]
+
+        ids = proximos_ids(conn, 'usuarios', len(criar))
+        conn.executemany(
+            'INSERT INTO usuarios (nome, username, password_hash, cargo, role) VALUES (?,?,?,?,?)',
+            [valores for _, valores in criar]
+        )
+        conn.executemany(
+            'UPDATE usuarios SET nome = COALESCE(?, nome), cargo = COALESCE(?, cargo), '
+            'role = COALESCE(?, role), status = COALESCE(?, status), '
+            'password_hash = COALESCE(?, password_hash) WHERE id = ?',
+            [(op.get('nome'), op.get('cargo'), op.get('role'), op.get('status'),
+              hash_password(op['password']) if op.get('password') else None, op['id'])
+             for _, op in atualizar]
+        )
+        conn.executemany('DELETE FROM usuarios WHERE id = ?', [(op['id'],) for _, op in remover])
+        conn.commit()
+    except Exception as exc:
+        conn.rollback()
+        conn.close()
+        mensagem, status = falha_do_lote(exc, 'username já cadastrado.')
+        return jsonify({'error': mensagem}), status
+    conn.close()
+
+    for (i, _), uid in zip(criar, ids):
+        res.ok(i, id=uid)
+    for i, op in atualizar + remover:
+        res.ok(i, id=op['id'])
+
+    bump('usuarios')
+    # Sessões de usuários removidos ou com role/status alterados
+    for _, op in remover:
+        denylist.revogar_usuario(op['id'])
+    for _, op in atualizar:
+        antigo = existentes[op['id']]
+        if (op.get('role') or antigo['role'], op.get('status') or antigo['status']) != (antigo['role'], antigo['status']):
+            denylist.revogar_usuario(op['id'])
+
+    registrar_acao('Lote Usuários', f'{len(criar)} criados, {len(atualizar)} atualizados, {len(remover)} removidos', sync=True)
+    return jsonify(res.resumo(criados=len(criar), atualizados=len(atualizar), removidos=len(remover)))
@@ -0,0 +1,80 @@
+"""
+Wayne Industries Security Platform
+Serialização JSON de coleções direto das linhas do cursor, em streaming
+"""
+
+import os
+from json.encoder import encode_basestring_ascii
+
+from flask import Response, stream_with_context
+
+# Linhas lidas do cursor por vez (fetchmany) — cada lote vira um chunk
+JSON_STREAM_BATCH = int(os.environ.get('JSON_STREAM_BATCH', 500))
+
+
+def _chaves(colunas):
+    """
+    Prefixos '"coluna":' já codificados, uma vez por consulta, na ordem
+    alfabética que o jsonify usa — a saída é a mesma de antes.
+    """
+    ordem = sorted(range(len(colunas)), key=colunas.__getitem__)
+    return [(i, encode_basestring_ascii(colunas[i]) + ':') for i in ordem]
+
+
+def _valor(v) -> str:
+    if v is None:
+        return 'null'
+    if type(v) is str:
+        return encode_basestring_ascii(v)
+    if type(v) is int:
+        return int.__repr__(v)
+    return float.__repr__(v)
+
+
+def _objeto(row, chaves) -> str:
+    return '{' + ','.join(k + _valor(row[i]) for i, k in chaves) + '}'
+
+
+def _array(colunas, lotes):
+    """Gera o array JSON em chunks de bytes, um por lote de linhas."""
+    chaves = _chaves(colunas)
+    yield b'['
+    sep = ''
+    for lote in lotes:
+        yield (sep + ','.join(_objeto(r, chaves) for r in lote)).encode()
+        sep = ','
+    yield b']\n'
+
+
+def _fetch(cursor, batch: int):
+    while True:
+        lote = cursor.fetchmany(batch)
+        if not lote:
+            return
+        yield lote
+
+
+def json_cursor(cursor, conn=None, headers=None, batch: int = JSON_STREAM_BATCH) -> Response:
+    """
+    Resposta JSON (array de objetos) lida do cursor em lotes e enviada em
+    streaming, sem montar dicts nem a lista inteira em memória. `conn`, se
+    informada, é devolvida ao pool quando o envio termina.
+    """
+    colunas = [d[0] for d in cursor.description]
+
+    def gerar():
+        try:
+            yield from _array(colunas, _fetch(cursor, batch))
+        finally:
+            cursor.close()
+            if conn is not None:
+                conn.close()
+
+    return Response(stream_with_context(gerar()), mimetype='application/json', headers=headers)
+
+
+def json_linhas(rows, headers=None) -> Response:
+    """Mesma codificação de json_cursor para linhas já lidas (lista de sqlite3.Row)."""
+    colunas = rows[0].keys() if rows else []
+    body = b''.join(_array(colunas, [rows] if rows else []))
+    return Response(body, mimetype='application/json', headers=headers)
@@ -0,0 +1,172 @@
+"""
+Wayne Industries Security Platform
+Servidor de produção — vários processos (prefork) sobre um único socket
+
+Uso (a partir de backend/):
+  python serve.py                      # WORKERS processos, porta PORT
+  python serve.py --workers 8 --port 8000
+  python serve.py --workers 1          # um processo só, com threads
+
+O processo principal migra o banco e abre o socket uma única vez, depois
+cria os workers com fork(); cada worker monta o próprio app, se aquece e
+atende com threads. Workers que morrem são recriados. Sem fork()
+(Windows), roda um processo só com threads.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+HOST    = os.environ.get('HOST', '127.0.0.1')
+PORT    = int(os.environ.get('PORT', 5000))
+WORKERS = int(os.environ.get('WORKERS', os.cpu_count() or 1))
+BACKLOG = int(os.environ.get('BACKLOG', 2048))
+
+# Recriações seguidas de um worker que morre logo ao subir
+RESPAWN_BACKOFF = 1.0
+
+
+def _worker(sock: socket.socket, indice: int, coerente: bool):
+    """Corpo de cada processo filho: app próprio, aquecimento e atendimento."""
+    from analytics import encerrar as encerrar_analytics
+    from app import aquecer, create_app
+    from coerencia import epocas
+    from deteccao import detector
+    from eventos import distribuir
+    from retencao import iniciar_arquivamento
+    from snapshots import iniciar_snapshots
+    from throttle import iniciar_resumos, login_throttle
+
+    # Ctrl+C chega ao grupo todo; quem encerra os workers é o principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    app = create_app()
+    if coerente:
+        distribuir()
+        # Um único worker aplica as regras de anomalia, sobre os logs de todos
+        detector.via_banco(responsavel=indice == 0)
+        epocas.ativar()
+    aquecer(app)
+    # Cada worker barra (e resume) as tentativas que ele mesmo recebeu
+    iniciar_resumos()
+    # Um único worker cuida do arquivamento de logs e dos snapshots
+    if indice == 0:
+        iniciar_arquivamento()
+        iniciar_snapshots()
+
+    server = make_server(HOST, sock.getsockname()[1], app, threaded=True, fd=sock.fileno())
+    # shutdown() espera o loop do servidor — precisa vir de outra thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"[OK] Worker {indice} (pid {os.getpid()}) pronto.", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        # O filho sai com os._exit (sem atexit): grava o que ficou pendente
+        login_throttle.resumir()
+        encerrar_analytics()    # grava a fila de logs e o checkpoint final
+
+
+def _prefork(sock: socket.socket, workers: int):
+    """Processo principal: cria, acompanha e encerra os workers."""
+    filhos   = {}          # pid -> índice
+    inicio   = {}          # índice -> momento do último fork
+    encerrando = False
+
+    def criar(indice):
+        inicio[indice] = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _worker(sock, indice, coerente=workers > 1)
+            finally:
+                os._exit(0)
+        filhos[pid] = indice
+
+    def encerrar(*_):
+        nonlocal encerrando
+        encerrando = True
+        for pid in list(filhos):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    for i in range(workers):
+        criar(i)
+
+    while filhos:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        indice = filhos.pop(pid, None)
+        if indice is None or encerrando:
+            continue
+        print(f"[ERRO] Worker {indice} (pid {pid}) saiu com status {status}; recriando.", flush=True)
+        if time.monotonic() - inicio[indice] < RESPAWN_BACKOFF:
+            time.sleep(RESPAWN_BACKOFF)
+        criar(indice)
+
+
+def _threads(sock: socket.socket):
+    """Um processo só, atendendo com threads."""
+    from app import aquecer, create_app
+    from retencao import iniciar_arquivamento
+    from snapshots import iniciar_snapshots
+    from throttle import iniciar_resumos
+
+    app = create_app()
+    aquecer(app)
+    iniciar_arquivamento()
+    iniciar_snapshots()
+    iniciar_resumos()
+    server = make_server(HOST, sock.getsockname()[1], app, threaded=True, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    global HOST
+    parser = argparse.ArgumentParser(description='Servidor de produção Wayne Industries')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processos (1 = só threads)')
+    args = parser.parse_args()
+    HOST = args.host
+
+    # Inicialização única, antes do fork: migrações e o socket compartilhado.
+    # Nada de threads ou conexões abertas aqui — os filhos herdam o processo.
+    from migrations import init_db
+    init_db()
+    import app  # noqa: F401 — importa rotas e módulos uma vez, antes do fork
+
+    sock = socket.create_server((args.host, args.port), backlog=BACKLOG)
+    sock.set_inheritable(True)
+    workers = max(1, args.workers)
+    print(f"[OK] Escutando em http://{args.host}:{args.port} com {workers} worker(s).", flush=True)
+
+    if workers > 1 and hasattr(os, 'fork'):
+        _prefork(sock, workers)
+    else:
+        _threads(sock)
+    sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Wayne Industries Security Platform
+Snapshots somente leitura do banco para relatórios — cópias periódicas
+pela API de backup do SQLite, consultadas fora do arquivo principal
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from flask import has_app_context
+
+from models import LOGS_DB_PATH, ConnectionPool, PooledConnection, conexao_do_contexto, connect, get_db
+
+# Idade máxima (s) de um snapshot usado em leituras pesadas; 0 desliga e
+# tudo é lido do banco principal
+SNAPSHOT_MAX_AGE   = float(os.environ.get('SNAPSHOT_MAX_AGE', 0))
+SNAPSHOT_DIR       = os.environ.get('SNAPSHOT_DIR', os.path.join(os.path.dirname(__file__), 'snapshots'))
+SNAPSHOT_POOL      = int(os.environ.get('SNAPSHOT_POOL', 4))
+SNAPSHOT_MMAP_SIZE = int(os.environ.get('SNAPSHOT_MMAP_SIZE', 1073741824))   # 1 GB
+
+SNAPSHOT_PATH      = os.path.join(SNAPSHOT_DIR, 'database.db')
+SNAPSHOT_LOGS_PATH = os.path.join(SNAPSHOT_DIR, 'logs.db') if LOGS_DB_PATH else None
+
+logger = logging.getLogger(__name__)
+
+
+def abrir() -> sqlite3.Connection:
+    """
+    Conexão avulsa para um relatório longo (ex.: exportação): o snapshot,
+    se dentro de SNAPSHOT_MAX_AGE, ou uma conexão de leitura do principal.
+    """
+    if _publicado() is not None:
+        return _conectar_snapshot()
+    return connect(readonly=True)
+
+
+def _conectar_snapshot() -> PooledConnection:
+    # immutable=1: o arquivo nunca muda depois de publicado (o próximo
+    # snapshot entra com rename), então o SQLite dispensa locks e o WAL
+    conn = sqlite3.connect(f'file:{SNAPSHOT_PATH}?immutable=1', uri=True,
+                           factory=PooledConnection, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA mmap_size = {SNAPSHOT_MMAP_SIZE}')
+    conn.execute('PRAGMA cache_size = -16000')
+    conn.execute('PRAGMA query_only = ON')
+    if SNAPSHOT_LOGS_PATH:
+        conn.execute('ATTACH DATABASE ? AS logs', (f'file:{SNAPSHOT_LOGS_PATH}?immutable=1',))
+        conn.execute(f'PRAGMA logs.mmap_size = {SNAPSHOT_MMAP_SIZE}')
+    return conn
+
+
+def versao_snapshot():
+    """
+    Identidade do snapshot que get_db_relatorio() usaria agora (None: banco
+    principal). Entra no @cached das rotas que leem do snapshot, para que
+    uma resposta montada com um snapshot não valha para o próximo.
+    """
+    st = _publicado()
+    return None if st is None else (st.st_ino, st.st_mtime_ns)
+
+
+def _publicado():
+    """stat do snapshot publicado, ou None se desligado, ausente ou velho demais."""
+    if SNAPSHOT_MAX_AGE <= 0:
+        return None
+    try:
+        st = os.stat(SNAPSHOT_PATH)
+    except FileNotFoundError:
+        return None
+    return st if time.time() - st.st_mtime <= SNAPSHOT_MAX_AGE else None
+
+
+class SnapshotPool(ConnectionPool):
+    """Pool de conexões de um snapshot específico (identificado pelo inode)."""
+
+    def __init__(self, ident, size: int):
+        super().__init__(SNAPSHOT_PATH, size, readonly=True)
+        self.ident = ident
+
+    def _connect(self) -> PooledConnection:
+        conn = _conectar_snapshot()
+        conn.pool = self
+        return conn
+
+
+class Snapshots:
+    """Publica snapshots novos e entrega conexões do mais recente."""
+
+    def __init__(self):
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Conexão do pool do snapshot atual, ou None se não houver um fresco."""
+        ident = versao_snapshot()
+        if ident is None:
+            return None
+        pool = self._pool
+        if pool is None or pool.ident != ident:
+            with self._lock:
+                pool = self._pool
+                if pool is None or pool.ident != ident:
+                    if pool is not None:
+                        pool.close_all()
+                    pool = self._pool = SnapshotPool(ident, SNAPSHOT_POOL)
+        return pool.acquire()
+
+    def gerar(self) -> float:
+        """
+        Copia o banco (e o de logs, se separado) num ponto consistente e
+        publica a cópia com rename atômico. Retorna a duração em segundos.
+        """
+        inicio = time.perf_counter()
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        destinos = [('main', SNAPSHOT_PATH)]
+        if SNAPSHOT_LOGS_PATH:
+            destinos.insert(0, ('logs', SNAPSHOT_LOGS_PATH))
+
+        origem = connect(readonly=True)
+        try:
+            # Uma só transação de leitura: os dois arquivos saem do mesmo
+            # instante, e o WAL deixa os escritores seguirem enquanto isso
+            origem.execute('BEGIN')
+            for schema, _ in destinos:
+                origem.execute(f'SELECT 1 FROM {schema}.sqlite_master LIMIT 1').fetchall()
+            temporarios = []
+            for schema, destino in destinos:
+                tmp = f'{destino}.tmp'
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                copia = sqlite3.connect(tmp)
+                try:
+                    origem.backup(copia, name=schema)
+                    # Sem WAL: o snapshot é aberto como arquivo imutável
+                    copia.execute('PRAGMA journal_mode = DELETE')
+                finally:
+                    copia.close()
+                temporarios.append((tmp, destino))
+            origem.rollback()
+        finally:
+            origem.close()
+        # O principal por último: a troca dele é o que os leitores observam
+        for tmp, destino in temporarios:
+            os.replace(tmp, destino)
+        return time.perf_counter() - inicio
+
+    def _apos_fork(self):
+        self._pool = None
+        self._lock = threading.Lock()
+
+
+snapshots = Snapshots()
+
+os.register_at_fork(after_in_child=snapshots._apos_fork)
+
+
+def get_db_relatorio():
+    """
+    Conexão para leituras pesadas (agregados, exportações, analytics): do
+    snapshot quando há um com até SNAPSHOT_MAX_AGE segundos, senão do pool
+    de leitura do principal. Devolvida ao pool no teardown, como get_db.
+    """
+    if not has_app_context():
+        return snapshots.acquire() or get_db(readonly=True)
+    return conexao_do_contexto('snapshot', snapshots.acquire) or get_db(readonly=True)
+
+
+def iniciar_snapshots():
+    """
+    Thread de fundo que renova o snapshot na metade de SNAPSHOT_MAX_AGE,
+    para que as leituras sempre encontrem um dentro do limite.
+    """
+    if SNAPSHOT_MAX_AGE <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                duracao = snapshots.gerar()
+                logger.info('Snapshot publicado em %.2fs.', duracao)
+            except Exception:
+                logger.exception('Falha ao gerar o snapshot.')
+            time.sleep(SNAPSHOT_MAX_AGE / 2)
+
+    thread = threading.Thread(target=loop, name='snapshots', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,37 @@
+"""
+Wayne Industries Security Platform
+Fixtures dos testes — app com banco temporário e login de admin
+"""
+
+import os
+import sys
+import tempfile
+
+# Caminhos são lidos na importação dos módulos: define antes de importar o app
+_TMP = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_PATH', os.path.join(_TMP, 'database.db'))
+os.environ.setdefault('LOG_ARCHIVE_DIR', os.path.join(_TMP, 'arquivo_logs'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import pytest  # noqa: E402
+
+from app import create_app  # noqa: E402
+from migrations import init_db  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    init_db()
+    return create_app({'TESTING': True})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(client):
+    """Headers de autenticação do admin de seed."""
+    r = client.post('/api/login', json={'username': 'admin', 'password': 'wayne123'})
+    return {'Authorization': f"Bearer {r.get_json()['token']}"}
@@ -0,0 +1,25 @@
+"""
+Wayne Industries Security Platform
+Testes dos parâmetros de janela das rotas de analytics
+"""
+
+from analytics import ANALYTICS_DAILY_RETENTION
+
+
+def test_horas_enorme_vira_janela_maxima(client, admin):
+    url = '/api/seguranca/analytics/distintos?metrica=ips&horas='
+    r = client.get(url + '1000000000', headers=admin)
+    assert r.status_code == 200
+    maxima = client.get(url + str(ANALYTICS_DAILY_RETENTION * 24), headers=admin).get_json()
+    assert (r.get_json()['desde'], r.get_json()['ate']) == (maxima['desde'], maxima['ate'])
+
+
+def test_data_fora_do_intervalo_responde_400(client, admin):
+    r = client.get('/api/seguranca/analytics/top?ate=0001-01-01 00:00:00', headers=admin)
+    assert r.status_code == 400
+
+
+def test_horas_invalidas_responde_400(client, admin):
+    for horas in ('0', '-5', 'abc'):
+        r = client.get(f'/api/seguranca/analytics/top?horas={horas}', headers=admin)
+        assert r.status_code == 400
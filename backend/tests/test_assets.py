@@ -0,0 +1,21 @@
+"""
+Wayne Industries Security Platform
+Testes da pré-compressão dos assets estáticos
+"""
+
+from assets import AssetTable
+
+
+def test_so_extensoes_de_texto_ganham_gzip(tmp_path):
+    texto = b'body { color: black; }\n' * 200
+    (tmp_path / 'style.css').write_bytes(texto)
+    (tmp_path / 'logo.png').write_bytes(texto)      # compressível, mas PNG
+    tabela = AssetTable.build({'/': str(tmp_path)})
+    assert tabela._assets['/style.css'].gzip_body is not None
+    assert tabela._assets['/logo.png'].gzip_body is None
+
+
+def test_css_servido_com_gzip(client):
+    r = client.get('/css/style.css', headers={'Accept-Encoding': 'gzip'})
+    assert r.status_code == 200
+    assert r.headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,57 @@
+"""
+Wayne Industries Security Platform
+Testes do feed SSE /eventos
+"""
+
+import eventos
+import models
+from eventos import bus
+from logwriter import registrar_log
+from middleware import denylist
+
+
+def test_evento_de_log_leva_o_id_da_linha(app):
+    sub = bus.subscribe()
+    try:
+        registrar_log('sse-id', 'Teste', 'sucesso', '10.6.0.1', None, sync=True)
+        eventos_log = []
+        while not sub.queue.empty():
+            tipo, dados = sub.queue.get_nowait()
+            if tipo == 'log' and dados['usuario'] == 'sse-id':
+                eventos_log.append(dados)
+    finally:
+        bus.unsubscribe(sub)
+    conn = models.connect()
+    try:
+        lid = conn.execute("SELECT id FROM logs_acesso WHERE usuario = 'sse-id'").fetchone()[0]
+    finally:
+        conn.close()
+    assert [d['id'] for d in eventos_log] == [lid]
+    linhas = list(_stream_com([('log', eventos_log[0])]))
+    assert linhas[1].startswith(f'event: log\nid: {lid}\n')
+
+
+def _stream_com(itens):
+    sub = bus.subscribe()
+    for item in itens:
+        sub.queue.put(item)
+    gerador = eventos.sse_stream(sub)
+    try:
+        for _ in range(len(itens) + 1):
+            yield next(gerador)
+    finally:
+        gerador.close()
+
+
+def test_stream_fecha_quando_a_sessao_e_revogada(client, monkeypatch):
+    monkeypatch.setattr(eventos, 'SSE_HEARTBEAT', 0.05)
+    r = client.post('/api/login', json={'username': 'bruce', 'password': 'batman456'})
+    token, uid = r.get_json()['token'], r.get_json()['user']['id']
+    resp = client.get('/api/eventos', headers={'Authorization': f'Bearer {token}'}, buffered=False)
+    partes = iter(resp.response)
+    assert next(partes).startswith(b'retry:')
+    denylist.revogar_usuario(uid)
+    # O gerador termina no próximo heartbeat em vez de mandar pings para sempre
+    restantes = list(partes)
+    resp.close()
+    assert b': ping\n\n' not in restantes
@@ -0,0 +1,79 @@
+"""
+Wayne Industries Security Platform
+Testes do log writer — backpressure e registros síncronos
+"""
+
+import sqlite3
+
+import pytest
+
+import logwriter
+import models
+from logwriter import LogWriter, _agora, _Marker
+
+
+def _gravados(usuario: str) -> int:
+    conn = models.connect()
+    try:
+        return conn.execute('SELECT COUNT(*) FROM logs_acesso WHERE usuario = ?', (usuario,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _registro(usuario: str):
+    return (usuario, 'Teste', 'sucesso', '10.8.0.1', _agora(), None)
+
+
+def _falhar(conn, records):
+    raise sqlite3.OperationalError('disk I/O error')
+
+
+@pytest.fixture
+def fila_cheia(app, monkeypatch):
+    """Writer sem thread, com a fila lotada: todo _put cai no caminho síncrono."""
+    monkeypatch.setattr(logwriter, 'LOG_ENQUEUE_TIMEOUT', 0.01)
+    writer = LogWriter(maxsize=1)
+    writer._queue.put(_registro('ocupando-vaga'))
+    return writer
+
+
+def test_fila_cheia_grava_no_produtor(fila_cheia):
+    fila_cheia._put(_registro('lw-cheia'))
+    assert _gravados('lw-cheia') == 1
+
+
+def test_fila_cheia_com_falha_nao_propaga_no_assincrono(fila_cheia, monkeypatch):
+    monkeypatch.setattr(fila_cheia, '_gravar', _falhar)
+    fila_cheia._put(_registro('lw-cheia-falha'))
+    assert _gravados('lw-cheia-falha') == 0
+
+
+def test_fila_cheia_com_falha_chega_ao_marcador(fila_cheia, monkeypatch):
+    monkeypatch.setattr(fila_cheia, '_gravar', _falhar)
+    marker = _Marker(_registro('lw-cheia-sync'))
+    fila_cheia._put(marker)
+    assert marker.done.is_set()
+    assert isinstance(marker.erro, sqlite3.OperationalError)
+
+
+def test_sync_retorna_com_o_registro_gravado(app):
+    writer = LogWriter()
+    try:
+        writer.registrar('lw-sync', 'Teste', 'sucesso', '10.8.0.1', None, sync=True)
+        assert _gravados('lw-sync') == 1
+    finally:
+        writer.stop()
+
+
+def test_sync_propaga_falha_de_gravacao(app, monkeypatch):
+    writer = LogWriter()
+    monkeypatch.setattr(writer, '_gravar', _falhar)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            writer.registrar('lw-sync-falha', 'Teste', 'sucesso', '10.8.0.1', None, sync=True)
+        # O assíncrono que falha na thread é só descartado
+        writer.registrar('lw-async-falha', 'Teste', 'sucesso', '10.8.0.1', None)
+        assert writer.flush(timeout=5)
+    finally:
+        writer.stop()
+    assert _gravados('lw-async-falha') == 0
@@ -0,0 +1,80 @@
+"""
+Wayne Industries Security Platform
+Testes das operações em lote — falhas por item e rollback do lote
+"""
+
+import sqlite3
+
+import pytest
+
+import models
+import routes.recursos
+
+
+def _recursos(nome: str) -> int:
+    conn = models.connect()
+    try:
+        return conn.execute('SELECT COUNT(*) FROM recursos WHERE nome = ?', (nome,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def recurso_protegido(app):
+    """Recurso cuja remoção viola uma constraint (trigger de teste)."""
+    conn = models.connect()
+    try:
+        with conn:
+            rid = conn.execute(
+                "INSERT INTO recursos (nome, categoria) VALUES ('lote-protegido', 'Teste')"
+            ).lastrowid
+            conn.execute(
+                "CREATE TRIGGER trg_teste_protegido BEFORE DELETE ON recursos "
+                "WHEN OLD.nome = 'lote-protegido' BEGIN SELECT RAISE(ABORT, 'protegido'); END"
+            )
+        yield rid
+        with conn:
+            conn.execute('DROP TRIGGER trg_teste_protegido')
+    finally:
+        conn.close()
+
+
+def test_itens_invalidos_nao_impedem_os_demais(client, admin):
+    r = client.post('/api/recursos/lote', headers=admin, json={'operacoes': [
+        {'op': 'create', 'nome': 'lote-valido', 'categoria': 'Teste'},
+        {'op': 'create', 'nome': 'lote-sem-categoria'},
+        {'op': 'create', 'nome': ['lista'], 'categoria': 'Teste'},
+        {'op': 'update', 'id': 999999, 'status': 'inativo'},
+        {'op': 'renomear'},
+    ]})
+    assert r.status_code == 200
+    corpo = r.get_json()
+    assert (corpo['criados'], corpo['falhas']) == (1, 4)
+    assert [i['ok'] for i in corpo['resultados']] == [True, False, False, False, False]
+    assert corpo['resultados'][2]['error'] == 'Campo "nome" deve ser texto.'
+    assert corpo['resultados'][3]['error'] == 'Recurso não encontrado.'
+    assert _recursos('lote-valido') == 1
+    assert _recursos('lote-sem-categoria') == 0
+
+
+def test_conflito_desfaz_o_lote_inteiro(client, admin, recurso_protegido):
+    r = client.post('/api/recursos/lote', headers=admin, json={'operacoes': [
+        {'op': 'create', 'nome': 'lote-desfeito', 'categoria': 'Teste'},
+        {'op': 'delete', 'id': recurso_protegido},
+    ]})
+    assert r.status_code == 400
+    assert r.get_json()['error'] == 'Lote não aplicado: dados em conflito com os já cadastrados.'
+    assert _recursos('lote-desfeito') == 0
+    assert _recursos('lote-protegido') == 1
+
+
+def test_erro_interno_nao_vaza_detalhes(client, admin, monkeypatch):
+    def falhar(*_):
+        raise sqlite3.OperationalError('database disk image is malformed')
+    monkeypatch.setattr(routes.recursos, 'proximos_ids', falhar)
+    r = client.post('/api/recursos/lote', headers=admin, json={'operacoes': [
+        {'op': 'create', 'nome': 'lote-erro-interno', 'categoria': 'Teste'},
+    ]})
+    assert r.status_code == 500
+    assert r.get_json()['error'] == 'Lote não aplicado: erro interno.'
+    assert _recursos('lote-erro-interno') == 0
@@ -0,0 +1,52 @@
+"""
+Wayne Industries Security Platform
+Testes das reconstruções (backfill) sobre logs já arquivados
+"""
+
+import models
+from analytics import TABELA_DIA, reconstruir
+from retencao import arquivar_tudo, segmentos
+
+
+def _logs_antigos(usuario: str, dias: int, n: int = 3) -> str:
+    """Grava `n` logs negados de `dias` atrás e os arquiva. Retorna o dia."""
+    conn = models.connect()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO logs_acesso (usuario, acao, status, ip, timestamp) "
+                "VALUES (?, 'Login', 'negado', '10.9.0.1', datetime('now', ?))",
+                [(usuario, f'-{dias} days')] * n
+            )
+            dia = conn.execute("SELECT date('now', ?)", (f'-{dias} days',)).fetchone()[0]
+    finally:
+        conn.close()
+    assert arquivar_tudo() >= n
+    return dia
+
+
+def test_rebuild_analytics_mantem_dias_arquivados(app):
+    dia = _logs_antigos('antigo-analytics', 200)
+    reconstruir()
+    conn = models.connect()
+    try:
+        total = conn.execute(
+            f"SELECT total FROM {TABELA_DIA} WHERE metrica = 'ips_negados' AND dia = ?", (dia,)
+        ).fetchone()
+    finally:
+        conn.close()
+    assert total is not None and total[0] >= 3
+
+
+def test_rebuild_rollups_soma_segmentos_arquivados(app):
+    dia = _logs_antigos('antigo-rollups', 150)
+    conn = models.connect()
+    try:
+        with conn:
+            models.rebuild_rollups(conn, arquivos=list(segmentos()))
+        total = conn.execute(
+            "SELECT SUM(total) FROM logs_rollup_dia WHERE dia = ? AND acao = 'Login'", (dia,)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    assert total is not None and total >= 3
@@ -0,0 +1,20 @@
+"""
+Wayne Industries Security Platform
+Testes da revogação de sessões por usuário
+"""
+
+from middleware import denylist
+
+
+def _login(client, username, password):
+    r = client.post('/api/login', json={'username': username, 'password': password})
+    return r.get_json()['token'], r.get_json()['user']['id']
+
+
+def test_login_logo_apos_revogacao_continua_valido(client):
+    antigo, uid = _login(client, 'bruce', 'batman456')
+    denylist.revogar_usuario(uid)
+    # Mesmo segundo da revogação: só o token anterior cai
+    novo, _ = _login(client, 'bruce', 'batman456')
+    assert client.get('/api/me', headers={'Authorization': f'Bearer {antigo}'}).status_code == 401
+    assert client.get('/api/me', headers={'Authorization': f'Bearer {novo}'}).status_code == 200
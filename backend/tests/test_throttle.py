@@ -0,0 +1,50 @@
+"""
+Wayne Industries Security Platform
+Testes da limitação de tentativas de login e dos logs de resumo
+"""
+
+import time
+
+import models
+from logwriter import log_writer
+from throttle import LOGIN_MAX_FAILURES_USER, iniciar_resumos, login_throttle
+
+
+def _tentar(client, username: str, ip: str):
+    return client.post('/api/login', json={'username': username, 'password': 'errada'},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+def _resumos(ip: str) -> list:
+    log_writer.flush(timeout=5)
+    conn = models.connect()
+    try:
+        return [r[0] for r in conn.execute(
+            "SELECT detalhes FROM logs_acesso WHERE ip = ? AND detalhes LIKE '%bloqueadas%'", (ip,)
+        )]
+    finally:
+        conn.close()
+
+
+def _barrar(client, username: str, ip: str, extras: int):
+    for _ in range(LOGIN_MAX_FAILURES_USER):
+        assert _tentar(client, username, ip).status_code == 401
+    for _ in range(extras):
+        assert _tentar(client, username, ip).status_code == 429
+
+
+def test_falhas_demais_respondem_429_e_viram_resumo(client):
+    _barrar(client, 'alvo-throttle', '10.7.0.1', extras=3)
+    login_throttle.resumir()
+    assert _resumos('10.7.0.1') == ['3 tentativas bloqueadas por excesso de falhas']
+
+
+def test_resumo_sai_pelo_timer_sem_novas_tentativas(client):
+    login_throttle.resumir()
+    _barrar(client, 'alvo-timer', '10.7.0.2', extras=2)
+    login_throttle._proximo_resumo = time.time() + 0.1
+    iniciar_resumos()
+    prazo = time.time() + 5
+    while not _resumos('10.7.0.2') and time.time() < prazo:
+        time.sleep(0.05)
+    assert _resumos('10.7.0.2') == ['2 tentativas bloqueadas por excesso de falhas']
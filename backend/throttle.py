@@ -0,0 +1,209 @@
+"""
+Wayne Industries Security Platform
+Limitação de tentativas de login em memória (janela deslizante)
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from coerencia import epocas
+from logwriter import registrar_log
+from models import connect
+
+LOGIN_WINDOW            = int(os.environ.get('LOGIN_WINDOW', 60))
+LOGIN_MAX_FAILURES_IP   = int(os.environ.get('LOGIN_MAX_FAILURES_IP', 20))
+LOGIN_MAX_FAILURES_USER = int(os.environ.get('LOGIN_MAX_FAILURES_USER', 5))
+THROTTLE_MAX_KEYS       = int(os.environ.get('THROTTLE_MAX_KEYS', 10000))
+THROTTLE_SUMMARY_INTERVAL = int(os.environ.get('THROTTLE_SUMMARY_INTERVAL', 60))
+
+BUCKETS = 6
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindow:
+    """
+    Contadores por chave em janela deslizante aproximada: cada chave guarda
+    um anel de BUCKETS baldes (contagem + época do balde). Chaves ociosas
+    saem primeiro quando o limite de chaves é atingido.
+    """
+
+    def __init__(self, window: int, limit: int, max_keys: int = THROTTLE_MAX_KEYS):
+        self.limit      = limit
+        self.max_keys   = max_keys
+        self.bucket_len = window / BUCKETS
+        self._keys      = OrderedDict()   # chave -> (contagens, épocas)
+        self._lock      = threading.Lock()
+
+    def _epoch(self, now: float) -> int:
+        return int(now // self.bucket_len)
+
+    def count(self, key, now: float = None) -> int:
+        epoch = self._epoch(now or time.time())
+        with self._lock:
+            ring = self._keys.get(key)
+            if ring is None:
+                return 0
+            counts, epochs = ring
+            return sum(c for c, e in zip(counts, epochs) if e > epoch - BUCKETS)
+
+    def exceeded(self, key, now: float = None) -> bool:
+        return self.count(key, now) >= self.limit
+
+    def hit(self, key, now: float = None):
+        epoch = self._epoch(now or time.time())
+        slot  = epoch % BUCKETS
+        with self._lock:
+            ring = self._keys.get(key)
+            if ring is None:
+                ring = self._keys[key] = (array('I', bytes(4 * BUCKETS)), array('q', bytes(8 * BUCKETS)))
+            else:
+                self._keys.move_to_end(key)
+            counts, epochs = ring
+            if epochs[slot] > epoch:
+                return      # hit atrasado (de outro worker) já fora da janela
+            if epochs[slot] != epoch:
+                counts[slot], epochs[slot] = 0, epoch
+            counts[slot] += 1
+            self._evict(epoch)
+
+    def reset(self, key):
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def _evict(self, epoch: int):
+        # Remove do início (menos recentes) as chaves sem baldes na janela
+        # e, se ainda acima do limite, as mais antigas
+        while self._keys:
+            key, (_, epochs) = next(iter(self._keys.items()))
+            idle = max(epochs) <= epoch - BUCKETS
+            if not idle and len(self._keys) <= self.max_keys:
+                break
+            self._keys.popitem(last=False)
+
+
+class LoginThrottle:
+    """
+    Barra tentativas de login de IPs/usuários com falhas demais na janela,
+    antes de qualquer acesso ao banco. Tentativas barradas viram uma linha
+    de resumo por IP a cada THROTTLE_SUMMARY_INTERVAL segundos — gravada na
+    próxima tentativa barrada ou pela thread de iniciar_resumos(), se o
+    ataque parar antes disso.
+    """
+
+    def __init__(self):
+        self.por_ip      = SlidingWindow(LOGIN_WINDOW, LOGIN_MAX_FAILURES_IP)
+        self.por_usuario = SlidingWindow(LOGIN_WINDOW, LOGIN_MAX_FAILURES_USER)
+        self._barrados   = {}       # ip -> [tentativas, último username]
+        self._lock       = threading.Lock()
+        self._proximo_resumo = time.time() + THROTTLE_SUMMARY_INTERVAL
+        self._ultimo_id  = 0        # última linha de falhas_login aplicada
+        self._proxima_poda = 0.0
+
+    def bloqueado(self, ip: str, username: str) -> bool:
+        now = time.time()
+        if self.por_ip.exceeded(ip, now) or (username and self.por_usuario.exceeded(username, now)):
+            self._registrar_barrado(ip, username, now)
+            return True
+        return False
+
+    def falha(self, ip: str, username: str):
+        now = time.time()
+        self._aplicar('falha', ip, username, now)
+        self._propagar('falha', ip, username, now)
+
+    def sucesso(self, username: str):
+        self.por_usuario.reset(username)
+        self._propagar('sucesso', None, username, time.time())
+
+    def _aplicar(self, tipo, ip, username, now):
+        if tipo == 'sucesso':
+            self.por_usuario.reset(username)
+            return
+        self.por_ip.hit(ip, now)
+        if username:
+            self.por_usuario.hit(username, now)
+
+    # ── Vários workers: falhas e sucessos compartilhados via SQLite ──
+    def _propagar(self, tipo, ip, username, now):
+        if not epocas.ativo:
+            return
+        conn = connect()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO falhas_login (pid, tipo, ip, username, ts) VALUES (?,?,?,?,?)',
+                    (os.getpid(), tipo, ip, username, now)
+                )
+                if now >= self._proxima_poda:
+                    self._proxima_poda = now + LOGIN_WINDOW
+                    conn.execute('DELETE FROM falhas_login WHERE ts < ?', (now - LOGIN_WINDOW,))
+        finally:
+            conn.close()
+        epocas.avancar('throttle')
+
+    def sincronizar(self, *_):
+        """Aplica as falhas/sucessos que outros workers registraram na janela."""
+        now  = time.time()
+        conn = connect()
+        try:
+            rows = conn.execute(
+                'SELECT id, pid, tipo, ip, username, ts FROM falhas_login '
+                'WHERE id > ? AND ts >= ? ORDER BY id',
+                (self._ultimo_id, now - LOGIN_WINDOW)
+            ).fetchall()
+        finally:
+            conn.close()
+        pid = os.getpid()
+        for lid, origem, tipo, ip, username, ts in rows:
+            self._ultimo_id = lid
+            if origem != pid:
+                self._aplicar(tipo, ip, username, ts)
+
+    def _registrar_barrado(self, ip, username, now):
+        with self._lock:
+            item = self._barrados.get(ip)
+            if item is None:
+                if len(self._barrados) >= THROTTLE_MAX_KEYS:
+                    self._proximo_resumo = now
+                item = self._barrados[ip] = [0, None]
+            item[0] += 1
+            item[1] = username or 'desconhecido'
+        if now >= self._proximo_resumo:
+            self.resumir()
+
+    def resumir(self):
+        """Grava uma linha de log por IP com o total de tentativas barradas."""
+        with self._lock:
+            barrados, self._barrados = self._barrados, {}
+            self._proximo_resumo = time.time() + THROTTLE_SUMMARY_INTERVAL
+        for ip, (total, username) in barrados.items():
+            registrar_log(username, 'Login', 'negado', ip,
+                          f'{total} tentativas bloqueadas por excesso de falhas')
+
+
+login_throttle = LoginThrottle()
+
+
+def iniciar_resumos():
+    """Thread de fundo que grava os resumos vencidos mesmo sem novas tentativas."""
+    def loop():
+        while True:
+            time.sleep(max(login_throttle._proximo_resumo - time.time(), 0.05))
+            if time.time() < login_throttle._proximo_resumo:
+                continue        # um resumo recente adiou o prazo
+            try:
+                login_throttle.resumir()
+            except Exception:
+                logger.exception('Falha ao gravar o resumo de logins barrados.')
+
+    thread = threading.Thread(target=loop, name='throttle-resumos', daemon=True)
+    thread.start()
+    return thread
+atexit.register(login_throttle.resumir)
+epocas.ao_mudar('throttle', login_throttle.sincronizar)
@@ -74,6 +74,21 @@ function requireRole(...roles) {
  * @throws {Error} com a mensagem de erro da API
  */
 async function apiCall(method, endpoint, data = null) {
+  const { json } = await apiRequest(method, endpoint, data);
+  return json;
+}
+
+/**
+ * GET de uma listagem paginada.
+ * @returns {Promise<{rows: any[], total: number}>} página e total (X-Total-Count)
+ */
+async function apiList(endpoint) {
+  const { res, json } = await apiRequest('GET', endpoint);
+  const total = parseInt(res.headers.get('X-Total-Count'), 10);
+  return { rows: json || [], total: isNaN(total) ? (json || []).length : total };
+}
+
+async function apiRequest(method, endpoint, data = null) {
   const tok = getToken();
   const opts = {
     method,
@@ -88,9 +103,9 @@ async function apiCall(method, endpoint, data = null) {
   const res  = await fetch(url, opts);
   const json = await res.json().catch(() => ({}));
 
-  if (res.status === 401) { clearToken(); window.location.href = '/'; return null; }
+  if (res.status === 401) { clearToken(); window.location.href = '/'; return { res, json: null }; }
   if (!res.ok) throw new Error(json.error || `Erro ${res.status}`);
-  return json;
+  return { res, json };
 }
 
 /* ─── SIDEBAR & HEADER ───────────────────────────────────── */
@@ -204,9 +219,9 @@ function roleBadge(r) {
 }
 
 function logStatusBadge(s) {
-  return s === 'sucesso'
-    ? `<span class="badge badge-success">✓ Sucesso</span>`
-    : `<span class="badge badge-danger">✗ Negado</span>`;
+  if (s === 'sucesso') return `<span class="badge badge-success">✓ Sucesso</span>`;
+  if (s === 'alerta')  return `<span class="badge badge-warning">⚠ Alerta</span>`;
+  return `<span class="badge badge-danger">✗ Negado</span>`;
 }
 
 function areaBadge(s) {
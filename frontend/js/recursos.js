@@ -8,35 +8,53 @@
 let allRecursos = [];
 let editingId   = null;
 let deletingId  = null;
+let pagina      = 1;
+let totalRecursos = 0;
+let searchTimer = null;
+
+const POR_PAGINA = 50;
 
 /* ─── INIT ───────────────────────────────────────────────── */
 document.addEventListener('DOMContentLoaded', loadRecursos);
 
 /* ─── LOAD ───────────────────────────────────────────────── */
+// Busca, filtros e paginação são feitos no servidor (GET /recursos)
 async function loadRecursos() {
+  const params = new URLSearchParams({ pagina, por_pagina: POR_PAGINA });
+  const q      = document.getElementById('search').value.trim();
+  const cat    = document.getElementById('fil-cat').value;
+  const status = document.getElementById('fil-status').value;
+  if (q)      params.set('q', q);
+  if (cat)    params.set('categoria', cat);
+  if (status) params.set('status', status);
   try {
-    allRecursos = await apiCall('GET', '/recursos');
+    const page = await apiList(`/recursos?${params}`);
+    // Última página esvaziada por uma remoção — recua uma página
+    if (!page.rows.length && pagina > 1 && page.total > 0) { goToPage(-1); return; }
+    allRecursos   = page.rows;
+    totalRecursos = page.total;
     renderTable();
   } catch (err) {
     showToast('Erro ao carregar recursos: ' + err.message, 'error');
   }
 }
 
+/** Filtro ou busca alterados — volta para a primeira página. */
+function applyFilters() {
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(() => { pagina = 1; loadRecursos(); }, 250);
+}
+
+function goToPage(delta) {
+  pagina = Math.max(1, pagina + delta);
+  loadRecursos();
+}
+
 /* ─── RENDER TABLE ───────────────────────────────────────── */
 function renderTable() {
-  const search  = document.getElementById('search').value.toLowerCase();
-  const filCat  = document.getElementById('fil-cat').value;
-  const filStat = document.getElementById('fil-status').value;
-  const tbody   = document.getElementById('recursos-tbody');
-
-  let rows = allRecursos.filter(r => {
-    const matchSearch = !search ||
-      r.nome.toLowerCase().includes(search) ||
-      (r.localizacao || '').toLowerCase().includes(search);
-    const matchCat    = !filCat  || r.categoria === filCat;
-    const matchStatus = !filStat || r.status    === filStat;
-    return matchSearch && matchCat && matchStatus;
-  });
+  const tbody = document.getElementById('recursos-tbody');
+  const rows  = allRecursos;
+  renderPager();
 
   if (!rows.length) {
     tbody.innerHTML = `
@@ -73,6 +91,14 @@ function renderTable() {
   `).join('');
 }
 
+function renderPager() {
+  const paginas = Math.max(1, Math.ceil(totalRecursos / POR_PAGINA));
+  document.getElementById('pager-info').textContent =
+    `${totalRecursos} recurso(s) — página ${pagina} de ${paginas}`;
+  document.getElementById('pager-prev').disabled = pagina <= 1;
+  document.getElementById('pager-next').disabled = pagina >= paginas;
+}
+
 /* ─── MODAL: ADD ─────────────────────────────────────────── */
 function openAdd() {
   editingId = null;
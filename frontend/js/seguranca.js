@@ -12,8 +12,61 @@ let allAreas = [];
 document.addEventListener('DOMContentLoaded', () => {
   loadAreas();
   loadLogs();
+  connectEvents();
 });
 
+/* ─── EVENTOS EM TEMPO REAL (SSE) ────────────────────────── */
+// fetch + ReadableStream em vez de EventSource para enviar o header Authorization
+async function connectEvents() {
+  const tok = getToken();
+  if (!tok) return;
+  try {
+    const res = await fetch(`${API}/eventos`, { headers: { Authorization: `Bearer ${tok}` } });
+    if (res.status === 401) { clearToken(); window.location.href = '/'; return; }
+    if (!res.ok || !res.body) throw new Error(`Erro ${res.status}`);
+
+    const reader  = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buf = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buf += decoder.decode(value, { stream: true });
+      let i;
+      while ((i = buf.indexOf('\n\n')) >= 0) {
+        handleEvent(buf.slice(0, i));
+        buf = buf.slice(i + 2);
+      }
+    }
+  } catch (_) {
+    // conexão caiu — tenta de novo abaixo
+  }
+  setTimeout(connectEvents, 3000);
+}
+
+function handleEvent(block) {
+  let type = 'message';
+  let data = '';
+  block.split('\n').forEach(line => {
+    if (line.startsWith('event:')) type = line.slice(6).trim();
+    else if (line.startsWith('data:')) data += line.slice(5).trim();
+  });
+  if (!data) return;
+  const payload = JSON.parse(data);
+
+  if (type === 'area') {
+    const idx = allAreas.findIndex(a => a.id === payload.id);
+    if (idx >= 0) allAreas[idx] = payload; else allAreas.push(payload);
+    renderAreas();
+  } else if (type === 'log') {
+    const filter = document.getElementById('log-filter').value;
+    if (filter && payload.status !== filter) return;
+    allLogs.unshift(payload);
+    allLogs = allLogs.slice(0, 100);
+    renderLogs();
+  }
+}
+
 /* ─── ÁREAS ──────────────────────────────────────────────── */
 async function loadAreas() {
   try {
@@ -69,10 +122,11 @@ function renderAreas() {
 
 async function setAreaStatus(id, status) {
   try {
-    await apiCall('PUT', `/areas/${id}`, { status });
+    const updated = await apiCall('PUT', `/areas/${id}`, { status });
     showToast(`Área atualizada para "${status}".`, 'success');
-    await loadAreas();
-    await loadLogs();
+    // O feed de eventos traz o novo log; a área já volta na resposta
+    const idx = allAreas.findIndex(a => a.id === id);
+    if (updated && idx >= 0) { allAreas[idx] = updated; renderAreas(); }
   } catch (err) {
     showToast('Erro: ' + err.message, 'error');
   }
@@ -80,8 +134,11 @@ async function setAreaStatus(id, status) {
 
 /* ─── LOGS ───────────────────────────────────────────────── */
 async function loadLogs() {
+  const status = document.getElementById('log-filter').value;
+  const params = new URLSearchParams({ limit: 100 });
+  if (status) params.set('status', status);
   try {
-    allLogs = await apiCall('GET', '/logs?limit=100');
+    allLogs = await apiCall('GET', `/logs?${params}`);
     renderLogs();
   } catch (err) {
     showToast('Erro ao carregar logs: ' + err.message, 'error');
@@ -89,10 +146,8 @@ async function loadLogs() {
 }
 
 function renderLogs() {
-  const filter = document.getElementById('log-filter').value;
-  const tbody  = document.getElementById('logs-tbody');
-
-  const rows = filter ? allLogs.filter(l => l.status === filter) : allLogs;
+  const tbody = document.getElementById('logs-tbody');
+  const rows  = allLogs;
 
   if (!rows.length) {
     tbody.innerHTML = `<tr><td colspan="7" class="text-center text-muted" style="padding:28px">Nenhum log encontrado.</td></tr>`;